@@ -1,9 +1,20 @@
+import sys
 import streamlit as st
 import cv2
 import time
 import numpy as np
+from pathlib import Path
 from collections import Counter, defaultdict
-from ultralytics import YOLO
+
+# ---------------- PATH FIX ----------------
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from src.face_tracker import FaceTracker
+from src.face_stage import detect_faces_scaled
+from src.device_worker import LatestFrameWorker
+from src.model_registry import get_model, model_lock, warmup
 
 # -------------------- CONFIG --------------------
 st.set_page_config(
@@ -14,18 +25,34 @@ st.set_page_config(
 
 CONF_THRESHOLD = 0.25   # LOWERED → detect small phones
 MAL_OBJECTS = ["cell phone", "laptop", "tablet"]
+REDETECT_EVERY = 10     # full Haar detection every N frames, optical flow in between
+MIN_FACE_FRAC = 0.12    # expected face height as a fraction of frame height
+MAX_FACE_FRAC = 0.9
 
 # -------------------- LOAD MODELS --------------------
 @st.cache_resource
 def load_models():
-    face = cv2.CascadeClassifier(
-        cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-    )
-    yolo = YOLO("yolov8n.pt")
-    return face, yolo
+    # shared registry: one copy per process even if src.object_detector is imported too
+    warmup("yolo")
+    return get_model("haar_face"), get_model("yolo")
 
 face_detector, yolo_model = load_models()
 
+def detect_devices(frame):
+    """YOLO pass -> [(label, conf, (x1, y1, x2, y2)), ...] for malpractice objects."""
+    with model_lock("yolo"):
+        results = yolo_model(frame, conf=CONF_THRESHOLD, verbose=False)[0]
+
+    found = []
+    for box in results.boxes:
+        cls = int(box.cls[0])
+        label = yolo_model.names[cls]
+        conf = float(box.conf[0])
+
+        if label in MAL_OBJECTS:
+            found.append((label, conf, tuple(map(int, box.xyxy[0]))))
+    return found
+
 # -------------------- SESSION STATE --------------------
 if "logs" not in st.session_state:
     st.session_state.logs = []
@@ -46,6 +73,10 @@ with col2:
     start = st.button("▶ Start Monitoring", use_container_width=True)
     stop = st.button("⏹ Stop & Generate Report", use_container_width=True)
 
+    # Haar cascade runs on a downscaled copy; boxes are mapped back to 1280x720
+    detect_scale = st.slider("Face detection scale", 0.25, 1.0, 0.5, 0.05)
+    det_stats = st.empty()
+
 # -------------------- START SESSION --------------------
 if start:
     st.session_state.running = True
@@ -57,6 +88,21 @@ if st.session_state.running:
     cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
     frame_window = col1.empty()
 
+    face_tracker = FaceTracker(
+        lambda g: detect_faces_scaled(
+            g, detect_scale, 1.3, 5, MIN_FACE_FRAC, MAX_FACE_FRAC, cascade=face_detector
+        ),
+        redetect_every=REDETECT_EVERY
+    )
+    st.session_state.face_tracker = face_tracker
+
+    # YOLO runs on its own thread against the newest frame only
+    if "device_worker" in st.session_state:
+        st.session_state.device_worker.stop()
+    device_worker = LatestFrameWorker(detect_devices)
+    st.session_state.device_worker = device_worker
+    last_seq = 0
+
     while st.session_state.running:
         ret, frame = cap.read()
         if not ret:
@@ -66,31 +112,44 @@ if st.session_state.running:
         timestamp = time.time()
 
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_detector.detectMultiScale(gray, 1.3, 5)
+        t0 = time.perf_counter()
+        faces = face_tracker.update(gray)
+        det_ms = (time.perf_counter() - t0) * 1000.0
+        det_stats.caption(f"Face stage: {det_ms:.1f} ms @ scale {detect_scale:.2f}")
 
         # -------- FACE BOXES --------
         for (x, y, w, h) in faces:
             cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 255, 255), 2)
 
-        # -------- OBJECT DETECTION --------
-        results = yolo_model(frame, conf=CONF_THRESHOLD, verbose=False)[0]
+        # -------- OBJECT DETECTION (ASYNC) --------
+        device_worker.submit(frame.copy(), timestamp)
+        devices, devices_ts, seq = device_worker.latest()
+
+        # log each YOLO result once, when it is fresh
+        fresh = seq != last_seq
+        last_seq = seq
 
         detected_objects = []
         detected_confidences = []
         malpractice_flag = False
 
-        for box in results.boxes:
-            cls = int(box.cls[0])
-            label = yolo_model.names[cls]
-            conf = float(box.conf[0])
-
-            if label in MAL_OBJECTS:
-                malpractice_flag = True
+        for label, conf, (x1, y1, x2, y2) in devices or []:
+            malpractice_flag = True
+            if fresh:
                 detected_objects.append(label)
                 detected_confidences.append(conf)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
 
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        if devices_ts is not None:
+            cv2.putText(
+                frame,
+                f"device check {timestamp - devices_ts:.1f}s ago",
+                (30, 700),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (200, 200, 200),
+                1
+            )
 
         # -------- MALPRACTICE ALERT (LIVE) --------
         if malpractice_flag:
@@ -110,7 +169,8 @@ if st.session_state.running:
             "faces": len(faces),
             "objects": detected_objects,
             "confidences": detected_confidences,
-            "malpractice": malpractice_flag
+            "malpractice": malpractice_flag and fresh,
+            "det_ms": det_ms
         })
 
         frame_window.image(frame, channels="BGR")
@@ -119,6 +179,7 @@ if st.session_state.running:
             st.session_state.running = False
             break
 
+    device_worker.stop()
     cap.release()
 
 # -------------------- REPORT SECTION --------------------
@@ -148,6 +209,14 @@ if not st.session_state.running and st.session_state.logs:
     st.write(f"🚫 No Face Detected: **{no_face} times**")
     st.write(f"📵 Malpractice Events: **{malpractice_events} times**")
 
+    if "face_tracker" in st.session_state:
+        tstats = st.session_state.face_tracker.stats()
+        st.caption(
+            f"Face detector ran on {tstats['detector_calls']} of {tstats['frames']} frames "
+            f"({tstats['detector_calls_saved']} saved by tracking), "
+            f"avg face stage {np.mean([l.get('det_ms', 0.0) for l in logs]):.1f} ms/frame"
+        )
+
     # -------- OBJECT DETAILS --------
     st.subheader("📱 Device Detection Analysis")
 
@@ -12,5 +12,8 @@ MIN_ENROLL_KEY_EVENTS = int(os.getenv("KS_MIN_ENROLL_KEY_EVENTS", "60"))
 ACCEPT_THRESHOLD = float(os.getenv("KS_ACCEPT_T", "0.70"))
 REVIEW_THRESHOLD = float(os.getenv("KS_REVIEW_T", "0.55"))
 
+# Max windows per /api/score_batch request
+BATCH_MAX_WINDOWS = int(os.getenv("KS_BATCH_MAX_WINDOWS", "1000"))
+
 # Model label
-MODEL_VERSION = os.getenv("KS_MODEL_VERSION", "ks_v1_robust64")
+MODEL_VERSION = os.getenv("KS_MODEL_VERSION", "ks_v2_perkey64")
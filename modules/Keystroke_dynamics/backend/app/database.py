@@ -87,11 +87,36 @@ def _create_fresh_db_from_schema(conn):
     conn.commit()
 
 
+def ensure_profiles_model_version():
+    """
+    Add profiles.model_version (MODEL_VERSION of the extractor that produced
+    each embedding) to databases created before it existed. Rows written
+    before versioning keep NULL and are treated as stale by the matcher.
+    """
+    conn = get_conn()
+    try:
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(profiles)").fetchall()]
+        if cols and "model_version" not in cols:
+            conn.execute("ALTER TABLE profiles ADD COLUMN model_version TEXT")
+            conn.commit()
+            logger.info("Added profiles.model_version column")
+    finally:
+        conn.close()
+
+
 def init_db(force_recreate=False):
     """
-    Initialize DB. If DB is corrupt, back it up and recreate a fresh DB from schema.sql.
+    Initialize DB (see _init_db_file), then apply column migrations.
     This function is idempotent.
     """
+    _init_db_file(force_recreate)
+    ensure_profiles_model_version()
+
+
+def _init_db_file(force_recreate=False):
+    """
+    Open the DB file. If DB is corrupt, back it up and recreate a fresh DB from schema.sql.
+    """
     try:
         # Ensure containing folder exists
         db_dir = os.path.dirname(DB_PATH)
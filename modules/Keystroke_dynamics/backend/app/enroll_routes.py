@@ -4,6 +4,7 @@ from pydantic import BaseModel
 import json, logging
 import app.database as database
 from app.session_service import compute_template_from_samples, _now_str
+from app.template_cache import template_cache
 
 logger = logging.getLogger("keystroke_enroll")
 router = APIRouter(prefix="/candidate", tags=["candidate"])
@@ -60,6 +61,7 @@ def enroll_sample(req: EnrollSampleReq):
                        (json.dumps(cur_template), _now_str(), prof_id))
             db.commit()
             samples_count = len(cur_template["samples"])
+        template_cache.invalidate(candidate_id)
     except Exception as e:
         logger.exception("failed to save enroll sample")
         raise HTTPException(status_code=500, detail=str(e))
@@ -91,6 +93,7 @@ def enroll_finish(req: EnrollFinishReq):
         db.execute("UPDATE profiles SET template = ?, updated_at = ? WHERE id = ?",
                    (json.dumps(template_json), _now_str(), prof_id))
         db.commit()
+        template_cache.invalidate(candidate_id)
     except Exception as e:
         logger.exception("failed to persist computed template")
         raise HTTPException(status_code=500, detail=str(e))
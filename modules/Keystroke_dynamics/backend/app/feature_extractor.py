@@ -2,9 +2,182 @@
 import numpy as np
 import math
 
+from app.keystroke_pairing import (
+    EV_KEYDOWN, EV_KEYUP, EV_PASTE, EV_BLUR, EV_FOCUS, events_to_arrays, pair_keys, hold_times, digraph_latencies,
+    windows_to_arrays, pair_keys_batch
+)
+
+QUANTILES = np.array([0.10, 0.25, 0.75, 0.90])
+
+# key groups for per-group hold times
+KG_VOWEL, KG_CONSONANT, KG_DIGIT, KG_SPACE, KG_PUNCT, KG_BACKSPACE, KG_ENTER, KG_MODIFIER = range(8)
+N_KEY_GROUPS = 8
+NAMED_KEY_GROUPS = {
+    "Space": KG_SPACE, "Spacebar": KG_SPACE,
+    "Backspace": KG_BACKSPACE, "Delete": KG_BACKSPACE,
+    "Enter": KG_ENTER,
+    "Shift": KG_MODIFIER, "Control": KG_MODIFIER, "Alt": KG_MODIFIER, "Meta": KG_MODIFIER, "CapsLock": KG_MODIFIER,
+}
+
+# vector slots 8.. (see pair_features); slots 41-63 stay reserved (zero)
+PAIR_SLOT_START = 8
+N_PAIR_SLOTS = 33
+LATENCY_SLOTS = [0, 1, 2, 3] + list(range(5, 17)) + list(range(21, 33))
+
 def safe_div(a, b):
     return a / b if b else 0.0
 
+def _median(a):
+    """np.median for a small non-empty 1-d array (same result, less overhead)."""
+    s = np.sort(a)
+    m = s.size // 2
+    if s.size % 2:
+        return float(s[m])
+    return float((s[m - 1] + s[m]) / 2)
+
+def _median_mad(a):
+    if a.size == 0:
+        return 0.0, 0.0
+    med = _median(a)
+    return med, _median(np.abs(a - med))
+
+def _quantiles(a):
+    """p10, p25, p75, p90 (np.quantile 'linear'; zeros when empty)."""
+    if a.size == 0:
+        return np.zeros(len(QUANTILES))
+    s = np.sort(a)
+    pos = QUANTILES * (s.size - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, s.size - 1)
+    return s[lo] + (s[hi] - s[lo]) * (pos - lo)
+
+def _segments(seg, n):
+    counts = np.bincount(seg, minlength=n)
+    return counts, np.cumsum(counts) - counts
+
+def _segment_median(a, seg, n):
+    """_median of a per segment id in [0, n) (zero for empty segments), in a's dtype."""
+    counts, starts = _segments(seg, n)
+    s = a[np.lexsort((a, seg))]
+    out = np.zeros(n, dtype=a.dtype)
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    out[has] = (s[lo] + s[hi]) / 2
+    return out
+
+def _segment_median_mad(a, seg, n):
+    med = _segment_median(a, seg, n)
+    return med, _segment_median(np.abs(a - med[seg]), seg, n)
+
+def _segment_quantiles(a, seg, n):
+    """_quantiles of a per segment id -> (n, 4)."""
+    counts, starts = _segments(seg, n)
+    s = a[np.lexsort((a, seg))]
+    out = np.zeros((n, len(QUANTILES)))
+    has = counts > 0
+    c = counts[has][:, None]
+    start = starts[has][:, None]
+    pos = QUANTILES * (c - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, c - 1)
+    out[has] = s[start + lo] + (s[start + hi] - s[start + lo]) * (pos - lo)
+    return out
+
+def _ratio(a, b):
+    return np.divide(a, b, out=np.zeros(len(b)), where=b > 0)
+
+def key_group(name):
+    if not isinstance(name, str):
+        return -1
+    if len(name) == 1:
+        c = name.lower()
+        if c in "aeiou":
+            return KG_VOWEL
+        if c.isalpha():
+            return KG_CONSONANT
+        if c.isdigit():
+            return KG_DIGIT
+        if c == " ":
+            return KG_SPACE
+        return KG_PUNCT
+    return NAMED_KEY_GROUPS.get(name, -1)
+
+def pair_features(types, keys, rts, key_names, pairs, holds):
+    """
+    Slots 8.. of the feature vector from per-key paired presses:
+      8-11  median / MAD of up-down (flight) and down-up latencies
+      12    rollover fraction (next key pressed before the previous is released)
+      13-24 p10/p25/p75/p90 of hold, down-down and up-down latencies
+      25-28 backspace, modifier, auto-repeat and orphan fractions
+      29-36 median hold per key group
+      37-40 median down-down per transition (letter->letter, letter->space, space->letter, other)
+    Latencies are scaled by 1/2000 like slots 0-3. Returns (values, meta).
+    """
+    dd, ud, du = digraph_latencies(pairs, rts)
+
+    out = np.zeros(N_PAIR_SLOTS, dtype=np.float64)
+    out[0:2] = _median_mad(ud)
+    out[2:4] = _median_mad(du)
+    out[4] = np.count_nonzero(ud < 0) / ud.size if ud.size else 0.0
+    out[5:9] = _quantiles(holds)
+    out[9:13] = _quantiles(dd)
+    out[13:17] = _quantiles(ud)
+
+    groups = np.array([key_group(k) for k in key_names], dtype=np.int8)[keys[pairs.down_idx]]
+    n_press = len(pairs)
+    n_down = int(np.count_nonzero(types == EV_KEYDOWN))
+    n_keys = n_down + int(np.count_nonzero(types == EV_KEYUP))
+    out[17] = np.count_nonzero(groups == KG_BACKSPACE) / n_press if n_press else 0.0
+    out[18] = np.count_nonzero(groups == KG_MODIFIER) / n_press if n_press else 0.0
+    out[19] = pairs.auto_repeats / n_down if n_down else 0.0
+    out[20] = (pairs.orphan_ups + pairs.orphan_downs) / n_keys if n_keys else 0.0
+
+    for g in range(N_KEY_GROUPS):
+        sel = holds[groups == g]
+        out[21 + g] = _median(sel) if sel.size else 0.0
+
+    letter = (groups == KG_VOWEL) | (groups == KG_CONSONANT)
+    space = groups == KG_SPACE
+    a, b = letter[:-1], letter[1:]
+    transitions = [a & b, a & space[1:], space[:-1] & b]
+    transitions.append(~(transitions[0] | transitions[1] | transitions[2]))
+    for t, sel in enumerate(transitions):
+        x = dd[sel]
+        out[29 + t] = _median(x) if x.size else 0.0
+
+    # latency slots -> same scale as slots 0-3
+    out[LATENCY_SLOTS] /= 2000.0
+
+    meta = {
+        "pairs": n_press,
+        "auto_repeats": pairs.auto_repeats,
+        "orphan_keyups": pairs.orphan_ups,
+        "orphan_keydowns": pairs.orphan_downs,
+        "rollover_fraction": float(out[4]),
+    }
+    return out, meta
+
+def assemble_vector(median_ht, mad_ht, median_dd, mad_dd, cpm, pauses_over_200, n_holds, pair_vals):
+    """Build the L2-normalized 64-d vector (shared with the streaming state in app.live_state)."""
+    vec = np.zeros(64, dtype=np.float32)
+    vec[0] = median_ht
+    vec[1] = mad_ht
+    vec[2] = median_dd
+    vec[3] = mad_dd
+    vec[4] = math.log1p(cpm)
+    vec[5] = float(pauses_over_200)
+    vec[6] = float(max(n_holds, 1))
+    vec[7] = safe_div(median_ht, median_dd)
+
+    vec[0:5] = vec[0:5] / np.array([2000.0, 2000.0, 2000.0, 2000.0, 10.0], dtype=np.float32)
+    vec[PAIR_SLOT_START:PAIR_SLOT_START + N_PAIR_SLOTS] = pair_vals
+
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        norm = 1.0
+    return vec / norm
+
 def extract_features(events):
     """
     Feature extractor with improved paste detection and blur/focus counting.
@@ -19,63 +192,41 @@ def extract_features(events):
     if not events:
         return {"feature_vector": np.zeros(64, dtype=np.float32), "paste_flag": False, "meta": {}}
 
-    # copy and compute relative times
-    base_ts = events[0].get("ts", 0)
-    for e in events:
-        e["rts"] = e.get("ts", 0) - base_ts
-
-    # classify events
-    keydowns = [e for e in events if e.get("type") == "keydown"]
-    keyups = [e for e in events if e.get("type") == "keyup"]
-    paste_events = [e for e in events if e.get("type") == "paste"]
-    blur_events = [e for e in events if e.get("type") == "blur"]
-    focus_events = [e for e in events if e.get("type") == "focus"]
-
-    # hold times mapping keydown->next keyup for same key (simple greedy)
-    holds = []
-    ku_idx = 0
-    for kd in keydowns:
-        kd_ts = kd.get("rts", 0.0)
-        matched = None
-        while ku_idx < len(keyups):
-            ku = keyups[ku_idx]
-            ku_idx += 1
-            if ku.get("rts", 0.0) >= kd_ts:
-                matched = ku
-                break
-        if matched:
-            ht = matched.get("rts", 0.0) - kd_ts
-            if ht < 0:
-                ht = 0.0
-            holds.append(float(ht))
-    if not holds:
-        holds = [0.0]
+    types, keys, rts, key_names = events_to_arrays(events)
+
+    kd_ts = rts[types == EV_KEYDOWN]
+    ku_ts = rts[types == EV_KEYUP]
+    n_paste = int(np.count_nonzero(types == EV_PASTE))
+
+    # hold times per key (keydown -> keyup of the same key; rollover safe)
+    pairs = pair_keys(types, keys)
+    holds = hold_times(pairs, rts)
+    pair_vals, pair_meta = pair_features(types, keys, rts, key_names, pairs, holds)
+    n_holds = int(holds.size)
+    if not n_holds:
+        holds = np.zeros(1)
 
     # digraphs dd between successive keydowns
-    dd_list = []
-    for i in range(len(keydowns) - 1):
-        dd = keydowns[i+1].get("rts", 0.0) - keydowns[i].get("rts", 0.0)
-        dd_list.append(float(max(0.0, dd)))
-    if not dd_list:
-        dd_list = [0.0]
-
-    holds_arr = np.array(holds, dtype=np.float32)
-    dd_arr = np.array(dd_list, dtype=np.float32)
-
-    median_ht = float(np.median(holds_arr))
-    mad_ht = float(np.median(np.abs(holds_arr - median_ht))) if holds_arr.size > 0 else 0.0
-    median_dd = float(np.median(dd_arr))
-    mad_dd = float(np.median(np.abs(dd_arr - median_dd))) if dd_arr.size > 0 else 0.0
-
-    duration = events[-1].get("rts", 0.0) - events[0].get("rts", 0.0)
-    char_key_events = len([e for e in events if e.get("type") in ("keydown","keyup")])
+    dd = np.maximum(np.diff(kd_ts), 0.0) if kd_ts.size > 1 else np.zeros(1)
+
+    holds_arr = holds.astype(np.float32)
+    dd_arr = dd.astype(np.float32)
+
+    median_ht = _median(holds_arr)
+    mad_ht = _median(np.abs(holds_arr - median_ht))
+    median_dd = _median(dd_arr)
+    mad_dd = _median(np.abs(dd_arr - median_dd))
+
+    base_ts = events[0].get("ts", 0)
+    duration = events[-1].get("ts", 0) - base_ts
+    char_key_events = int(kd_ts.size + ku_ts.size)
     cpm = (char_key_events / duration) * 60000.0 if duration > 0 else 0.0
-    pauses_over_200 = sum(1 for x in dd_list if x > 200.0)
+    pauses_over_200 = int(np.count_nonzero(dd > 200.0))
 
     # --- Paste heuristics ---
     paste_flag = False
     # explicit paste events
-    if paste_events:
+    if n_paste:
         paste_flag = True
     # heuristic: if last action contains a long insertion and there were very few key events
     # look for event objects with clipboardLength (some clients send it)
@@ -86,31 +237,13 @@ def extract_features(events):
             paste_flag = True
 
     # heuristic: detect sudden large delta in text length (if events include pos/selLen)
-    # compute approximate typed length derived from keydown/keyup counts vs last explicit textLen if provided
     text_lengths = [e.get("textLen") for e in events if e.get("textLen") is not None]
-    if text_lengths:
+    if len(text_lengths) >= 2:
         # if text grew by large jump but few key events -> paste
-        if len(text_lengths) >= 2:
-            if (text_lengths[-1] - text_lengths[-2]) > max(10, 5 * char_key_events):
-                paste_flag = True
-
-    # --- Build 64-d vector like before ---
-    vec = np.zeros(64, dtype=np.float32)
-    vec[0] = median_ht
-    vec[1] = mad_ht
-    vec[2] = median_dd
-    vec[3] = mad_dd
-    vec[4] = math.log1p(cpm)
-    vec[5] = float(pauses_over_200)
-    vec[6] = float(len(holds))
-    vec[7] = safe_div(median_ht, median_dd)
-
-    vec[0:5] = vec[0:5] / np.array([2000.0, 2000.0, 2000.0, 2000.0, 10.0], dtype=np.float32)
+        if (text_lengths[-1] - text_lengths[-2]) > max(10, 5 * char_key_events):
+            paste_flag = True
 
-    norm = np.linalg.norm(vec)
-    if norm == 0:
-        norm = 1.0
-    vec = vec / norm
+    vec = assemble_vector(median_ht, mad_ht, median_dd, mad_dd, cpm, pauses_over_200, n_holds, pair_vals)
 
     meta = {
         "median_ht": median_ht,
@@ -121,12 +254,146 @@ def extract_features(events):
         "pauses_over_200": pauses_over_200,
         "chars": char_key_events,
         "duration_ms": duration,
-        "paste_detected_explicit": bool(paste_events),
-        "paste_detected_heuristic": paste_flag and not bool(paste_events),
-        "blur_count": len(blur_events),
-        "focus_count": len(focus_events),
-        "sample_hold_times": holds[:32],
-        "sample_dd_times": dd_list[:32],
+        "paste_detected_explicit": bool(n_paste),
+        "paste_detected_heuristic": paste_flag and not bool(n_paste),
+        "blur_count": int(np.count_nonzero(types == EV_BLUR)),
+        "focus_count": int(np.count_nonzero(types == EV_FOCUS)),
+        "sample_hold_times": holds[:32].tolist(),
+        "sample_dd_times": dd[:32].tolist(),
+        **pair_meta,
     }
 
     return {"feature_vector": vec.astype(np.float32), "paste_flag": paste_flag, "meta": meta}
+
+def extract_features_batch(windows):
+    """
+    extract_features for many event lists in one vectorized pass.
+
+    The windows' events are concatenated into one set of typed arrays
+    (keystroke_pairing.windows_to_arrays) tagged with their window index, and
+    every statistic is computed per window at once: medians, MADs and
+    quantiles sort by (window, value) once per quantity and index into the
+    window's run. Pairing is still a single sequential pass over all events
+    (a per-key state machine). Returns one extract_features() result per
+    window, in order.
+    """
+    n = len(windows)
+    types, keys, rts, seg, key_names = windows_to_arrays(windows)
+
+    n_down = np.bincount(seg[types == EV_KEYDOWN], minlength=n)
+    n_up = np.bincount(seg[types == EV_KEYUP], minlength=n)
+    n_paste = np.bincount(seg[types == EV_PASTE], minlength=n)
+    n_blur = np.bincount(seg[types == EV_BLUR], minlength=n)
+    n_focus = np.bincount(seg[types == EV_FOCUS], minlength=n)
+    chars = n_down + n_up
+
+    # presses / digraphs (consecutive presses of the same window)
+    pairs = pair_keys_batch(types, keys, seg, n)
+    pseg = seg[pairs.down_idx]
+    down = rts[pairs.down_idx]
+    up = rts[pairs.up_idx]
+    holds = np.maximum(up - down, 0.0)
+    n_press = np.bincount(pseg, minlength=n)
+    same = pseg[1:] == pseg[:-1]
+    dseg = pseg[1:][same]
+    dd = (down[1:] - down[:-1])[same]
+    ud = (down[1:] - up[:-1])[same]
+    du = (up[1:] - down[:-1])[same]
+
+    groups = np.array([key_group(k) for k in key_names], dtype=np.int8)[keys[pairs.down_idx]] \
+        if key_names else np.zeros(0, dtype=np.int8)
+    letter = (groups == KG_VOWEL) | (groups == KG_CONSONANT)
+    space = groups == KG_SPACE
+    a, b = letter[:-1], letter[1:]
+    trans = np.select([a & b, a & space[1:], space[:-1] & b], [0, 1, 2], 3)[same]
+
+    # slots 8.., see pair_features
+    out = np.zeros((n, N_PAIR_SLOTS), dtype=np.float64)
+    out[:, 0], out[:, 1] = _segment_median_mad(ud, dseg, n)
+    out[:, 2], out[:, 3] = _segment_median_mad(du, dseg, n)
+    out[:, 4] = _ratio(np.bincount(dseg[ud < 0], minlength=n), np.bincount(dseg, minlength=n))
+    out[:, 5:9] = _segment_quantiles(holds, pseg, n)
+    out[:, 9:13] = _segment_quantiles(dd, dseg, n)
+    out[:, 13:17] = _segment_quantiles(ud, dseg, n)
+    out[:, 17] = _ratio(np.bincount(pseg[groups == KG_BACKSPACE], minlength=n), n_press)
+    out[:, 18] = _ratio(np.bincount(pseg[groups == KG_MODIFIER], minlength=n), n_press)
+    out[:, 19] = _ratio(pairs.auto_repeats, n_down)
+    out[:, 20] = _ratio(pairs.orphan_ups + pairs.orphan_downs, chars)
+    grouped = groups >= 0
+    out[:, 21:29] = _segment_median(
+        holds[grouped], pseg[grouped] * N_KEY_GROUPS + groups[grouped], n * N_KEY_GROUPS
+    ).reshape(n, N_KEY_GROUPS)
+    out[:, 29:33] = _segment_median(dd, dseg * 4 + trans, n * 4).reshape(n, 4)
+    out[:, LATENCY_SLOTS] /= 2000.0
+
+    # slots 0-7 (float32 medians like extract_features)
+    kd = np.flatnonzero(types == EV_KEYDOWN)
+    kseg = seg[kd]
+    same_kd = kseg[1:] == kseg[:-1]
+    gseg = kseg[1:][same_kd]
+    gaps = np.maximum(np.diff(rts[kd]), 0.0)[same_kd]
+    median_ht, mad_ht = _segment_median_mad(holds.astype(np.float32), pseg, n)
+    median_dd, mad_dd = _segment_median_mad(gaps.astype(np.float32), gseg, n)
+    pauses = np.bincount(gseg[gaps > 200.0], minlength=n)
+    n_gaps = np.bincount(gseg, minlength=n)
+
+    durations = [(ev[-1].get("ts", 0) - ev[0].get("ts", 0)) if ev else 0 for ev in windows]
+    cpm = [(int(c) / d) * 60000.0 if d > 0 else 0.0 for c, d in zip(chars, durations)]
+
+    # vector assembly, as assemble_vector
+    vec = np.zeros((n, 64), dtype=np.float32)
+    vec[:, 0] = median_ht
+    vec[:, 1] = mad_ht
+    vec[:, 2] = median_dd
+    vec[:, 3] = mad_dd
+    vec[:, 4] = [math.log1p(c) for c in cpm]
+    vec[:, 5] = pauses
+    vec[:, 6] = np.maximum(n_press, 1)
+    vec[:, 7] = _ratio(median_ht.astype(np.float64), median_dd.astype(np.float64))
+    vec[:, 0:5] /= np.array([2000.0, 2000.0, 2000.0, 2000.0, 10.0], dtype=np.float32)
+    vec[:, PAIR_SLOT_START:PAIR_SLOT_START + N_PAIR_SLOTS] = out
+    norms = np.linalg.norm(vec, axis=1)
+    norms[norms == 0] = 1.0
+    vec /= norms[:, None]
+
+    press_start = np.cumsum(n_press) - n_press
+    gap_start = np.cumsum(n_gaps) - n_gaps
+    results = []
+    for w, events in enumerate(windows):
+        if not events:
+            results.append({"feature_vector": np.zeros(64, dtype=np.float32), "paste_flag": False, "meta": {}})
+            continue
+
+        explicit = bool(n_paste[w])
+        paste_flag = explicit
+        clipboard_lengths = [e.get("clipboardLength") for e in events if e.get("clipboardLength")]
+        if clipboard_lengths and max(clipboard_lengths) > max(5, 3 * int(chars[w])):
+            paste_flag = True
+        text_lengths = [e.get("textLen") for e in events if e.get("textLen") is not None]
+        if len(text_lengths) >= 2 and (text_lengths[-1] - text_lengths[-2]) > max(10, 5 * int(chars[w])):
+            paste_flag = True
+
+        p0, g0 = press_start[w], gap_start[w]
+        meta = {
+            "median_ht": float(median_ht[w]),
+            "mad_ht": float(mad_ht[w]),
+            "median_dd": float(median_dd[w]),
+            "mad_dd": float(mad_dd[w]),
+            "cpm": cpm[w],
+            "pauses_over_200": int(pauses[w]),
+            "chars": int(chars[w]),
+            "duration_ms": durations[w],
+            "paste_detected_explicit": explicit,
+            "paste_detected_heuristic": paste_flag and not explicit,
+            "blur_count": int(n_blur[w]),
+            "focus_count": int(n_focus[w]),
+            "sample_hold_times": holds[p0:p0 + min(32, n_press[w])].tolist() if n_press[w] else [0.0],
+            "sample_dd_times": gaps[g0:g0 + min(32, n_gaps[w])].tolist() if n_gaps[w] else [0.0],
+            "pairs": int(n_press[w]),
+            "auto_repeats": int(pairs.auto_repeats[w]),
+            "orphan_keyups": int(pairs.orphan_ups[w]),
+            "orphan_keydowns": int(pairs.orphan_downs[w]),
+            "rollover_fraction": float(out[w, 4]),
+        }
+        results.append({"feature_vector": vec[w], "paste_flag": paste_flag, "meta": meta})
+    return results
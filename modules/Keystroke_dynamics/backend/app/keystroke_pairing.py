@@ -0,0 +1,150 @@
+# app/keystroke_pairing.py
+"""
+Shared keydown/keyup pairing used by feature_extractor and session_service.
+
+Presses are paired per key in one pass over the events:
+  - keydown opens a press for its key; further keydowns while the key is
+    still held are auto-repeats (counted, the first keydown is kept)
+  - keyup closes the open press of the same key, so overlapping keys
+    (rollover) pair correctly regardless of release order
+  - keyup with no open press, and presses still open at the end, are orphans
+"""
+import numpy as np
+
+# event type codes used in the typed arrays
+EV_OTHER, EV_KEYDOWN, EV_KEYUP, EV_PASTE, EV_BLUR, EV_FOCUS = range(6)
+TYPE_CODES = {"keydown": EV_KEYDOWN, "keyup": EV_KEYUP, "paste": EV_PASTE, "blur": EV_BLUR, "focus": EV_FOCUS}
+
+def normalize_key(k):
+    # keyup may report "p" for a keydown "P" when shift is released first
+    return k.lower() if isinstance(k, str) and len(k) == 1 else k
+
+def events_to_arrays(events):
+    """
+    One pass over the event dicts -> typed arrays (events are not modified).
+
+    Returns (types int8, keys int32, ts float64, key_names); keys index into
+    key_names, ts is relative to the first event.
+    """
+    code = TYPE_CODES.get
+    key_ids = {}     # normalized name -> code
+    raw_ids = {}     # raw key value -> code (skips re-normalizing repeats)
+    types, keys, ts = [], [], []
+    for e in events:
+        types.append(code(e.get("type"), EV_OTHER))
+        k = e.get("key")
+        kid = raw_ids.get(k)
+        if kid is None:
+            kid = raw_ids[k] = key_ids.setdefault(normalize_key(k), len(key_ids))
+        keys.append(kid)
+        ts.append(e.get("ts", 0))
+    ts = np.array(ts, dtype=np.float64)
+    return np.array(types, dtype=np.int8), np.array(keys, dtype=np.int32), ts - ts[0], list(key_ids)
+
+def windows_to_arrays(windows):
+    """
+    events_to_arrays over many event lists at once -> (types, keys, ts, seg,
+    key_names): the windows' events concatenated, seg is the window index of
+    each event, ts is relative to the first event of its window and key codes
+    are shared by all windows.
+    """
+    code = TYPE_CODES.get
+    key_ids = {}
+    raw_ids = {}
+    types, keys, ts, seg, base = [], [], [], [], []
+    for w, events in enumerate(windows):
+        for e in events:
+            types.append(code(e.get("type"), EV_OTHER))
+            k = e.get("key")
+            kid = raw_ids.get(k)
+            if kid is None:
+                kid = raw_ids[k] = key_ids.setdefault(normalize_key(k), len(key_ids))
+            keys.append(kid)
+            ts.append(e.get("ts", 0))
+        seg.extend([w] * len(events))
+        base.extend([events[0].get("ts", 0) if events else 0] * len(events))
+    ts = np.array(ts, dtype=np.float64) - np.array(base, dtype=np.float64)
+    return (np.array(types, dtype=np.int8), np.array(keys, dtype=np.int32), ts,
+            np.array(seg, dtype=np.int64), list(key_ids))
+
+class Pairs:
+    """Paired presses as event indices, ordered by keydown."""
+
+    def __init__(self, down_idx, up_idx, auto_repeats, orphan_ups, orphan_downs):
+        self.down_idx = down_idx
+        self.up_idx = up_idx
+        self.auto_repeats = auto_repeats
+        self.orphan_ups = orphan_ups
+        self.orphan_downs = orphan_downs
+
+    def __len__(self):
+        return int(self.down_idx.size)
+
+def pair_keys(types, keys):
+    """Per-key pairing over typed arrays (see events_to_arrays) in O(n)."""
+    open_down = {}
+    downs, ups = [], []
+    auto_repeats = orphan_ups = 0
+
+    for i, (t, k) in enumerate(zip(types.tolist(), keys.tolist())):
+        if t == EV_KEYDOWN:
+            if k in open_down:
+                auto_repeats += 1
+            else:
+                open_down[k] = i
+        elif t == EV_KEYUP:
+            d = open_down.pop(k, None)
+            if d is None:
+                orphan_ups += 1
+            else:
+                downs.append(d)
+                ups.append(i)
+
+    down_idx = np.array(downs, dtype=np.int64)
+    up_idx = np.array(ups, dtype=np.int64)
+    order = np.argsort(down_idx, kind="stable")
+    return Pairs(down_idx[order], up_idx[order], auto_repeats, orphan_ups, len(open_down))
+
+def pair_keys_batch(types, keys, seg, n_windows):
+    """
+    pair_keys over windows_to_arrays output: presses never pair across
+    windows, and the auto-repeat / orphan counts are arrays per window.
+    """
+    open_down = {}
+    downs, ups = [], []
+    auto_repeats = np.zeros(n_windows, dtype=np.int64)
+    orphan_ups = np.zeros(n_windows, dtype=np.int64)
+
+    for i, (t, k, s) in enumerate(zip(types.tolist(), keys.tolist(), seg.tolist())):
+        if t == EV_KEYDOWN:
+            if (s, k) in open_down:
+                auto_repeats[s] += 1
+            else:
+                open_down[(s, k)] = i
+        elif t == EV_KEYUP:
+            d = open_down.pop((s, k), None)
+            if d is None:
+                orphan_ups[s] += 1
+            else:
+                downs.append(d)
+                ups.append(i)
+
+    orphan_downs = np.bincount(np.array([s for s, _ in open_down], dtype=np.int64), minlength=n_windows)
+    down_idx = np.array(downs, dtype=np.int64)
+    up_idx = np.array(ups, dtype=np.int64)
+    order = np.argsort(down_idx, kind="stable")
+    return Pairs(down_idx[order], up_idx[order], auto_repeats, orphan_ups, orphan_downs)
+
+def hold_times(pairs, ts):
+    return np.maximum(ts[pairs.up_idx] - ts[pairs.down_idx], 0.0)
+
+def digraph_latencies(pairs, ts):
+    """
+    Latencies between consecutive presses (k -> k+1):
+      dd = down[k+1] - down[k]
+      ud = down[k+1] - up[k]   (flight time, negative under rollover)
+      du = up[k+1]   - down[k]
+    """
+    down = ts[pairs.down_idx]
+    up = ts[pairs.up_idx]
+    return down[1:] - down[:-1], down[1:] - up[:-1], up[1:] - down[:-1]
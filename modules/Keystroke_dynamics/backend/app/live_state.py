@@ -0,0 +1,485 @@
+# app/live_state.py
+"""
+Incremental per-session feature state for /api/score_live.
+
+Each call ingests only the events not seen yet for the session, and scoring
+costs O(new events) instead of re-running the extractor over the whole
+rolling window:
+  - every derived value (hold, keydown gap, digraph latencies, key counts,
+    paste signals) is kept as a row stamped with the event that produced it;
+    rows older than KS_LIVE_COUNT_WINDOW_MS before the newest event expire
+  - values enter / leave sorted windows (SortedValues) as rows are added /
+    expired, so medians and quantiles are index lookups and MADs an
+    O(log n) selection; counts are running counters. The result is exact:
+    the vector matches extract_features() on the same window of events up
+    to edge effects (presses straddling the window start), which
+    tests/test_live_parity.py checks
+  - presses are paired per key with the same rules as app.keystroke_pairing
+    (rollover, auto-repeat, orphans)
+
+States live in a bounded LRU store with idle eviction.
+"""
+import os
+import time
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, OrderedDict, deque
+
+import numpy as np
+
+from app.keystroke_pairing import normalize_key
+from app.feature_extractor import (
+    assemble_vector, key_group, QUANTILES, N_PAIR_SLOTS, N_KEY_GROUPS,
+    LATENCY_SLOTS, KG_VOWEL, KG_CONSONANT, KG_SPACE, KG_BACKSPACE, KG_MODIFIER
+)
+
+LIVE_MAX_SESSIONS = int(os.getenv("KS_LIVE_MAX_SESSIONS", "5000"))
+LIVE_IDLE_S = float(os.getenv("KS_LIVE_IDLE_S", "1800"))
+LIVE_COUNT_WINDOW_MS = float(os.getenv("KS_LIVE_COUNT_WINDOW_MS", "30000"))
+RECENT_PRESSES = 32
+_QUANTILES = [float(q) for q in QUANTILES]
+
+class WindowSeries:
+    """(ts, values...) rows over a sliding time window, in arrival order."""
+
+    def __init__(self, window_ms, on_expire=None):
+        self.window_ms = window_ms
+        self.on_expire = on_expire
+        self.items = deque()
+
+    def add(self, ts, *values):
+        self.items.append((ts,) + values)
+
+    def expire(self, now_ts):
+        items = self.items
+        while items and items[0][0] < now_ts - self.window_ms:
+            row = items.popleft()
+            if self.on_expire is not None:
+                self.on_expire(row)
+
+    def count(self):
+        return len(self.items)
+
+class WindowMax:
+    """Sliding-window maximum (monotonic deque of (ts, value))."""
+
+    def __init__(self, window_ms):
+        self.window_ms = window_ms
+        self.items = deque()
+
+    def add(self, ts, value):
+        items = self.items
+        while items and items[-1][1] <= value:
+            items.pop()
+        items.append((ts, value))
+
+    def expire(self, now_ts):
+        items = self.items
+        while items and items[0][0] < now_ts - self.window_ms:
+            items.popleft()
+
+    def max(self, default=0):
+        return self.items[0][1] if self.items else default
+
+class SortedValues:
+    """
+    Sorted multiset of the values in a window. add / remove are a bisect plus
+    a list insert / delete; order statistics match feature_extractor's
+    _median, _median_mad and _quantiles on the same values.
+    """
+
+    __slots__ = ("v",)
+
+    def __init__(self):
+        self.v = []
+
+    def __len__(self):
+        return len(self.v)
+
+    def add(self, x):
+        insort(self.v, x)
+
+    def remove(self, x):
+        del self.v[bisect_left(self.v, x)]
+
+    def count_below(self, x):
+        return bisect_left(self.v, x)
+
+    def count_above(self, x):
+        return len(self.v) - bisect_right(self.v, x)
+
+    def median(self):
+        v = self.v
+        n = len(v)
+        if not n:
+            return 0.0
+        m = n // 2
+        return float(v[m]) if n % 2 else float((v[m - 1] + v[m]) / 2)
+
+    def mad(self, med):
+        """Median of |x - med| without materializing the deviations."""
+        v = self.v
+        n = len(v)
+        if not n:
+            return 0.0
+        # deviations are two ascending runs: med - v[p-1], med - v[p-2], ... and v[p] - med, ...
+        p = bisect_left(v, med)
+        m = n // 2
+        if n % 2:
+            return float(self._kth_deviation(med, p, m))
+        return float((self._kth_deviation(med, p, m - 1) + self._kth_deviation(med, p, m)) / 2)
+
+    def _kth_deviation(self, med, p, k):
+        # k-th (0-based) smallest of the merged runs, by bisecting how many come from the left run
+        v = self.v
+        n_left, n_right = p, len(v) - p
+        lo, hi = max(0, k + 1 - n_right), min(k + 1, n_left)
+        while True:
+            i = (lo + hi) // 2          # taken from the left run
+            j = k + 1 - i               # taken from the right run
+            if i < n_left and j > 0 and v[p + j - 1] - med > med - v[p - 1 - i]:
+                lo = i + 1
+            elif i > 0 and j < n_right and med - v[p - i] > v[p + j] - med:
+                hi = i - 1
+            else:
+                left = med - v[p - i] if i > 0 else -np.inf
+                right = v[p + j - 1] - med if j > 0 else -np.inf
+                return max(left, right)
+
+    def median_mad(self):
+        med = self.median()
+        return med, self.mad(med)
+
+    def quantiles(self):
+        """p10, p25, p75, p90 (np.quantile 'linear'; zeros when empty)."""
+        v = self.v
+        n = len(v)
+        if not n:
+            return [0.0] * len(_QUANTILES)
+        out = []
+        for q in _QUANTILES:
+            pos = q * (n - 1)
+            lo = int(pos)
+            hi = min(lo + 1, n - 1)
+            out.append(v[lo] + (v[hi] - v[lo]) * (pos - lo))
+        return out
+
+class LiveFeatureState:
+    def __init__(self, window_ms=LIVE_COUNT_WINDOW_MS):
+        self.lock = threading.Lock()
+        self.window_ms = window_ms
+        self.resets = 0
+        self.reset()
+
+    def reset(self):
+        """Forget everything seen so far (the lock and reset count are kept)."""
+        window_ms = self.window_ms
+        self.last_ts = None
+        self.at_last_ts = Counter()        # (type, key) of the events already seen at last_ts
+        self.first_ts = None
+        self.events_total = 0
+        self.touched = time.monotonic()
+
+        # windowed rows; expiring a row takes its values back out of the aggregates
+        self.win_keys = WindowSeries(window_ms, self._expire_key)          # (ts, is_keydown, is_auto_repeat)
+        self.win_dd = WindowSeries(window_ms, self._expire_gap)            # (ts, gap to previous keydown)
+        self.win_holds = WindowSeries(window_ms, self._expire_hold)        # (ts, hold, key group)
+        self.win_digraphs = WindowSeries(window_ms, self._expire_digraph)  # (ts, dd, ud, du, transition)
+        self.win_orphans = WindowSeries(window_ms)    # (ts,) keyups without an open press
+        self.win_pastes = WindowSeries(window_ms)
+        self.win_clipboard = WindowMax(window_ms)     # clipboardLength
+        self.windows = (
+            self.win_keys, self.win_dd, self.win_holds, self.win_digraphs,
+            self.win_orphans, self.win_pastes, self.win_clipboard
+        )
+        self.text_lengths = deque(maxlen=2)
+
+        # aggregates over the windowed rows
+        self.n_down = 0
+        self.n_repeat = 0
+        self.gaps = SortedValues()
+        self.holds = SortedValues()
+        self.group_holds = [SortedValues() for _ in range(N_KEY_GROUPS)]
+        self.dg_dd = SortedValues()
+        self.dg_ud = SortedValues()
+        self.dg_du = SortedValues()
+        self.transition_dd = [SortedValues() for _ in range(4)]
+
+        # pairing state
+        self.key_groups = {}
+        self.open_press = {}               # key -> press id
+        self.presses_by_id = OrderedDict() # press id -> [down_ts, up_ts, group, prev_id]
+        self.next_id = 0
+        self.last_press_id = None
+        self.prev_kd_ts = None
+
+    # ---------------- INGEST ----------------
+    def ingest(self, events):
+        """
+        Add the events not seen yet; returns how many were new.
+
+        Clients resend overlapping rolling windows, so the high-water mark is
+        last_ts plus the (type, key) of the events already taken at last_ts:
+        older events are skipped, and an event at last_ts is only skipped if an
+        identical one was already taken there (millisecond ties are common).
+        A window that ends before last_ts means the client clock restarted
+        (e.g. performance.now() after a reload): the state is reset.
+        """
+        if not events:
+            self.touched = time.monotonic()
+            return 0
+
+        newest = max(e.get("ts", 0) for e in events)
+        if self.last_ts is not None and newest < self.last_ts:
+            self.reset()
+            self.resets += 1
+
+        seen = self.last_ts
+        taken = Counter(self.at_last_ts)
+        new = 0
+        for e in events:
+            ts = e.get("ts", 0)
+            if seen is not None:
+                if ts < seen:
+                    continue
+                if ts == seen:
+                    sig = (e.get("type"), normalize_key(e.get("key")))
+                    if taken[sig] > 0:
+                        taken[sig] -= 1
+                        continue
+            self._add(e, ts)
+            new += 1
+
+        at_newest = Counter(
+            (e.get("type"), normalize_key(e.get("key"))) for e in events if e.get("ts", 0) == newest
+        )
+        if newest == seen:
+            at_newest |= self.at_last_ts
+        self.last_ts = newest
+        self.at_last_ts = at_newest
+
+        if new:
+            self.events_total += new
+            for w in self.windows:
+                w.expire(newest)
+        self.touched = time.monotonic()
+        return new
+
+    def _group(self, key):
+        g = self.key_groups.get(key)
+        if g is None:
+            g = self.key_groups[key] = key_group(key)
+        return g
+
+    def _add(self, e, ts):
+        if self.first_ts is None:
+            self.first_ts = ts
+        typ = e.get("type")
+
+        if e.get("clipboardLength"):
+            self.win_clipboard.add(ts, e.get("clipboardLength"))
+        if e.get("textLen") is not None:
+            self.text_lengths.append(e.get("textLen"))
+
+        if typ == "keydown":
+            if self.prev_kd_ts is not None:
+                gap = max(0.0, ts - self.prev_kd_ts)
+                self.win_dd.add(ts, gap)
+                self.gaps.add(gap)
+            self.prev_kd_ts = ts
+            repeat = self._keydown(normalize_key(e.get("key")), ts)
+            self.win_keys.add(ts, True, repeat)
+            self.n_down += 1
+            self.n_repeat += repeat
+        elif typ == "keyup":
+            self.win_keys.add(ts, False, False)
+            self._keyup(normalize_key(e.get("key")), ts)
+        elif typ == "paste":
+            self.win_pastes.add(ts)
+
+    def _keydown(self, key, ts):
+        """Open a press; returns True for an auto-repeat of a held key."""
+        if key in self.open_press:
+            return True
+        pid = self.next_id
+        self.next_id += 1
+        self.open_press[key] = pid
+        self.presses_by_id[pid] = [ts, None, self._group(key), self.last_press_id]
+        self.last_press_id = pid
+        while len(self.presses_by_id) > RECENT_PRESSES:
+            self.presses_by_id.popitem(last=False)
+        return False
+
+    def _keyup(self, key, ts):
+        pid = self.open_press.pop(key, None)
+        press = self.presses_by_id.get(pid) if pid is not None else None
+        if press is None:
+            self.win_orphans.add(ts)
+            return
+
+        press[1] = ts
+        hold = max(0.0, ts - press[0])
+        self.win_holds.add(ts, hold, press[2])
+        self.holds.add(hold)
+        if 0 <= press[2] < N_KEY_GROUPS:
+            self.group_holds[press[2]].add(hold)
+
+        # a digraph is emitted when the later of two consecutive presses completes
+        prev = self.presses_by_id.get(press[3]) if press[3] is not None else None
+        if prev is not None and prev[1] is not None:
+            self._digraph(ts, prev, press)
+        nxt = self.presses_by_id.get(pid + 1)
+        if nxt is not None and nxt[3] == pid and nxt[1] is not None:
+            self._digraph(ts, press, nxt)
+
+    def _digraph(self, ts, a, b):
+        la = a[2] in (KG_VOWEL, KG_CONSONANT)
+        lb = b[2] in (KG_VOWEL, KG_CONSONANT)
+        if la and lb:
+            t = 0
+        elif la and b[2] == KG_SPACE:
+            t = 1
+        elif a[2] == KG_SPACE and lb:
+            t = 2
+        else:
+            t = 3
+        dd, ud, du = b[0] - a[0], b[0] - a[1], b[1] - a[0]
+        self.win_digraphs.add(ts, dd, ud, du, t)
+        self.dg_dd.add(dd)
+        self.dg_ud.add(ud)
+        self.dg_du.add(du)
+        self.transition_dd[t].add(dd)
+
+    # ---------------- EXPIRY ----------------
+    def _expire_key(self, row):
+        if row[1]:
+            self.n_down -= 1
+            self.n_repeat -= row[2]
+
+    def _expire_gap(self, row):
+        self.gaps.remove(row[1])
+
+    def _expire_hold(self, row):
+        self.holds.remove(row[1])
+        if 0 <= row[2] < N_KEY_GROUPS:
+            self.group_holds[row[2]].remove(row[1])
+
+    def _expire_digraph(self, row):
+        self.dg_dd.remove(row[1])
+        self.dg_ud.remove(row[2])
+        self.dg_du.remove(row[3])
+        self.transition_dd[row[4]].remove(row[1])
+
+    # ---------------- FEATURES ----------------
+    def features(self):
+        """Same layout as extract_features: {feature_vector, paste_flag, meta}."""
+        # slots 0-7, like extract_features (zero when empty)
+        median_ht, mad_ht = self.holds.median_mad()
+        median_dd, mad_dd = self.gaps.median_mad()
+
+        key_events = self.win_keys.count()
+        span = (self.last_ts - self.win_keys.items[0][0]) if key_events else 0.0
+        cpm = (key_events / span) * 60000.0 if span > 0 else 0.0
+        pauses = self.gaps.count_above(200.0)
+
+        # slots 8-40, see feature_extractor.pair_features
+        n_press = len(self.holds)
+        n_down = self.n_down
+        auto_repeats = self.n_repeat
+        orphan_ups = self.win_orphans.count()
+        n_ud = len(self.dg_ud)
+
+        out = np.zeros(N_PAIR_SLOTS, dtype=np.float64)
+        out[0:2] = self.dg_ud.median_mad()
+        out[2:4] = self.dg_du.median_mad()
+        out[4] = self.dg_ud.count_below(0) / n_ud if n_ud else 0.0
+        out[5:9] = self.holds.quantiles()
+        out[9:13] = self.dg_dd.quantiles()
+        out[13:17] = self.dg_ud.quantiles()
+        out[17] = len(self.group_holds[KG_BACKSPACE]) / n_press if n_press else 0.0
+        out[18] = len(self.group_holds[KG_MODIFIER]) / n_press if n_press else 0.0
+        out[19] = auto_repeats / n_down if n_down else 0.0
+        out[20] = (orphan_ups + len(self.open_press)) / key_events if key_events else 0.0
+        out[21:21 + N_KEY_GROUPS] = [g.median() for g in self.group_holds]
+        out[29:33] = [t.median() for t in self.transition_dd]
+        out[LATENCY_SLOTS] /= 2000.0
+
+        vec = assemble_vector(median_ht, mad_ht, median_dd, mad_dd, cpm, pauses, n_press, out)
+
+        explicit = self.win_pastes.count() > 0
+        paste_flag = explicit or self.win_clipboard.max() > max(5, 3 * key_events)
+        if len(self.text_lengths) == 2 and (self.text_lengths[1] - self.text_lengths[0]) > max(10, 5 * key_events):
+            paste_flag = True
+
+        meta = {
+            "median_ht": median_ht,
+            "mad_ht": mad_ht,
+            "median_dd": median_dd,
+            "mad_dd": mad_dd,
+            "cpm": cpm,
+            "pauses_over_200": pauses,
+            "chars": key_events,
+            "duration_ms": (self.last_ts - self.first_ts) if self.first_ts is not None else 0,
+            "paste_detected_explicit": explicit,
+            "paste_detected_heuristic": paste_flag and not explicit,
+            "pairs": n_press,
+            "auto_repeats": auto_repeats,
+            "orphan_keyups": orphan_ups,
+            "orphan_keydowns": len(self.open_press),
+            "rollover_fraction": float(out[4]),
+            "events_total": self.events_total,
+            "state_resets": self.resets,
+            "window_ms": self.window_ms,
+        }
+        return {"feature_vector": vec.astype(np.float32), "paste_flag": paste_flag, "meta": meta}
+
+class LiveStateStore:
+    """Bounded LRU of LiveFeatureState with idle eviction."""
+
+    def __init__(self, max_sessions=LIVE_MAX_SESSIONS, idle_s=LIVE_IDLE_S):
+        self.max_sessions = max_sessions
+        self.idle_s = idle_s
+        self._lock = threading.Lock()
+        self._states = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                self._evict_idle(now)
+                state = self._states[key] = LiveFeatureState()
+                self.created += 1
+                while len(self._states) > self.max_sessions:
+                    self._states.popitem(last=False)
+                    self.evicted += 1
+            self._states.move_to_end(key)
+            state.touched = now
+            return state
+
+    def drop(self, key):
+        with self._lock:
+            self._states.pop(key, None)
+
+    def _evict_idle(self, now):
+        # LRU order == touch order, so idle states are at the front
+        while self._states:
+            key, state = next(iter(self._states.items()))
+            if now - state.touched <= self.idle_s:
+                break
+            self._states.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._states),
+                "created": self.created,
+                "evicted": self.evicted,
+                "max_sessions": self.max_sessions,
+                "idle_s": self.idle_s,
+            }
+
+live_states = LiveStateStore()
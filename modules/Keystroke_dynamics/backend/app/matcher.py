@@ -39,7 +39,20 @@ def decide_score_and_verdict(feature_vector, templates, paste_flag):
 
     mean_t = np.mean(np.stack(clean, axis=0), axis=0)
     score = cosine_similarity(feature_vector, mean_t)
+    return verdict_for(score, paste_flag)
 
+def decide_from_mean(feature_vector, mean_unit, paste_flag):
+    """
+    Same as decide_score_and_verdict, from a precomputed L2-normalized mean
+    template (see app.template_cache); mean_unit None -> no_template.
+    """
+    if mean_unit is None or feature_vector is None or feature_vector.size != mean_unit.size:
+        return {"score": 0.0, "verdict": "no_template"}
+    n = np.linalg.norm(feature_vector)
+    score = float(np.dot(feature_vector, mean_unit) / n) if n else 0.0
+    return verdict_for(score, paste_flag)
+
+def verdict_for(score, paste_flag):
     # Malpractice override
     if paste_flag:
         return {"score": score, "verdict": "suspicious_paste"}
@@ -3,8 +3,11 @@ from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional
 import app.database as database
-from app.feature_extractor import extract_features
-from app.matcher import bytes_to_vector, decide_score_and_verdict
+from app.feature_extractor import extract_features, extract_features_batch
+from app.matcher import decide_from_mean, verdict_for
+from app.config import BATCH_MAX_WINDOWS
+from app.live_state import live_states
+from app.template_cache import template_cache, lookup_key
 import numpy as np, logging, json
 
 router = APIRouter(prefix="/api", tags=["api"])
@@ -13,6 +16,7 @@ logger = logging.getLogger("keystroke_realtime")
 class LiveScoreReq(BaseModel):
     candidate_id: Optional[int] = None   # prefer candidate_id for local templates
     user_id: Optional[str] = None        # fallback to user_id -> profiles.user_id
+    session_id: Optional[str] = None     # when set, features are accumulated server-side per session
     events: List[dict]
 
 @router.post("/score_live")
@@ -20,6 +24,8 @@ def score_live(req: LiveScoreReq):
     """
     Compute a similarity score for a short rolling window of events.
     Accepts candidate_id or user_id to look up stored templates.
+    With session_id, only events newer than the last call are ingested into
+    the session's incremental feature state (app.live_state).
     Returns score (0..1 float), verdict (accepted/review/rejected/no_template), meta.
     """
     if not req.events:
@@ -27,51 +33,23 @@ def score_live(req: LiveScoreReq):
 
     db = database.database.get_conn()
     try:
-        # load template embeddings from profiles table
-        templates = []
-        if req.candidate_id:
-            rows = db.execute("SELECT embedding, template FROM profiles WHERE user_id = ? OR id = ?",
-                              (str(req.candidate_id), req.candidate_id)).fetchall()
-        elif req.user_id:
-            rows = db.execute("SELECT embedding, template FROM profiles WHERE user_id = ? LIMIT 10",
-                              (req.user_id,)).fetchall()
+        # decoded templates (contiguous float32 + normalized mean), cached per lookup
+        tpl = template_cache.get(db, lookup_key(req.candidate_id, req.user_id, limit=10))
+
+        if req.session_id:
+            state = live_states.get((req.session_id, str(req.candidate_id or req.user_id or "")))
+            with state.lock:
+                new_events = state.ingest(req.events)
+                feat_res = state.features()
+            feat_res["meta"]["events_new"] = new_events
         else:
-            rows = []
-
-        for r in rows:
-            # prefer binary embedding column; fallback to JSON template_features
-            try:
-                emb = None
-                if r and len(r) >= 1 and r[0] is not None:
-                    emb = bytes_to_vector(r[0])
-                elif r and len(r) >= 2 and r[1]:
-                    # try reading template_features.json -> construct a tiny vector from mean_hold/mean_dd
-                    try:
-                        tpl_json = json.loads(r[1])
-                        tf = tpl_json.get("template_features") or tpl_json.get("template") or tpl_json
-                        if tf and tf.get("mean_hold") is not None:
-                            # simple two-dim vector -> turn into float32 vector of length 64 to match model
-                            v = np.zeros(64, dtype=np.float32)
-                            v[0] = float(tf.get("mean_hold", 0.0))
-                            v[2] = float(tf.get("mean_dd", 0.0))
-                            # simple normalization
-                            n = np.linalg.norm(v) or 1.0
-                            v = v / n
-                            emb = v
-                    except Exception:
-                        pass
-                if emb is not None:
-                    templates.append(emb)
-            except Exception:
-                logger.exception("template decode failed")
-
-        feat_res = extract_features(req.events)
+            feat_res = extract_features(req.events)
         vec = feat_res.get("feature_vector")
         paste_flag = feat_res.get("paste_flag", False)
         meta = feat_res.get("meta", {})
 
         # if templates empty -> no_template
-        if not templates:
+        if tpl is None:
             return {"score": None, "verdict": "no_template", "meta": meta}
 
         # ensure numpy array for vec
@@ -83,7 +61,7 @@ def score_live(req: LiveScoreReq):
         except Exception:
             pass
 
-        verdict = decide_score_and_verdict(vec, templates, paste_flag)
+        verdict = decide_from_mean(vec, tpl.mean_unit, paste_flag)
         # return human-friendly numeric score 0..1
         score = float(verdict.get("score") or 0.0)
         vname = verdict.get("verdict")
@@ -92,6 +70,88 @@ def score_live(req: LiveScoreReq):
         try: db.close()
         except: pass
 
+class BatchWindow(BaseModel):
+    candidate_id: Optional[int] = None
+    user_id: Optional[str] = None
+    events: List[dict]
+
+class BatchScoreReq(BaseModel):
+    windows: List[BatchWindow]
+    include_meta: bool = False
+
+@router.post("/score_batch")
+def score_batch(req: BatchScoreReq):
+    """
+    Score many (candidate/user, events) windows in one call.
+    Windows are grouped by template lookup so each user's templates are loaded
+    once (through the template cache), features of all windows come from one
+    extract_features_batch pass, and all cosine similarities from one
+    vectorized row-wise dot product of the feature matrix (n x 64) with each
+    window's user mean template.
+    Results are returned in request order with the same verdicts as score_live;
+    windows without events get score None and an error.
+    """
+    if not req.windows:
+        raise HTTPException(status_code=400, detail="windows required")
+    if len(req.windows) > BATCH_MAX_WINDOWS:
+        raise HTTPException(status_code=413, detail=f"at most {BATCH_MAX_WINDOWS} windows per batch")
+
+    # group windows by template lookup
+    groups = {}
+    for i, w in enumerate(req.windows):
+        groups.setdefault(lookup_key(w.candidate_id, w.user_id, limit=10), []).append(i)
+
+    db = database.database.get_conn()
+    try:
+        means, tpl_col = [], {}
+        for key in groups:
+            tpl = template_cache.get(db, key)
+            if tpl is not None:
+                tpl_col[key] = len(means)
+                means.append(tpl.mean_unit)
+    finally:
+        try: db.close()
+        except: pass
+
+    # one vectorized feature pass over every non-empty window
+    nonempty = [i for i, w in enumerate(req.windows) if w.events]
+    extracted = dict(zip(nonempty, extract_features_batch([req.windows[i].events for i in nonempty])))
+
+    results = [None] * len(req.windows)
+    feats = np.zeros((len(req.windows), 64), dtype=np.float32)
+    cols = np.full(len(req.windows), -1, dtype=np.int64)
+    scored = []
+    for key, idx in groups.items():
+        col = tpl_col.get(key, -1)
+        for i in idx:
+            feat_res = extracted.get(i)
+            if feat_res is None:
+                results[i] = {"score": None, "verdict": None, "error": "events required"}
+                continue
+            res = {"paste_flag": feat_res["paste_flag"]}
+            if req.include_meta:
+                res["meta"] = feat_res["meta"]
+            results[i] = res
+            if col < 0:
+                res.update(score=None, verdict="no_template")
+                continue
+            feats[i] = feat_res["feature_vector"]
+            cols[i] = col
+            scored.append(i)
+
+    if scored:
+        rows = np.array(scored, dtype=np.int64)
+        f = feats[rows]
+        norms = np.linalg.norm(f, axis=1)
+        norms[norms == 0] = 1.0
+        # one dot product per window against its own user's mean template
+        sims = np.einsum("ij,ij->i", f, np.stack(means)[cols[rows]]) / norms
+        for i, s in zip(scored, sims.tolist()):
+            res = results[i]
+            res.update(verdict_for(float(s), res["paste_flag"]))
+
+    return {"results": results, "count": len(results), "templates_loaded": len(means)}
+
 @router.get("/profile/{candidate_id}")
 def get_profile(candidate_id: int):
     """Return stored profile template and embedding info for a candidate (if exists)."""
@@ -144,31 +204,17 @@ async def submit_events_legacy(request: Request):
             db.execute("INSERT INTO profiles (user_id, template, created_at, updated_at) VALUES (?, ?, datetime('now'), datetime('now'))",
                        (str(user_id), json.dumps({"template_features": feat.get("meta", {})})))
             db.commit()
+            template_cache.invalidate(user_id)
             return {"status": "enrolled", "meta": feat.get("meta", {})}
         # verification: load templates
-        rows = db.execute("SELECT embedding, template FROM profiles WHERE user_id = ?", (str(user_id),)).fetchall()
-        templates = []
-        for r in rows:
-            if r[0]:
-                try:
-                    import numpy as np
-                    templates.append(bytes_to_vector(r[0]))
-                except Exception:
-                    pass
-            elif r[1]:
-                try:
-                    tplj = json.loads(r[1])
-                    tf = tplj.get("template_features") or tplj
-                    import numpy as np
-                    v = np.zeros(64, dtype=np.float32)
-                    v[0] = float(tf.get("mean_hold", 0.0))
-                    v[2] = float(tf.get("mean_dd", 0.0))
-                    n = np.linalg.norm(v) or 1.0
-                    templates.append(v / n)
-                except Exception:
-                    pass
-        res = decide_score_and_verdict(vec, templates, paste_flag)
+        tpl = template_cache.get(db, lookup_key(user_id=user_id))
+        res = decide_from_mean(vec, tpl.mean_unit if tpl is not None else None, paste_flag)
         return {"score": float(res.get("score") or 0.0), "verdict": res.get("verdict"), "meta": feat.get("meta", {})}
     finally:
         try: db.close()
         except: pass
+
+@router.get("/cache_stats")
+def cache_stats():
+    """Template cache and live feature state counters."""
+    return {"templates": template_cache.stats(), "live_states": live_states.stats()}
@@ -3,6 +3,10 @@ import uuid, json, logging
 from datetime import datetime
 from typing import List, Dict, Any
 
+import numpy as np
+
+from app.keystroke_pairing import EV_KEYDOWN, events_to_arrays, pair_keys, hold_times
+
 logger = logging.getLogger("keystroke_session")
 
 def _now_str():
@@ -12,26 +16,13 @@ def extract_features(events: List[Dict[str,Any]]):
     """Return simple aggregate features used by compute_template_from_samples and small metadata."""
     if not events:
         return {"mean_hold": None, "mean_dd": None, "num_events": 0}
-    holds = []
-    last_down = {}
-    for e in events:
-        t = e.get("ts")
-        typ = e.get("type")
-        key = e.get("key")
-        if typ == "keydown":
-            last_down[key] = t
-        elif typ == "keyup" and key in last_down:
-            holds.append(t - last_down[key])
-            del last_down[key]
-    dd = []
-    prev_down = None
-    for e in events:
-        if e.get("type") == "keydown":
-            if prev_down is not None:
-                dd.append(e["ts"] - prev_down)
-            prev_down = e["ts"]
+    types, keys, rts, _ = events_to_arrays(events)
+    # same per-key pairing as the 64-d extractor (rollover / auto-repeat / orphan safe)
+    holds = hold_times(pair_keys(types, keys), rts)
+    down_ts = rts[types == EV_KEYDOWN]
+    dd = np.diff(down_ts)
     def mean(arr):
-        return sum(arr)/len(arr) if arr else None
+        return float(arr.mean()) if arr.size else None
     return {"mean_hold": mean(holds), "mean_dd": mean(dd), "num_events": len(events)}
 
 def compute_template_from_samples(samples: List[List[Dict[str,Any]]]):
@@ -0,0 +1,232 @@
+# app/template_cache.py
+"""
+In-memory cache of decoded enrollment templates for verification.
+
+Each entry holds one lookup's templates as a contiguous float32 sample matrix
+(n x 64) plus the L2-normalized mean template, so scoring is a single dot
+product instead of re-querying profiles, re-decoding BLOBs / template JSON and
+re-stacking the mean on every call.
+
+  - entries are keyed by lookup: ("candidate", id), ("user", user_id, limit),
+    ("embedding", user_id) and remember the profiles.user_id values their rows
+    resolved to (a candidate lookup also matches profiles.id)
+  - enrollment writes call invalidate(user_id), which drops every entry that
+    resolved to that user; entries also expire after
+    KS_TEMPLATE_CACHE_TTL_S so writes from other worker processes show up
+  - entries remember the MODEL_VERSION they were decoded under and are
+    reloaded once it changes
+  - lookups without any usable template are not cached (no_template stays
+    live until the user enrolls)
+  - embeddings are only used when profiles.model_version matches
+    MODEL_VERSION; a user with only stale embeddings is scored against their
+    enrollment samples re-extracted with the current extractor
+  - bounded LRU with hit / miss / eviction counters
+"""
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.config import MODEL_VERSION
+from app.feature_extractor import extract_features
+from app.matcher import bytes_to_vector
+
+TEMPLATE_CACHE_MAX_USERS = int(os.getenv("KS_TEMPLATE_CACHE_MAX_USERS", "2000"))
+TEMPLATE_CACHE_TTL_S = float(os.getenv("KS_TEMPLATE_CACHE_TTL_S", "300"))
+FEATURE_DIM = 64
+
+logger = logging.getLogger("keystroke_templates")
+
+class UserTemplates:
+    """Decoded templates of one lookup."""
+
+    __slots__ = ("samples", "mean_unit", "user_ids", "model_version", "loaded")
+
+    def __init__(self, samples, user_ids=(), model_version=None):
+        self.samples = samples          # (n, FEATURE_DIM) float32, C-contiguous
+        self.user_ids = frozenset(user_ids)
+        self.model_version = model_version
+        mean = samples.mean(axis=0)
+        n = np.linalg.norm(mean)
+        self.mean_unit = np.ascontiguousarray(mean / n if n else mean, dtype=np.float32)
+        self.loaded = time.monotonic()
+
+    def __len__(self):
+        return int(self.samples.shape[0])
+
+def template_from_json(template_json):
+    """Fallback vector from template JSON (mean_hold / mean_dd), or None."""
+    tpl = json.loads(template_json)
+    tf = tpl.get("template_features") or tpl.get("template") or tpl
+    if not tf or tf.get("mean_hold") is None:
+        return None
+    v = np.zeros(FEATURE_DIM, dtype=np.float32)
+    v[0] = float(tf.get("mean_hold", 0.0))
+    v[2] = float(tf.get("mean_dd", 0.0))
+    n = np.linalg.norm(v) or 1.0
+    return v / n
+
+def decode_rows(rows, json_fallback=True):
+    """
+    profiles rows (embedding, template, model_version, ...) -> (vectors, stale).
+    Embeddings from another extractor version (or unversioned) are skipped
+    and counted as stale: their slots no longer mean the same features.
+    """
+    out, stale = [], 0
+    for r in rows:
+        try:
+            emb = None
+            if r[0]:
+                if r[2] != MODEL_VERSION:
+                    stale += 1
+                    continue
+                emb = bytes_to_vector(r[0])
+            elif json_fallback and r[1]:
+                emb = template_from_json(r[1])
+            if emb is not None and emb.size == FEATURE_DIM:
+                out.append(emb)
+        except Exception:
+            logger.exception("template decode failed")
+    return out, stale
+
+def rederive_templates(db, user_id):
+    """Current-version vectors from the user's stored enrollment samples (keystroke_samples)."""
+    try:
+        rows = db.execute("SELECT events_json FROM keystroke_samples WHERE user_id = ? AND enrollment = 1 ORDER BY id",
+                          (str(user_id),)).fetchall()
+    except sqlite3.OperationalError:
+        # no samples table in this database
+        return []
+    out = []
+    for r in rows:
+        try:
+            events = json.loads(r[0] or "[]")
+        except ValueError:
+            continue
+        if events:
+            out.append(extract_features(events)["feature_vector"])
+    return out
+
+def lookup_key(candidate_id=None, user_id=None, limit=None):
+    if candidate_id:
+        return ("candidate", str(candidate_id))
+    if user_id:
+        return ("user", str(user_id), limit)
+    return None
+
+def load_profile_templates(db, key):
+    """
+    Query + decode the profiles rows behind a lookup_key()
+    -> (vectors, user_ids the rows belong to, stale, rederived).
+    When every embedding is stale, the user's enrollment samples are re-extracted
+    with the current extractor instead (see migrate_profile_embeddings.py to
+    persist that).
+    """
+    kind, ident = key[0], key[1]
+    if kind == "candidate":
+        rows = db.execute("SELECT embedding, template, model_version, user_id FROM profiles WHERE user_id = ? OR id = ?",
+                          (ident, int(ident) if ident.isdigit() else ident)).fetchall()
+        templates, stale = decode_rows(rows)
+    elif kind == "user":
+        sql = "SELECT embedding, template, model_version, user_id FROM profiles WHERE user_id = ?"
+        if key[2]:
+            sql += " LIMIT %d" % int(key[2])
+        rows = db.execute(sql, (ident,)).fetchall()
+        templates, stale = decode_rows(rows)
+    elif kind == "embedding":
+        rows = db.execute("SELECT embedding, NULL, model_version, user_id FROM profiles WHERE user_id = ?",
+                          (ident,)).fetchall()
+        templates, stale = decode_rows(rows, json_fallback=False)
+    else:
+        raise ValueError(f"unknown template lookup {kind!r}")
+
+    rederived = []
+    if stale and not any(r[0] and r[2] == MODEL_VERSION for r in rows):
+        rederived = rederive_templates(db, ident)
+    user_ids = {str(r[3]) for r in rows} | {ident}
+    return templates + rederived, user_ids, stale, len(rederived)
+
+class TemplateCache:
+    """Bounded LRU of UserTemplates with per-user invalidation."""
+
+    def __init__(self, max_users=TEMPLATE_CACHE_MAX_USERS, ttl_s=TEMPLATE_CACHE_TTL_S):
+        self.max_users = max_users
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = 0          # bumped by invalidate(); loads started before are not stored
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.invalidations = 0
+        self.stale_skipped = 0
+        self.rederived = 0
+
+    def get(self, db, key):
+        """UserTemplates for key (loading through db on a miss), or None if there are none."""
+        if key is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            # entries decoded under another MODEL_VERSION are reloaded (stale rows re-derived)
+            if entry is not None and now - entry.loaded <= self.ttl_s and entry.model_version == MODEL_VERSION:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self._entries.pop(key, None)
+            self.misses += 1
+            version = self._version
+
+        templates, user_ids, stale, rederived = load_profile_templates(db, key)
+        with self._lock:
+            self.stale_skipped += stale
+            self.rederived += rederived
+        if not templates:
+            return None
+        entry = UserTemplates(np.ascontiguousarray(np.stack(templates), dtype=np.float32), user_ids, MODEL_VERSION)
+
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = entry
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+                    self.evicted += 1
+        return entry
+
+    def invalidate(self, user_id):
+        """Drop every cached lookup of profiles.user_id (call after enrollment writes)."""
+        ident = str(user_id)
+        with self._lock:
+            self._version += 1
+            for key in [k for k, e in self._entries.items() if ident in e.user_ids]:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evicted": self.evicted,
+                "invalidations": self.invalidations,
+                "stale_embeddings_skipped": self.stale_skipped,
+                "rederived_templates": self.rederived,
+                "max_users": self.max_users,
+                "ttl_s": self.ttl_s,
+            }
+
+template_cache = TemplateCache()
@@ -6,7 +6,8 @@ from fastapi.responses import RedirectResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from .database import init_db, get_conn, now_ts
 from .feature_extractor import extract_features
-from .matcher import bytes_to_vector, decide_score_and_verdict
+from .matcher import decide_from_mean
+from .template_cache import template_cache
 from .config import MODEL_VERSION, MIN_ENROLL_CHARS, MIN_ENROLL_KEY_EVENTS
 
 import uuid, sqlite3, json, traceback, logging
@@ -325,8 +326,9 @@ async def submit_events(request: Request):
                 raise HTTPException(status_code=500, detail="feature extraction failed")
             blob = vec.tobytes() if hasattr(vec, "tobytes") else b""
             cur.execute(
-                "INSERT INTO profiles(user_id, embedding, device_hash, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
-                (user_id, sqlite3.Binary(blob), device_info or "", ts, ts),
+                "INSERT INTO profiles(user_id, embedding, model_version, device_hash, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, sqlite3.Binary(blob), MODEL_VERSION, device_info or "", ts, ts),
             )
 
             # NEW: also store this enrollment sample in keystroke_samples
@@ -339,20 +341,12 @@ async def submit_events(request: Request):
 
             conn.commit()
             conn.close()
+            template_cache.invalidate(user_id)
             return {"status": "enrolled", "phase": phase, "meta": meta}
 
                 # verification branch
-        cur.execute("SELECT embedding FROM profiles WHERE user_id = ?", (user_id,))
-        rows = cur.fetchall()
-        templates = []
-        for r in rows:
-            if r and r[0]:
-                try:
-                    templates.append(bytes_to_vector(r[0]))
-                except Exception:
-                    logger.exception("failed to convert embedding")
-
-        verdict_res = decide_score_and_verdict(vec, templates, paste_flag)
+        tpl = template_cache.get(conn, ("embedding", str(user_id)))
+        verdict_res = decide_from_mean(vec, tpl.mean_unit if tpl is not None else None, paste_flag)
 
         session_id = str(uuid.uuid4())
         notes = json.dumps({
@@ -0,0 +1,66 @@
+# backend/migrate_profile_embeddings.py
+"""
+Re-derive stale profile embeddings with the current feature extractor.
+
+profiles.embedding rows whose model_version differs from MODEL_VERSION
+(including NULL, i.e. written before versioning) are scored against vectors
+with a different slot layout. For every user whose embeddings are all
+stale, this script re-extracts their enrollment samples
+(keystroke_samples.enrollment = 1), replaces the stale embedding rows with one
+row per sample tagged with MODEL_VERSION, and reports users that have no
+samples to re-derive from (they need to enroll again).
+
+Until a user is migrated the matcher ignores stale rows and re-extracts the
+samples in memory (app.template_cache), so running this is an optimization,
+not a requirement.
+
+Usage (from backend folder):
+  python migrate_profile_embeddings.py            # dry run
+  python migrate_profile_embeddings.py --apply
+"""
+
+import sqlite3
+import sys
+
+from app.config import MODEL_VERSION
+from app.database import get_conn, init_db, now_ts
+from app.template_cache import rederive_templates
+
+
+def main(apply=False):
+    init_db()   # adds profiles.model_version if missing
+    conn = get_conn()
+    try:
+        users = [r[0] for r in conn.execute(
+            "SELECT user_id FROM profiles WHERE embedding IS NOT NULL "
+            "GROUP BY user_id HAVING SUM(CASE WHEN model_version = ? THEN 1 ELSE 0 END) = 0",
+            (MODEL_VERSION,)
+        ).fetchall()]
+        print(f"Model version: {MODEL_VERSION} | users with only stale embeddings: {len(users)}")
+
+        migrated, missing = 0, []
+        for user_id in users:
+            vectors = rederive_templates(conn, user_id)
+            if not vectors:
+                missing.append(user_id)
+                continue
+            print(f" - {user_id}: {len(vectors)} enrollment samples")
+            if apply:
+                ts = now_ts()
+                conn.execute("DELETE FROM profiles WHERE user_id = ? AND embedding IS NOT NULL", (user_id,))
+                conn.executemany(
+                    "INSERT INTO profiles(user_id, embedding, model_version, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    [(user_id, sqlite3.Binary(v.tobytes()), MODEL_VERSION, ts, ts) for v in vectors]
+                )
+                conn.commit()
+            migrated += 1
+
+        print(f"\n{'Migrated' if apply else 'Would migrate'}: {migrated} users")
+        if missing:
+            print(f"No enrollment samples (re-enrollment needed): {', '.join(map(str, missing))}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main(apply="--apply" in sys.argv[1:])
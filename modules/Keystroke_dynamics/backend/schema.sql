@@ -10,6 +10,7 @@ CREATE TABLE IF NOT EXISTS profiles (
   user_id TEXT NOT NULL,
   template_version INTEGER DEFAULT 1,
   embedding BLOB,
+  model_version TEXT,   -- MODEL_VERSION of the extractor that produced embedding
   template TEXT,        -- JSON for enrollment samples/template (optional)
   device_hash TEXT,
   created_at INTEGER,
@@ -0,0 +1,8 @@
+# backend/tests/conftest.py
+import sys
+from pathlib import Path
+
+# tests import the service as "app.*", like the backend scripts do
+BACKEND = Path(__file__).resolve().parents[1]
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
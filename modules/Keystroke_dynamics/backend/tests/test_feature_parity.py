@@ -0,0 +1,240 @@
+# backend/tests/test_feature_parity.py
+"""
+app.feature_extractor.extract_features must match a plain-loop reference:
+the original extractor with per-key hold pairing (first keydown of a held
+key -> its keyup; auto-repeats and orphans ignored).
+
+Slots 0-7 (direction) and the legacy meta fields must match; the per-key
+pairing itself is checked separately against the reference pairs.
+
+Runs every sample of keystroke_dataset/keystroke_samples_500.json plus a few
+perturbed variants (integer timestamps, shuffled keyups, key rollover,
+auto-repeat, paste/blur/focus events, empty and single-event windows), with
+a fixed seed.
+"""
+
+import copy
+import json
+import math
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.feature_extractor import extract_features
+from app.keystroke_pairing import events_to_arrays, pair_keys
+
+DATASET = Path(__file__).resolve().parents[1] / "keystroke_dataset" / "keystroke_samples_500.json"
+
+
+# ---------------------------------------------------------------
+# Reference: the original extractor, frozen (works on a deep copy
+# because it writes "rts" into the events), holds paired per key
+# ---------------------------------------------------------------
+def _safe_div(a, b):
+    return a / b if b else 0.0
+
+def _norm_key(k):
+    return k.lower() if isinstance(k, str) and len(k) == 1 else k
+
+def reference_pairs(events):
+    """[(keydown index, keyup index)] ordered by keydown."""
+    held = {}
+    pairs = []
+    for i, e in enumerate(events):
+        k = _norm_key(e.get("key"))
+        if e.get("type") == "keydown" and k not in held:
+            held[k] = i
+        elif e.get("type") == "keyup" and k in held:
+            pairs.append((held.pop(k), i))
+    return sorted(pairs)
+
+def reference_extract_features(events, copy_events=True):
+    if copy_events:
+        events = copy.deepcopy(events)
+    if not events:
+        return {"feature_vector": np.zeros(64, dtype=np.float32), "paste_flag": False, "meta": {}}
+
+    base_ts = events[0].get("ts", 0)
+    for e in events:
+        e["rts"] = e.get("ts", 0) - base_ts
+
+    keydowns = [e for e in events if e.get("type") == "keydown"]
+    keyups = [e for e in events if e.get("type") == "keyup"]
+    paste_events = [e for e in events if e.get("type") == "paste"]
+    blur_events = [e for e in events if e.get("type") == "blur"]
+    focus_events = [e for e in events if e.get("type") == "focus"]
+
+    holds = []
+    for d, u in reference_pairs(events):
+        ht = events[u]["rts"] - events[d]["rts"]
+        if ht < 0:
+            ht = 0.0
+        holds.append(float(ht))
+    if not holds:
+        holds = [0.0]
+
+    dd_list = []
+    for i in range(len(keydowns) - 1):
+        dd = keydowns[i+1].get("rts", 0.0) - keydowns[i].get("rts", 0.0)
+        dd_list.append(float(max(0.0, dd)))
+    if not dd_list:
+        dd_list = [0.0]
+
+    holds_arr = np.array(holds, dtype=np.float32)
+    dd_arr = np.array(dd_list, dtype=np.float32)
+
+    median_ht = float(np.median(holds_arr))
+    mad_ht = float(np.median(np.abs(holds_arr - median_ht))) if holds_arr.size > 0 else 0.0
+    median_dd = float(np.median(dd_arr))
+    mad_dd = float(np.median(np.abs(dd_arr - median_dd))) if dd_arr.size > 0 else 0.0
+
+    duration = events[-1].get("rts", 0.0) - events[0].get("rts", 0.0)
+    char_key_events = len([e for e in events if e.get("type") in ("keydown","keyup")])
+    cpm = (char_key_events / duration) * 60000.0 if duration > 0 else 0.0
+    pauses_over_200 = sum(1 for x in dd_list if x > 200.0)
+
+    paste_flag = False
+    if paste_events:
+        paste_flag = True
+    clipboard_lengths = [e.get("clipboardLength") for e in events if e.get("clipboardLength")]
+    if clipboard_lengths:
+        if max(clipboard_lengths) > max(5, 3 * char_key_events):
+            paste_flag = True
+    text_lengths = [e.get("textLen") for e in events if e.get("textLen") is not None]
+    if text_lengths:
+        if len(text_lengths) >= 2:
+            if (text_lengths[-1] - text_lengths[-2]) > max(10, 5 * char_key_events):
+                paste_flag = True
+
+    vec = np.zeros(64, dtype=np.float32)
+    vec[0] = median_ht
+    vec[1] = mad_ht
+    vec[2] = median_dd
+    vec[3] = mad_dd
+    vec[4] = math.log1p(cpm)
+    vec[5] = float(pauses_over_200)
+    vec[6] = float(len(holds))
+    vec[7] = _safe_div(median_ht, median_dd)
+
+    vec[0:5] = vec[0:5] / np.array([2000.0, 2000.0, 2000.0, 2000.0, 10.0], dtype=np.float32)
+
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        norm = 1.0
+    vec = vec / norm
+
+    meta = {
+        "median_ht": median_ht,
+        "mad_ht": mad_ht,
+        "median_dd": median_dd,
+        "mad_dd": mad_dd,
+        "cpm": cpm,
+        "pauses_over_200": pauses_over_200,
+        "chars": char_key_events,
+        "duration_ms": duration,
+        "paste_detected_explicit": bool(paste_events),
+        "paste_detected_heuristic": paste_flag and not bool(paste_events),
+        "blur_count": len(blur_events),
+        "focus_count": len(focus_events),
+        "sample_hold_times": holds[:32],
+        "sample_dd_times": dd_list[:32],
+    }
+
+    return {"feature_vector": vec.astype(np.float32), "paste_flag": paste_flag, "meta": meta}
+
+
+# ---------------------------------------------------------------
+# Cases
+# ---------------------------------------------------------------
+def variants(events, rng):
+    yield "original", events
+
+    yield "int_ts", [{**e, "ts": int(round(e["ts"]))} for e in events]
+
+    shuffled = [dict(e) for e in events]
+    ups = [i for i, e in enumerate(shuffled) if e["type"] == "keyup"]
+    if len(ups) > 3:
+        a, b = rng.sample(ups, 2)
+        shuffled[a]["ts"], shuffled[b]["ts"] = shuffled[b]["ts"], shuffled[a]["ts"]
+    yield "unsorted_keyups", shuffled
+
+    extra = [dict(e) for e in events]
+    if extra:
+        t = extra[len(extra) // 2]["ts"]
+        extra.insert(len(extra) // 2, {"type": "paste", "ts": t, "clipboardLength": 120})
+        extra.insert(1, {"type": "blur", "ts": extra[0]["ts"]})
+        extra.append({"type": "focus", "ts": extra[-1]["ts"] + 5, "textLen": 400})
+        extra.append({"type": "input", "ts": extra[-1]["ts"] + 1, "textLen": 10})
+    yield "paste_blur_focus", extra
+
+    # next key goes down before the previous one is released
+    rolled = [dict(e) for e in events]
+    downs = [i for i, e in enumerate(rolled) if e["type"] == "keydown"]
+    for a, b in zip(downs[::3], downs[1::3]):
+        up = next((i for i in range(a + 1, b) if rolled[i]["type"] == "keyup"), None)
+        if up is not None and rolled[up]["ts"] > rolled[a]["ts"] + 20:
+            rolled[b]["ts"] = rolled[up]["ts"] - 10
+    rolled.sort(key=lambda e: e["ts"])
+    yield "rollover", rolled
+
+    # held key: extra keydowns before the keyup
+    repeated = []
+    for e in events:
+        repeated.append(e)
+        if e["type"] == "keydown" and rng.random() < 0.1:
+            repeated.append({**e, "ts": e["ts"] + 1})
+    yield "auto_repeat", repeated
+
+    yield "keydowns_only", [e for e in events if e["type"] == "keydown"]
+    yield "head", events[:1]
+    yield "empty", []
+
+
+def _unit(v):
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+def same(a, b, events):
+    if a["feature_vector"].dtype != b["feature_vector"].dtype or a["feature_vector"].size != 64:
+        return "feature_vector dtype/size"
+    if events:
+        # slots 0-7 are rescaled by the norm of the full vector
+        if not np.allclose(_unit(a["feature_vector"][:8]), _unit(b["feature_vector"][:8]), atol=1e-6):
+            return "feature_vector[0:8]"
+        types, keys, _, _ = events_to_arrays(events)
+        p = pair_keys(types, keys)
+        if list(zip(p.down_idx.tolist(), p.up_idx.tolist())) != reference_pairs(events):
+            return "pairs"
+    if a["paste_flag"] != b["paste_flag"]:
+        return "paste_flag"
+    if not b["meta"].keys() <= a["meta"].keys():
+        return "meta keys"
+    for k, v in b["meta"].items():
+        if a["meta"][k] != v or type(a["meta"][k]) is not type(v):
+            return f"meta[{k}]: {a['meta'][k]!r} != {v!r}"
+    return None
+
+
+@pytest.fixture(scope="module")
+def cases():
+    samples = json.loads(DATASET.read_text())
+    rng = random.Random(0)
+    return [(s.get("id"), name, ev) for s in samples for name, ev in variants(s["events"], rng)]
+
+
+def test_extract_features_matches_reference(cases):
+    failures = []
+    for sid, name, events in cases:
+        diff = same(extract_features(events), reference_extract_features(events), events)
+        if diff:
+            failures.append((sid, name, diff))
+    assert not failures, failures[:10]
+
+
+def test_extract_features_does_not_modify_events(cases):
+    for sid, name, events in cases:
+        before = copy.deepcopy(events)
+        extract_features(events)
+        assert events == before, (sid, name)
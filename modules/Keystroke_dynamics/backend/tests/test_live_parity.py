@@ -0,0 +1,117 @@
+# tests/test_live_parity.py
+"""
+The incremental score_live state (app.live_state) must match
+extract_features on the same window of events.
+
+Each session is replayed the way the live UI sends it: overlapping rolling
+windows of the last WINDOW_EVENTS events, a few new events per call. After the
+last call the state's vector is compared with extract_features() over the
+events of the last KS_LIVE_COUNT_WINDOW_MS:
+  - sessions shorter than the window must match to ATOL (float noise)
+  - longer sessions (several samples chained) may differ at the window edge
+    (presses / gaps straddling the window start), up to EDGE_ATOL per slot
+    and EDGE_MIN_COSINE overall
+"""
+import json
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.feature_extractor import extract_features, _median_mad, _quantiles
+from app.live_state import LiveFeatureState, SortedValues, LIVE_COUNT_WINDOW_MS
+
+DATASET = Path(__file__).resolve().parents[1] / "keystroke_dataset" / "keystroke_samples_500.json"
+
+WINDOW_EVENTS = 40
+NEW_PER_CALL = 7
+ATOL = 1e-5
+EDGE_ATOL = 0.02
+EDGE_MIN_COSINE = 0.995
+
+
+@pytest.fixture(scope="module")
+def samples():
+    return [s["events"] for s in json.loads(DATASET.read_text())]
+
+
+def replay(events):
+    """One ingest + features() per call, like score_live; returns the last result."""
+    state = LiveFeatureState()
+    res = None
+    for end in range(NEW_PER_CALL, len(events) + NEW_PER_CALL, NEW_PER_CALL):
+        state.ingest(events[max(0, end - WINDOW_EVENTS):end])
+        res = state.features()
+    return res
+
+
+def window_of(events):
+    last = events[-1]["ts"]
+    return [e for e in events if e["ts"] >= last - LIVE_COUNT_WINDOW_MS]
+
+
+def chain(samples):
+    """Concatenate samples into one session, 300 ms apart."""
+    out, offset = [], 0.0
+    for evs in samples:
+        base = evs[0]["ts"]
+        out += [{**e, "ts": e["ts"] - base + offset} for e in evs]
+        offset = out[-1]["ts"] + 300.0
+    return out
+
+
+def variants(events, rng):
+    yield "original", events
+    yield "int_ts", [{**e, "ts": int(e["ts"])} for e in events]
+    repeated = []
+    for e in events:
+        repeated.append(e)
+        if e["type"] == "keydown" and rng.random() < 0.1:
+            repeated.append({**e, "ts": e["ts"] + 1})
+    yield "auto_repeat", repeated
+
+
+def compare(events):
+    live = replay(events)
+    ref = extract_features(window_of(events))
+    a, b = live["feature_vector"], ref["feature_vector"]
+    cos = float(np.dot(a, b) / ((np.linalg.norm(a) * np.linalg.norm(b)) or 1.0))
+    return float(np.max(np.abs(a - b))), cos, live["paste_flag"] == ref["paste_flag"]
+
+
+def test_short_sessions_match_extract_features(samples):
+    rng = random.Random(0)
+    bad = []
+    for i, s in enumerate(samples):
+        for name, events in variants(s, rng):
+            diff, _, paste_ok = compare(events)
+            if diff > ATOL or not paste_ok:
+                bad.append((i, name, diff, paste_ok))
+    assert not bad, bad[:10]
+
+
+def test_long_sessions_match_up_to_window_edge(samples):
+    bad = []
+    for i in range(0, len(samples), 6):
+        diff, cos, paste_ok = compare(chain(samples[i:i + 6]))
+        if diff > EDGE_ATOL or cos < EDGE_MIN_COSINE or not paste_ok:
+            bad.append((i, diff, cos, paste_ok))
+    assert not bad, bad[:10]
+
+
+def test_sorted_values_match_extractor_statistics():
+    rng = random.Random(1)
+    for _ in range(2000):
+        # ties and negative values (rollover ud latencies) included
+        xs = [rng.choice([rng.uniform(-50, 300), float(rng.randint(-3, 3))]) for _ in range(rng.randint(0, 30))]
+        s = SortedValues()
+        for x in xs + [999.0, -999.0]:
+            s.add(x)
+        s.remove(999.0)
+        s.remove(-999.0)
+        a = np.array(xs, dtype=np.float64)
+        assert np.allclose(s.median_mad(), _median_mad(a))
+        assert np.allclose(s.quantiles(), _quantiles(a))
+        assert s.count_below(0) == np.count_nonzero(a < 0)
+        assert s.count_above(200.0) == np.count_nonzero(a > 200.0)
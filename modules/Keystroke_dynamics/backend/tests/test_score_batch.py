@@ -0,0 +1,121 @@
+# backend/tests/test_score_batch.py
+import json
+import sqlite3
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import app.realtime_routes as rr
+from app.config import MODEL_VERSION
+from app.feature_extractor import extract_features, extract_features_batch
+from app.template_cache import TemplateCache
+
+DATASET = Path(__file__).resolve().parents[1] / "keystroke_dataset" / "keystroke_samples_500.json"
+
+
+@pytest.fixture(scope="module")
+def samples():
+    return [s["events"] for s in json.loads(DATASET.read_text())]
+
+
+@pytest.fixture
+def profiles_db(tmp_path, monkeypatch, samples):
+    """Profiles for users u0-u3 and candidate 7 in a scratch DB wired into realtime_routes."""
+    path = tmp_path / "profiles.db"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE profiles (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, embedding BLOB, "
+        "model_version TEXT, template TEXT, created_at TEXT, updated_at TEXT)"
+    )
+    enrolled = {"u0": samples[0:3], "u1": samples[3:6], "u2": samples[6:9], "u3": samples[9:10], "7": samples[10:13]}
+    for user_id, windows in enrolled.items():
+        for events in windows:
+            conn.execute(
+                "INSERT INTO profiles (user_id, embedding, model_version) VALUES (?, ?, ?)",
+                (user_id, extract_features(events)["feature_vector"].tobytes(), MODEL_VERSION)
+            )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(rr, "database", SimpleNamespace(database=SimpleNamespace(get_conn=lambda: sqlite3.connect(path))))
+    monkeypatch.setattr(rr, "template_cache", TemplateCache())
+    return path
+
+
+def _windows(samples):
+    windows = []
+    for i in range(40):
+        events = samples[100 + i]
+        if i % 9 == 0:
+            # explicit paste -> suspicious_paste override
+            events = events + [{"type": "paste", "ts": events[-1]["ts"] + 5, "clipboardLength": 200}]
+        if i % 5 == 0:
+            windows.append(rr.BatchWindow(candidate_id=7, events=events))
+        else:
+            windows.append(rr.BatchWindow(user_id=f"u{i % 5}", events=events))   # u4 has no template
+    windows.append(rr.BatchWindow(user_id="u0", events=samples[0]))             # enrolled window itself
+    return windows
+
+
+def test_score_batch_matches_score_live(profiles_db, samples):
+    windows = _windows(samples)
+    out = rr.score_batch(rr.BatchScoreReq(windows=windows, include_meta=True))
+
+    assert out["count"] == len(windows)
+    verdicts = set()
+    for w, res in zip(windows, out["results"]):
+        live = rr.score_live(rr.LiveScoreReq(candidate_id=w.candidate_id, user_id=w.user_id, events=w.events))
+        assert res["verdict"] == live["verdict"]
+        if live["score"] is None:
+            assert res["score"] is None
+        else:
+            assert res["score"] == pytest.approx(live["score"], abs=1e-5)
+        assert res["meta"] == live["meta"]
+        verdicts.add(res["verdict"])
+
+    # the fixture exercises every branch, not just one verdict
+    assert {"no_template", "suspicious_paste"} <= verdicts
+    assert verdicts & {"accepted", "review", "rejected"}
+
+
+def test_score_batch_loads_each_users_templates_once(profiles_db, samples):
+    out = rr.score_batch(rr.BatchScoreReq(windows=_windows(samples)))
+    stats = rr.template_cache.stats()
+    # u0-u3 + candidate 7 have templates; u4 misses (not cached)
+    assert out["templates_loaded"] == 5
+    assert stats["misses"] == 6 and stats["hits"] == 0
+
+
+def test_score_batch_empty_window_and_limits(profiles_db, samples, monkeypatch):
+    out = rr.score_batch(rr.BatchScoreReq(windows=[
+        rr.BatchWindow(user_id="u0", events=[]),
+        rr.BatchWindow(user_id="u0", events=samples[50]),
+    ]))
+    assert out["results"][0] == {"score": None, "verdict": None, "error": "events required"}
+    assert out["results"][1]["verdict"] in {"accepted", "review", "rejected"}
+
+    with pytest.raises(HTTPException) as exc:
+        rr.score_batch(rr.BatchScoreReq(windows=[]))
+    assert exc.value.status_code == 400
+
+    monkeypatch.setattr(rr, "BATCH_MAX_WINDOWS", 1)
+    with pytest.raises(HTTPException) as exc:
+        rr.score_batch(rr.BatchScoreReq(windows=[rr.BatchWindow(user_id="u0", events=samples[1])] * 2))
+    assert exc.value.status_code == 413
+
+
+def test_extract_features_batch_matches_extract_features(samples):
+    windows = [ev[max(0, end - 40):end] for ev in samples[:60] for end in range(7, len(ev) + 7, 7)]
+    windows += [
+        [],
+        [{"type": "keydown", "key": "a", "ts": 5}],
+        [{"type": "paste", "ts": 1, "clipboardLength": 50}],
+        [{**e, "ts": int(e["ts"])} for e in samples[3]],
+    ]
+    for events, got in zip(windows, extract_features_batch(windows)):
+        ref = extract_features(events)
+        assert got["meta"] == ref["meta"]
+        assert got["paste_flag"] == ref["paste_flag"]
+        assert got["feature_vector"] == pytest.approx(ref["feature_vector"], abs=1e-6)
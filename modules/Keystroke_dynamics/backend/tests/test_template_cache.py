@@ -0,0 +1,127 @@
+# backend/tests/test_template_cache.py
+import asyncio
+import json
+import sqlite3
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import app.enroll_routes as enroll_routes
+import app.realtime_routes as rr
+import app.template_cache as tc
+from app.config import MODEL_VERSION
+from app.feature_extractor import extract_features
+from app.template_cache import TemplateCache, lookup_key
+
+DATASET = Path(__file__).resolve().parents[1] / "keystroke_dataset" / "keystroke_samples_500.json"
+
+
+@pytest.fixture(scope="module")
+def samples():
+    return [s["events"] for s in json.loads(DATASET.read_text())]
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch, samples):
+    """u1 (2 embeddings + 2 enrollment samples) and candidate 7 (token "tok"), wired into the routes."""
+    path = tmp_path / "keystroke.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE profiles (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, embedding BLOB,
+                               model_version TEXT, template TEXT, created_at TEXT, updated_at TEXT);
+        CREATE TABLE keystroke_samples (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT,
+                                        enrollment INTEGER, events_json TEXT);
+        CREATE TABLE assignments (token TEXT, candidate_id INTEGER);
+        CREATE TABLE sessions (session_id TEXT, candidate_id INTEGER);
+        INSERT INTO assignments VALUES ('tok', 7);
+    """)
+    for user_id, windows in (("u1", samples[0:2]), ("7", samples[2:4])):
+        for events in windows:
+            conn.execute("INSERT INTO profiles (user_id, embedding, model_version) VALUES (?, ?, ?)",
+                         (user_id, extract_features(events)["feature_vector"].tobytes(), MODEL_VERSION))
+            conn.execute("INSERT INTO keystroke_samples (user_id, enrollment, events_json) VALUES (?, 1, ?)",
+                         (user_id, json.dumps(events)))
+    conn.commit()
+    conn.close()
+
+    def get_conn():
+        c = sqlite3.connect(path)
+        c.row_factory = sqlite3.Row
+        return c
+
+    cache = TemplateCache()
+    fake_db = SimpleNamespace(database=SimpleNamespace(get_conn=get_conn))
+    for mod in (rr, enroll_routes):
+        monkeypatch.setattr(mod, "database", fake_db)
+        monkeypatch.setattr(mod, "template_cache", cache)
+    return SimpleNamespace(conn=get_conn(), cache=cache)
+
+
+class FakeRequest:
+    def __init__(self, body):
+        self.body = body
+
+    async def json(self):
+        return self.body
+
+
+def _add_embedding(conn, user_id, events):
+    # an enrollment write that does not go through this process's cache
+    conn.execute("INSERT INTO profiles (user_id, embedding, model_version) VALUES (?, ?, ?)",
+                 (user_id, extract_features(events)["feature_vector"].tobytes(), MODEL_VERSION))
+    conn.commit()
+
+
+def test_reenrollment_evicts_every_lookup_of_the_user(db, samples):
+    cache, conn = db.cache, db.conn
+    keys = [lookup_key(user_id="u1", limit=10), ("embedding", "u1"), lookup_key(candidate_id=7)]
+    assert [len(cache.get(conn, k)) for k in keys] == [2, 2, 2]
+
+    _add_embedding(conn, "u1", samples[10])
+    assert len(cache.get(conn, keys[0])) == 2          # still the cached entry
+
+    out = asyncio.run(rr.submit_events_legacy(FakeRequest({"user_id": "u1", "events": samples[11], "enrollment": True})))
+    assert out["status"] == "enrolled"
+
+    assert keys[0] not in cache._entries and keys[1] not in cache._entries
+    assert keys[2] in cache._entries                   # other users keep their entries
+    assert len(cache.get(conn, keys[0])) == 3
+    assert len(cache.get(conn, keys[1])) == 3
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_enroll_sample_evicts_the_candidate(db, samples):
+    cache, conn = db.cache, db.conn
+    candidate, other = lookup_key(candidate_id=7), lookup_key(user_id="u1", limit=10)
+    before = cache.get(conn, candidate)
+    cache.get(conn, other)
+
+    _add_embedding(conn, "7", samples[12])
+    out = enroll_routes.enroll_sample(enroll_routes.EnrollSampleReq(token="tok", events=samples[13]))
+    assert out["status"] == "ok"
+
+    assert candidate not in cache._entries and other in cache._entries
+    after = cache.get(conn, candidate)
+    assert after is not before and len(after) == 3
+
+
+def test_model_version_change_reloads_and_rederives(db, samples, monkeypatch):
+    cache, conn = db.cache, db.conn
+    key = lookup_key(user_id="u1", limit=10)
+    before = cache.get(conn, key)
+    assert cache.get(conn, key) is before
+    assert before.model_version == MODEL_VERSION
+
+    # new extractor version: stored embeddings are stale, enrollment samples are re-extracted
+    monkeypatch.setattr(tc, "MODEL_VERSION", "ks_next")
+    after = cache.get(conn, key)
+    assert after is not before and after.model_version == "ks_next"
+    expected = np.stack([extract_features(ev)["feature_vector"] for ev in samples[0:2]])
+    assert np.allclose(after.samples, expected)
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["stale_embeddings_skipped"] == 2 and stats["rederived_templates"] == 2
+    assert cache.get(conn, key) is after
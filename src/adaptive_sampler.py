@@ -0,0 +1,124 @@
+# src/adaptive_sampler.py
+# Scene-change driven frame sampling.
+#
+# A frame is scheduled for inference only when it differs enough from the
+# last analysed frame (mean abs difference of a small grayscale thumbnail)
+# or when max_interval has elapsed; frames closer than min_interval to the
+# last analysed one are never analysed.
+
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# =====================================
+# CONFIG
+# =====================================
+SAMPLER_THRESHOLD = float(os.getenv("SAMPLER_DIFF_THRESHOLD", "6.0"))   # mean abs diff, 0..255
+SAMPLER_MIN_INTERVAL_S = float(os.getenv("SAMPLER_MIN_INTERVAL_S", "0.25"))
+SAMPLER_MAX_INTERVAL_S = float(os.getenv("SAMPLER_MAX_INTERVAL_S", "2.0"))
+SAMPLER_MAX_SESSIONS = int(os.getenv("SAMPLER_MAX_SESSIONS", "2000"))
+THUMB_SIZE = (32, 24)
+
+
+def thumbnail(frame):
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class AdaptiveSampler:
+    def __init__(
+        self,
+        threshold=SAMPLER_THRESHOLD,
+        min_interval=SAMPLER_MIN_INTERVAL_S,
+        max_interval=SAMPLER_MAX_INTERVAL_S
+    ):
+        self.threshold = threshold
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self._last_thumb = None
+        self._last_t = None
+
+        self.analyzed = 0
+        self.skipped = 0
+
+    def should_analyze(self, frame, t):
+        """t: frame time in seconds (video timestamp or wall clock)."""
+        if self._last_t is not None and t - self._last_t < self.min_interval:
+            self.skipped += 1
+            return False
+
+        thumb = thumbnail(frame)
+        if self._last_thumb is None or t - self._last_t >= self.max_interval:
+            changed = True
+        else:
+            changed = float(np.abs(thumb - self._last_thumb).mean()) >= self.threshold
+
+        if not changed:
+            self.skipped += 1
+            return False
+
+        self._last_thumb = thumb
+        self._last_t = t
+        self.analyzed += 1
+        return True
+
+    def stats(self):
+        total = self.analyzed + self.skipped
+        return {
+            "frames_analyzed": self.analyzed,
+            "frames_skipped": self.skipped,
+            "skip_ratio": round(self.skipped / total, 3) if total else 0.0,
+        }
+
+
+class SessionSamplers:
+    """One AdaptiveSampler + last result per live session (LRU bounded)."""
+
+    def __init__(self, max_sessions=SAMPLER_MAX_SESSIONS, **sampler_kwargs):
+        self.max_sessions = max_sessions
+        self.sampler_kwargs = sampler_kwargs
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()   # session_id -> [sampler, last_result]
+
+        # totals survive session eviction
+        self._analyzed = 0
+        self._skipped = 0
+
+    def check(self, session_id, frame, t):
+        """Return (analyze, last_result)."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = self._sessions[session_id] = [AdaptiveSampler(**self.sampler_kwargs), None]
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+
+            sampler, last = entry
+            # only a plain emotion result may be repeated; alerts / no-face are re-checked
+            analyze = sampler.should_analyze(frame, t) or last is None or last["status"] != "ok"
+            if analyze:
+                self._analyzed += 1
+            else:
+                self._skipped += 1
+            return analyze, last
+
+    def remember(self, session_id, result):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry[1] = result
+
+    def stats(self):
+        with self._lock:
+            total = self._analyzed + self._skipped
+            return {
+                "frames_analyzed": self._analyzed,
+                "frames_skipped": self._skipped,
+                "skip_ratio": round(self._skipped / total, 3) if total else 0.0,
+                "sessions": len(self._sessions),
+            }
@@ -1,8 +1,17 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, WebSocket
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from src.emotion_model import EmotionModel
-from PIL import Image
-import io, sqlite3, time, cv2
+from src.executor import InferenceExecutor, ExecutorBusy
+from src.db_writer import LogWriter
+from src.jobs import JobManager
+from src.model_registry import warmup, model_info
+from src.frame_cache import FrameResultCache, dhash
+from src.adaptive_sampler import SessionSamplers
+from src.frame_io import decode_image, parse_ws_frame, decode_payload
+from src.video_analysis import spool_upload, iter_video_results, ParallelVideoAnalyzer, VIDEO_WORKERS
+import os, json, sqlite3, threading, time, asyncio
+from typing import Optional
 from pathlib import Path
 import pandas as pd
 
@@ -29,7 +38,10 @@ def init_db():
             timestamp TEXT,
             source TEXT,
             emotion TEXT,
-            confidence REAL
+            confidence REAL,
+            faces INTEGER,
+            devices TEXT,
+            alerts TEXT
         )
     """)
 
@@ -40,6 +52,12 @@ def init_db():
         c.execute("ALTER TABLE emotion_logs ADD COLUMN emotion TEXT")
     if "confidence" not in cols:
         c.execute("ALTER TABLE emotion_logs ADD COLUMN confidence REAL")
+    if "faces" not in cols:
+        c.execute("ALTER TABLE emotion_logs ADD COLUMN faces INTEGER")
+    if "devices" not in cols:
+        c.execute("ALTER TABLE emotion_logs ADD COLUMN devices TEXT")
+    if "alerts" not in cols:
+        c.execute("ALTER TABLE emotion_logs ADD COLUMN alerts TEXT")
 
     conn.commit()
     conn.close()
@@ -49,76 +67,301 @@ init_db()
 # =========================
 # LOAD MODEL ONCE
 # =========================
-model = EmotionModel()
+executor = InferenceExecutor()
+# callers of the batcher are the executor's threads -> batch size follows INFER_WORKERS
+model = EmotionModel(heavy_runner=executor.run_heavy, max_concurrency=executor.workers)
 print("✅ Emotion model ready")
 
+WARMUP_MODELS = [m for m in os.getenv("WARMUP_MODELS", "yolo").split(",") if m]
+
+@app.on_event("startup")
+def warmup_models():
+    # pay model load + first-inference cost before the first request
+    warmup(*WARMUP_MODELS)
+
+@app.on_event("shutdown")
+def shutdown_inference():
+    jobs.shutdown()
+    executor.shutdown()
+    model.close()
+    if _video_pool is not None:
+        _video_pool.shutdown()
+    writer.close()
+
+def busy_response(e):
+    return JSONResponse(
+        {"status": "busy", "message": "Inference queue is full, retry shortly", "detail": str(e)},
+        status_code=429,
+        headers={"Retry-After": "1"}
+    )
+
 # =========================
-# DB SAVE
+# DB SAVE (GROUP COMMITS)
 # =========================
-def save_to_db(emotion, confidence, source="webcam"):
-    conn = sqlite3.connect(DB, check_same_thread=False)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO emotion_logs (timestamp, source, emotion, confidence) VALUES (?, ?, ?, ?)",
-        (time.strftime("%Y-%m-%d %H:%M:%S"), source, emotion, confidence)
+LOG_INSERT_SQL = (
+    "INSERT INTO emotion_logs (timestamp, source, emotion, confidence, faces, devices, alerts) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+writer = LogWriter(DB, LOG_INSERT_SQL)
+
+def log_row(emotion, confidence, source="webcam", faces=None, devices=None, alerts=None):
+    """Row for LOG_INSERT_SQL; devices / alerts are lists of names, stored comma separated."""
+    return (
+        time.strftime("%Y-%m-%d %H:%M:%S"),
+        source,
+        emotion,
+        confidence,
+        faces,
+        ",".join(devices) if devices else None,
+        ",".join(alerts) if alerts else None
     )
-    conn.commit()
-    conn.close()
+
+def save_to_db(emotion, confidence, source="webcam", faces=None, devices=None, alerts=None):
+    writer.write(log_row(emotion, confidence, source, faces, devices, alerts))
 
 # =========================
 # IMAGE FRAME API
 # =========================
+frame_cache = FrameResultCache()
+samplers = SessionSamplers()
+LIVE_ADAPTIVE = os.getenv("LIVE_ADAPTIVE", "1") == "1"
+
+def analyze_frame(frame, session_id):
+    """
+    Scene-change sampler, then perceptual-hash cache, then the full model pass.
+    Without a session id the frame always goes to the model: anonymous callers
+    share no state, so one caller's result is never repeated to another.
+    """
+    if session_id is None:
+        return model.predict_from_array(frame)
+
+    if LIVE_ADAPTIVE:
+        analyze, last = samplers.check(session_id, frame, time.monotonic())
+        if not analyze:
+            # emotion is repeated, but a due device check still runs on the frame
+            devices, alerts = model.check_devices(frame, session_id)
+            return model.with_alerts({**last, "skipped": True}, devices, alerts)
+
+    h = dhash(frame)
+    cached = frame_cache.lookup(session_id, h)
+    if cached is not None:
+        # the scene is unchanged, but scheduled device checks still run on it
+        devices, alerts = model.check_devices(frame, session_id)
+        result = model.with_alerts({**cached, "cached": True}, devices, alerts)
+    else:
+        result = model.predict_from_array(frame, session_id)
+        # only plain emotion results are reused; alerts / no-face are always re-checked
+        if result["status"] == "ok":
+            frame_cache.store(session_id, h, result)
+
+    if LIVE_ADAPTIVE:
+        samplers.remember(session_id, result)
+    return result
+
 @app.post("/api/emotion/frame")
-async def detect_frame(
-    file: UploadFile = File(...),
-    bg: BackgroundTasks = BackgroundTasks()
-):
-    img = Image.open(io.BytesIO(await file.read())).convert("RGB")
-    result = model.predict_from_pil(img)
+async def detect_frame(file: UploadFile = File(...), session_id: Optional[str] = Form(None)):
+    # decoded once; the same BGR array is shared by every stage
+    frame = decode_image(await file.read())
+    if frame is None:
+        raise HTTPException(status_code=400, detail="could not decode image")
 
-    if result["status"] == "ok":
-        bg.add_task(save_to_db, result["dominant_emotion"], result["confidence"])
+    # Off the event loop so concurrent frames can meet in the micro-batcher
+    try:
+        result = await executor.run(analyze_frame, frame, session_id)
+    except ExecutorBusy as e:
+        return busy_response(e)
 
+    log_frame_result(result)
     return result
 
+def log_frame_result(result, source="webcam"):
+    # skipped frames repeat the previous (alert-free) result, don't log them
+    # twice; alerts on a skipped frame come from its own device check
+    if result.get("skipped") and not result.get("alerts"):
+        return
+    alerts = [a["type"] for a in result.get("alerts") or []]
+    if "dominant_emotion" not in result and not alerts:
+        return
+    devices = result.get("devices") or {}
+    save_to_db(
+        result.get("dominant_emotion"),
+        result.get("confidence"),
+        source,
+        faces=result.get("faces"),
+        devices=devices.get("objects"),
+        alerts=alerts
+    )
+
+# =========================
+# WEBSOCKET FRAME STREAM
+# =========================
+# Binary messages: 8-byte header (seq u32, width u16, height u16, big endian)
+# + JPEG bytes (width = height = 0) or raw BGR pixels. Only the newest frame
+# waits for inference; older unprocessed frames are dropped and counted.
+ws_stats = {"connections": 0, "frames_received": 0, "frames_analyzed": 0, "frames_dropped": 0}
+
+def analyze_ws_frame(payload, w, h, session_id):
+    frame = decode_payload(payload, w, h)
+    if frame is None:
+        return {"status": "error", "message": "could not decode image"}
+    return analyze_frame(frame, session_id)
+
+@app.websocket("/ws/emotion/{session_id}")
+async def emotion_stream(ws: WebSocket, session_id: str):
+    await ws.accept()
+    ws_stats["connections"] += 1
+
+    pending = {}                 # newest not-yet-analysed frame (mailbox of one)
+    wakeup = asyncio.Event()
+    dropped = 0
+
+    async def receive_frames():
+        nonlocal dropped
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+            data = msg.get("bytes")
+            if data is None:
+                continue
+            try:
+                seq, payload, w, h = parse_ws_frame(data)
+            except ValueError as e:
+                await ws.send_json({"status": "error", "message": str(e)})
+                continue
+
+            ws_stats["frames_received"] += 1
+            if pending:
+                dropped += 1
+                ws_stats["frames_dropped"] += 1
+            pending.update(seq=seq, payload=payload, w=w, h=h)
+            wakeup.set()
+
+    async def analyze_frames():
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            item = dict(pending)
+            pending.clear()
+
+            try:
+                result = await executor.run(analyze_ws_frame, item["payload"], item["w"], item["h"], session_id)
+            except ExecutorBusy:
+                result = {"status": "busy", "message": "Inference queue is full, frame dropped"}
+                ws_stats["frames_dropped"] += 1
+            else:
+                ws_stats["frames_analyzed"] += 1
+                log_frame_result(result)
+
+            await ws.send_json({**result, "seq": item["seq"], "dropped": dropped})
+
+    tasks = [asyncio.create_task(receive_frames()), asyncio.create_task(analyze_frames())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        ws_stats["connections"] -= 1
+
 # =========================
 # VIDEO ANALYSIS API
 # =========================
-@app.post("/api/emotion/video")
-async def analyze_video(file: UploadFile = File(...)):
-    video_path = LOGS / file.filename
-    with open(video_path, "wb") as f:
-        f.write(await file.read())
+_video_pool = None
+_video_pool_lock = threading.Lock()
 
-    cap = cv2.VideoCapture(str(video_path))
-    frame_id = 0
-    analyzed = 0
+def get_video_pool():
+    """Process pool for long recordings (created on first use, custom FER model only)."""
+    global _video_pool
+    with _video_pool_lock:
+        if _video_pool is None and model.mode == "custom" and VIDEO_WORKERS > 1:
+            _video_pool = ParallelVideoAnalyzer(model.model, model.classes, VIDEO_WORKERS)
+    return _video_pool
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+def _logged_video_events(video_path, parallel=True):
+    pool = get_video_pool() if parallel else None
+    events = pool.iter_results(video_path) if pool else iter_video_results(video_path, model)
 
-        if frame_id % 15 == 0:
-            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            res = model.predict_from_pil(img)
+    for ev in events:
+        if ev["type"] == "frame":
+            save_to_db(ev["emotion"], ev["confidence"], "video")
+        yield ev
 
-            if res["status"] == "ok":
-                save_to_db(res["dominant_emotion"], res["confidence"], "video")
-                analyzed += 1
+def _analyze_video_file(video_path, parallel=True):
+    summary = {}
+    for ev in _logged_video_events(video_path, parallel):
+        if ev["type"] == "summary":
+            summary = {k: v for k, v in ev.items() if k != "type"}
+    return summary
 
-        frame_id += 1
+# Restart-safe background jobs (resume from last checkpoint); frame rows are
+# committed with each checkpoint, not through the group-commit writer
+jobs = JobManager(
+    DB,
+    model,
+    frame_sql=LOG_INSERT_SQL,
+    frame_row=lambda ev: log_row(ev["emotion"], ev["confidence"], "video")
+)
 
-    cap.release()
-    return {"status": "ok", "frames_analyzed": analyzed}
+def _ndjson(events):
+    for ev in events:
+        yield json.dumps(ev) + "\n"
+
+@app.post("/api/emotion/video")
+async def analyze_video(
+    file: UploadFile = File(...),
+    stream: bool = False,
+    parallel: bool = True,
+    background: bool = False
+):
+    video_path = await spool_upload(file, LOGS)
+
+    # Return a job id now; poll /api/emotion/video/{job_id}
+    if background:
+        return {"status": "queued", "job_id": jobs.submit(video_path)}
+
+    # NDJSON progress + per-frame results while the video is processed
+    if stream:
+        return StreamingResponse(
+            _ndjson(_logged_video_events(video_path, parallel)),
+            media_type="application/x-ndjson"
+        )
+
+    # Long-running decode loop must not hold the event loop
+    summary = await run_in_threadpool(_analyze_video_file, video_path, parallel)
+    return {"status": "ok", **summary}
+
+@app.get("/api/emotion/video/{job_id}")
+def video_job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+# =========================
+# INFERENCE METRICS
+# =========================
+@app.get("/api/emotion/metrics")
+def inference_metrics():
+    return {
+        **model.metrics(),
+        "executor": executor.stats(),
+        "db_writer": writer.stats(),
+        "models": model_info(),
+        "frame_cache": frame_cache.stats(),
+        "sampler": samplers.stats(),
+        "websocket": dict(ws_stats)
+    }
 
 # =========================
 # DOWNLOAD REPORT
 # =========================
 @app.get("/api/report/download")
 def download_report():
+    writer.flush()
     conn = sqlite3.connect(DB)
     df = pd.read_sql("SELECT * FROM emotion_logs", conn)
+    conn.close()
     path = LOGS / "emotion_report.csv"
     df.to_csv(path, index=False)
     return FileResponse(path, filename="emotion_report.csv")
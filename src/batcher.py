@@ -0,0 +1,134 @@
+# src/batcher.py
+# Dynamic micro-batching for model inference.
+#
+# Callers submit single inputs and get a Future back. A background thread
+# collects whatever arrives within a short window (or until max_batch items
+# are queued), runs ONE batched call and resolves every caller's future.
+
+import threading
+import time
+import queue
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued")
+
+    def __init__(self, item):
+        self.item = item
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    def __init__(self, run_batch, max_batch=32, window_ms=8.0, name="micro-batcher"):
+        """
+        run_batch: callable(list_of_items) -> list_of_results (same order)
+        max_batch: flush as soon as this many items are waiting
+        window_ms: max time the first queued item waits for companions
+        """
+        self.run_batch = run_batch
+        self.max_batch = max(1, int(max_batch))
+        self.window = max(0.0, float(window_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # metrics
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        self._batch_sizes = deque(maxlen=1000)
+        self._waits_ms = deque(maxlen=1000)
+
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    # ---------------- PUBLIC ----------------
+    def submit(self, item) -> Future:
+        if self._closed:
+            raise RuntimeError("batcher is closed")
+        p = _Pending(item)
+        self._queue.put(p)
+        return p.future
+
+    def close(self, timeout=2.0):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            sizes = np.array(self._batch_sizes, dtype=np.float32)
+            waits = np.array(self._waits_ms, dtype=np.float32)
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "queued": self._queue.qsize(),
+                "avg_batch_size": round(float(sizes.mean()), 2) if sizes.size else 0.0,
+                "max_batch_size": self._max_seen,
+                "queue_wait_ms_p50": round(float(np.percentile(waits, 50)), 2) if waits.size else 0.0,
+                "queue_wait_ms_p95": round(float(np.percentile(waits, 95)), 2) if waits.size else 0.0,
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_batch,
+            }
+
+    # ---------------- WORKER ----------------
+    def _collect(self, first):
+        batch = [first]
+        deadline = first.enqueued + self.window
+        stop = False
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is None:
+                stop = True
+                break
+            batch.append(nxt)
+
+        return batch, stop
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch, stop = self._collect(first)
+            started = time.perf_counter()
+
+            try:
+                results = self.run_batch([p.item for p in batch])
+                for p, r in zip(batch, results):
+                    p.future.set_result(r)
+            except Exception as e:
+                for p in batch:
+                    if not p.future.done():
+                        p.future.set_exception(e)
+
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._max_seen = max(self._max_seen, len(batch))
+                self._batch_sizes.append(len(batch))
+                self._waits_ms.extend((started - p.enqueued) * 1000.0 for p in batch)
+
+            if stop:
+                break
+
+        # fail anything still waiting after close()
+        while True:
+            try:
+                p = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if p is not None:
+                p.future.set_exception(RuntimeError("batcher is closed"))
@@ -0,0 +1,97 @@
+# src/check_scheduler.py
+# Per-session deadlines for heavy checks (device detection).
+#
+# Each session gets its own next-due time per check, so one busy candidate
+# can no longer starve everyone else of checks. First deadlines are offset
+# by a stable per-session phase, which spreads the heavy checks of many
+# sessions evenly over the interval instead of bunching them together.
+
+import os
+import time
+import zlib
+import threading
+
+# =====================================
+# CONFIG
+# =====================================
+CHECK_INTERVALS = {
+    "object": float(os.getenv("CHECK_OBJECT_INTERVAL_S", "2.0")),
+}
+SCHED_MAX_SESSIONS = int(os.getenv("CHECK_MAX_SESSIONS", "5000"))
+SCHED_IDLE_S = float(os.getenv("CHECK_SESSION_IDLE_S", "600"))
+
+
+class CheckScheduler:
+    def __init__(self, intervals=None, max_sessions=SCHED_MAX_SESSIONS, idle_s=SCHED_IDLE_S):
+        self.intervals = dict(intervals or CHECK_INTERVALS)
+        self.checks = list(self.intervals)
+        self.max_sessions = max_sessions
+        self.idle_s = idle_s
+
+        self._lock = threading.Lock()
+        # session_id -> [first_seen, last_seen, next_due_0.., count_0..]
+        self._table = {}
+
+    # ---------------- INTERNAL ----------------
+    def _phase(self, session_id):
+        return (zlib.crc32(session_id.encode("utf8")) % 1000) / 1000.0
+
+    def _row(self, session_id, now):
+        row = self._table.get(session_id)
+        if row is None:
+            if len(self._table) >= self.max_sessions:
+                self._evict(now)
+            phase = self._phase(session_id)
+            row = [now, now]
+            row += [now + phase * self.intervals[c] for c in self.checks]
+            row += [0] * len(self.checks)
+            self._table[session_id] = row
+        row[1] = now
+        return row
+
+    def _evict(self, now):
+        idle = [s for s, r in self._table.items() if now - r[1] > self.idle_s]
+        for s in idle:
+            del self._table[s]
+        if len(self._table) >= self.max_sessions:
+            # still full -> drop the least recently seen
+            oldest = min(self._table, key=lambda s: self._table[s][1])
+            del self._table[oldest]
+
+    # ---------------- PUBLIC ----------------
+    def due(self, session_id, check, now=None):
+        """True when `check` should run for this session now (and books the next slot)."""
+        now = time.time() if now is None else now
+        i = self.checks.index(check)
+        interval = self.intervals[check]
+        n = len(self.checks)
+
+        with self._lock:
+            row = self._row(session_id, now)
+            if now < row[2 + i]:
+                return False
+
+            # keep the session's phase: advance by whole intervals past now
+            missed = int((now - row[2 + i]) // interval) + 1
+            row[2 + i] += missed * interval
+            row[2 + n + i] += 1
+            return True
+
+    def stats(self, limit=50):
+        with self._lock:
+            n = len(self.checks)
+            recent = sorted(self._table.items(), key=lambda kv: kv[1][1], reverse=True)[:limit]
+            sessions = {}
+            for sid, row in recent:
+                span = max(row[1] - row[0], 1e-6)
+                sessions[sid] = {
+                    f"{c}_checks": row[2 + n + i] for i, c in enumerate(self.checks)
+                }
+                sessions[sid].update({
+                    f"{c}_per_s": round(row[2 + n + i] / span, 3) for i, c in enumerate(self.checks)
+                })
+            return {
+                "intervals_s": self.intervals,
+                "sessions_tracked": len(self._table),
+                "sessions": sessions,
+            }
@@ -6,12 +6,14 @@ import numpy as np
 
 CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
 
+# load once; images here are independent stills, so there is nothing to track
+face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
+
 def detect_and_crop_face(img_path, out_size=(48,48)):
     img = cv2.imread(str(img_path))
     if img is None:
         return None
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
     faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
     if len(faces) == 0:
         return None
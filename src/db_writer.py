@@ -0,0 +1,130 @@
+# src/db_writer.py
+# Single SQLite writer with group commits.
+#
+# One persistent WAL-mode connection lives on a background thread. Callers
+# enqueue rows (non-blocking); the thread inserts them with executemany and
+# commits every `batch_rows` rows or `flush_ms` milliseconds, whichever first.
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+
+# =====================================
+# CONFIG
+# =====================================
+DB_BATCH_ROWS = int(os.getenv("DB_BATCH_ROWS", "200"))
+DB_FLUSH_MS = float(os.getenv("DB_FLUSH_MS", "250"))
+
+
+class LogWriter:
+    def __init__(self, db_path, insert_sql, batch_rows=DB_BATCH_ROWS, flush_ms=DB_FLUSH_MS):
+        self.db_path = str(db_path)
+        self.insert_sql = insert_sql
+        self.batch_rows = max(1, int(batch_rows))
+        self.flush_interval = max(1.0, float(flush_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # metrics
+        self._rows = 0
+        self._commits = 0
+        self._errors = 0
+
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+
+    # ---------------- PUBLIC ----------------
+    def write(self, row):
+        """Queue one row (tuple matching insert_sql placeholders)."""
+        if self._closed:
+            raise RuntimeError("writer is closed")
+        self._queue.put(row)
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rows_written": self._rows,
+                "commits": self._commits,
+                "avg_rows_per_commit": round(self._rows / self._commits, 2) if self._commits else 0.0,
+                "errors": self._errors,
+                "queued": self._queue.qsize(),
+                "batch_rows": self.batch_rows,
+                "flush_ms": self.flush_interval * 1000.0,
+            }
+
+    # ---------------- WORKER ----------------
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _commit(self, conn, rows):
+        if not rows:
+            return
+        try:
+            conn.executemany(self.insert_sql, rows)
+            conn.commit()
+            with self._lock:
+                self._rows += len(rows)
+                self._commits += 1
+        except sqlite3.Error as e:
+            conn.rollback()
+            with self._lock:
+                self._errors += 1
+            print("❌ DB writer error:", e)
+
+    def _loop(self):
+        conn = self._connect()
+        pending = []
+        waiters = []
+        deadline = None
+        stop = False
+
+        while not stop:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # flush interval elapsed
+
+            if item is None:
+                stop = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not False:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if stop or waiters or item is False or len(pending) >= self.batch_rows:
+                self._commit(conn, pending)
+                pending = []
+                deadline = None
+                for w in waiters:
+                    w.set()
+                waiters = []
+
+        conn.close()
@@ -0,0 +1,90 @@
+# src/device_worker.py
+# Background device detection that never blocks the display loop.
+#
+# The display loop hands over every frame with submit(); the worker only
+# keeps the newest one (older, unprocessed frames are dropped) and
+# publishes its most recent result together with the capture time of the
+# frame it was computed on, so the UI can show how old the overlay is.
+
+import time
+import threading
+
+
+class LatestFrameWorker:
+    def __init__(self, detect_fn, name="device-worker"):
+        """detect_fn: callable(frame) -> result (any object)."""
+        self.detect_fn = detect_fn
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_ts = None
+        self._running = True
+
+        self._result = None
+        self._result_ts = None
+        self._seq = 0
+
+        # counters
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.last_ms = 0.0
+
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    # ---------------- PUBLIC ----------------
+    def submit(self, frame, ts=None):
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._frame_ts = ts if ts is not None else time.time()
+            self.submitted += 1
+            self._cond.notify()
+
+    def latest(self):
+        """Return (result, frame_ts, seq); seq increases with every new result."""
+        with self._cond:
+            return self._result, self._result_ts, self._seq
+
+    def stop(self, timeout=2.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "last_ms": round(self.last_ms, 1),
+            }
+
+    # ---------------- WORKER ----------------
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running and self._frame is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, ts = self._frame, self._frame_ts
+                self._frame = None
+
+            t0 = time.perf_counter()
+            try:
+                result = self.detect_fn(frame)
+            except Exception as e:
+                print("❌ Device worker error:", e)
+                continue
+            ms = (time.perf_counter() - t0) * 1000.0
+
+            with self._cond:
+                self._result = result
+                self._result_ts = ts
+                self._seq += 1
+                self.processed += 1
+                self.last_ms = ms
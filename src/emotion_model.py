@@ -13,9 +13,15 @@ import time
 import numpy as np
 from pathlib import Path
 from PIL import Image
-from torchvision import transforms
 
-from src.model import SimpleFERNet
+from src.fer_inference import (
+    load_fer_checkpoint, forward_probs, emotion_from_probs, load_backend, parity_check, FER_BACKEND
+)
+from src.frame_io import face_tensor, faces_to_tensors
+from src.batcher import MicroBatcher
+from src.face_stage import detect_faces_scaled, largest_face, crop_face, face_crops
+from src.check_scheduler import CheckScheduler
+from src.evidence_writer import EvidenceWriter
 from deepface import DeepFace
 from src.object_detector import detect_objects
 
@@ -25,133 +31,241 @@ from src.object_detector import detect_objects
 ROOT = Path(__file__).resolve().parents[1]
 MODEL_PATH = ROOT / "best_fer_model.pth"
 EVIDENCE_DIR = ROOT / "logs" / "evidence"
-EVIDENCE_DIR.mkdir(parents=True, exist_ok=True)
 
 # =====================================
-# IMAGE TRANSFORM (FAST)
+# MICRO-BATCHING (CONCURRENT REQUESTS)
 # =====================================
-transform = transforms.Compose([
-    transforms.Resize((48, 48)),
-    transforms.ToTensor(),
-    transforms.Normalize([0.5, 0.5, 0.5], [0.5, 0.5, 0.5])
-])
+BATCHING = os.getenv("FER_BATCHING", "1") == "1"
+BATCH_WINDOW_MS = float(os.getenv("FER_BATCH_WINDOW_MS", "8"))
+MAX_BATCH = int(os.getenv("FER_MAX_BATCH", "32"))   # upper bound; see EmotionModel(max_concurrency=...)
+
+# =====================================
+# FACE DETECTION (REALTIME PATH)
+# =====================================
+# Same downscaled cascade as the Streamlit monitor; boxes come back in
+# full-resolution coordinates, so the FER crop is still taken at full size
+FACE_DETECT_SCALE = float(os.getenv("FACE_DETECT_SCALE", "0.5"))
+FACE_SCALE_FACTOR = float(os.getenv("FACE_SCALE_FACTOR", "1.3"))
+FACE_MIN_FRAC = float(os.getenv("FACE_MIN_FRAC", "0.12"))   # face height / frame height
+FACE_MAX_FRAC = float(os.getenv("FACE_MAX_FRAC", "0.9"))
 
 # =====================================
 # EMOTION MODEL
 # =====================================
 class EmotionModel:
-    def __init__(self):
+    def __init__(self, heavy_runner=None, max_concurrency=None):
         self.device = torch.device("cpu")
 
-        # Timers for throttling heavy tasks
-        self.last_face_check = 0
-        self.last_object_check = 0
+        # Runner for DeepFace / YOLO calls (e.g. a process pool); direct call by default
+        self.heavy_runner = heavy_runner
+
+        # Per-session deadlines for throttled checks (shared model, many candidates)
+        self.scheduler = CheckScheduler()
+
+        # Alert snapshots are encoded / written off the inference path, one per episode
+        self.evidence = EvidenceWriter(EVIDENCE_DIR)
 
         # Load trained FER model
         if MODEL_PATH.exists():
-            ckpt = torch.load(MODEL_PATH, map_location=self.device)
+            self.model, self.classes = load_fer_checkpoint(MODEL_PATH, self.device)
 
-            self.classes = ckpt["classes"]
-            self.model = SimpleFERNet(n_classes=len(self.classes))
-            self.model.load_state_dict(ckpt["model_state"], strict=True)
-            self.model.eval()
+            # Pluggable runtime (eager / TorchScript / ONNX Runtime / INT8), verified against eager
+            self.runner, self.backend = load_backend(FER_BACKEND, self.model)
+            if self.backend != "eager":
+                ok, metric = parity_check(self.runner, self.model, kind=self.backend)
+                if ok:
+                    print(f"✅ FER backend '{self.backend}' parity OK ({metric:.3g})")
+                else:
+                    print(f"⚠ FER backend '{self.backend}' parity failed ({metric:.3g}); using eager")
+                    self.runner, self.backend = self.model, "eager"
+
+            # Frames from concurrent callers share one forward pass. A batch can
+            # never hold more frames than there are threads submitting them, so
+            # cap it there: a full batch then flushes at once instead of waiting
+            # out the window for frames that cannot arrive.
+            max_batch = MAX_BATCH if max_concurrency is None else max(1, min(MAX_BATCH, max_concurrency))
+            self.batcher = MicroBatcher(
+                self.predict_batch,
+                max_batch=max_batch,
+                window_ms=BATCH_WINDOW_MS,
+                name="fer-batcher"
+            ) if BATCHING else None
 
             self.mode = "custom"
             print("✅ Custom FER model loaded")
         else:
             self.model = None
+            self.runner = None
+            self.backend = None
+            self.batcher = None
             self.mode = "deepface"
             print("⚠ Using DeepFace fallback")
 
     # =====================================
-    # MAIN REALTIME PREDICTION
+    # BATCHED FORWARD PASS
     # =====================================
-    def predict_from_pil(self, pil_img: Image.Image):
-        frame_rgb = np.array(pil_img)
-        now = time.time()
-        ts = time.strftime("%Y%m%d_%H%M%S")
+    def predict_batch(self, tensors):
+        """Run SimpleFERNet once over a list of (3, 48, 48) tensors -> list of prob vectors."""
+        return forward_probs(self.runner, tensors)
+
+    def _classify(self, x):
+        if self.batcher is not None:
+            return self.batcher.submit(x).result()
+        return self.predict_batch([x])[0]
+
+    def _run_heavy(self, fn, *args, **kwargs):
+        if self.heavy_runner is not None:
+            return self.heavy_runner(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    def _emotion_from_probs(self, probs):
+        return emotion_from_probs(probs, self.classes)
+
+    def _deepface_emotion(self, face_bgr):
+        # input is already a face crop -> skip DeepFace's own detector
+        res = self._run_heavy(
+            DeepFace.analyze,
+            face_bgr,
+            actions=["emotion"],
+            detector_backend="skip",
+            enforce_detection=False
+        )
+
+        dominant = res[0]["dominant_emotion"]
+        confidence = round(res[0]["emotion"][dominant] / 100, 3)
+
+        return {
+            "status": "ok",
+            "dominant_emotion": dominant,
+            "confidence": confidence
+        }
+
+    def classify_frames(self, frames_bgr):
+        """
+        Emotion only (no device checks) for a list of BGR frames: one face
+        detection pass per frame, then one forward pass over all face crops.
+        Frames without a face get a "no_face" result.
+        """
+        if not frames_bgr:
+            return []
+
+        crops, boxes = face_crops(frames_bgr, bgr=True)
+        found = [c for c in crops if c is not None]
 
-        # -------------------------------------------------
-        # 1️⃣ EMOTION + CONFIDENCE (EVERY FRAME – REALTIME)
-        # -------------------------------------------------
         if self.mode == "custom":
-            x = transform(pil_img).unsqueeze(0)
+            emotions = [self._emotion_from_probs(p) for p in self.predict_batch(faces_to_tensors(found))] if found else []
+        else:
+            emotions = [self._deepface_emotion(c) for c in found]
+
+        it = iter(emotions)
+        return [
+            {**next(it), "faces": len(b)} if c is not None else self._no_face_result()
+            for c, b in zip(crops, boxes)
+        ]
+
+    def _no_face_result(self):
+        return {"status": "no_face", "message": "No face detected", "faces": 0}
+
+    def metrics(self):
+        return {
+            "mode": self.mode,
+            "backend": self.backend,
+            "checks": self.scheduler.stats(),
+            "batcher": self.batcher.stats() if self.batcher is not None else None,
+            "evidence": self.evidence.stats()
+        }
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+        self.evidence.close()
+
+    # =====================================
+    # MAIN REALTIME PREDICTION
+    # =====================================
+    def predict_from_pil(self, pil_img: Image.Image, session_id: str = "default"):
+        frame_bgr = cv2.cvtColor(np.asarray(pil_img.convert("RGB")), cv2.COLOR_RGB2BGR)
+        return self.predict_from_array(frame_bgr, session_id)
 
-            with torch.no_grad():
-                logits = self.model(x)
-                probs = torch.softmax(logits, dim=1)[0].numpy()
+    def predict_from_array(self, frame_bgr: np.ndarray, session_id: str = "default"):
+        """
+        Full realtime pass on one decoded BGR frame (see src.frame_io.decode_image).
 
-            idx = int(np.argmax(probs))
-            raw_conf = float(probs[idx])
+        Returns every signal of the frame at once:
+          {status, dominant_emotion, confidence, faces, devices, alerts: [...]}
+        status is "alert" if any alert fired, else "ok" / "no_face"; the
+        emotion keys are present whenever a face was classified.
+        """
+        now = time.time()
 
-            # 🔥 CONFIDENCE CALIBRATION (NO MORE 100%)
-            confidence = round(min(0.95, max(0.35, raw_conf)), 3)
+        # -------------------------------------------------
+        # 1️⃣ FACE DETECTION (ONE PASS, SHARED BY ALL STAGES)
+        # -------------------------------------------------
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        boxes = detect_faces_scaled(
+            gray, FACE_DETECT_SCALE, FACE_SCALE_FACTOR, 5, FACE_MIN_FRAC, FACE_MAX_FRAC
+        )
+        face_box = largest_face(boxes)
 
-            emotion_result = {
-                "status": "ok",
-                "dominant_emotion": self.classes[idx],
-                "confidence": confidence
-            }
+        # -------------------------------------------------
+        # 2️⃣ EMOTION ON THE FACE CROP (EVERY FRAME – REALTIME)
+        # -------------------------------------------------
+        if face_box is None:
+            emotion_result = self._no_face_result()
         else:
-            res = DeepFace.analyze(
-                frame_rgb,
-                actions=["emotion"],
-                detector_backend="opencv",
-                enforce_detection=False
-            )
-
-            dominant = res[0]["dominant_emotion"]
-            confidence = round(res[0]["emotion"][dominant] / 100, 3)
-
-            emotion_result = {
-                "status": "ok",
-                "dominant_emotion": dominant,
-                "confidence": confidence
-            }
+            face_bgr = crop_face(frame_bgr, face_box)
+            if self.mode == "custom":
+                emotion_result = self._emotion_from_probs(self._classify(face_tensor(face_bgr)))
+            else:
+                emotion_result = self._deepface_emotion(face_bgr)
+
+        alerts = []
 
         # -------------------------------------------------
-        # 2️⃣ MULTI-FACE CHECK (EVERY 1 SECOND)
+        # MULTI-FACE ALERT (SAME BOXES, ONE SNAPSHOT PER EPISODE)
         # -------------------------------------------------
-        if now - self.last_face_check > 1:
-            self.last_face_check = now
-
-            faces = DeepFace.extract_faces(
-                img_path=frame_rgb,
-                detector_backend="opencv",
-                enforce_detection=False
-            )
-
-            if len(faces) > 1:
-                cv2.imwrite(
-                    str(EVIDENCE_DIR / f"multi_face_{ts}.jpg"),
-                    cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
-                )
-
-                return {
-                    "status": "alert",
-                    "message": "Multiple faces detected (malpractice)"
-                }
+        if len(boxes) > 1:
+            alerts.append({
+                "type": "multi_face",
+                "message": "Multiple faces detected (malpractice)",
+                "evidence": self.evidence.capture(session_id, "multi_face", frame_bgr, now)
+            })
 
         # -------------------------------------------------
-        # 3️⃣ OBJECT / DEVICE CHECK (EVERY 2 SECONDS)
+        # 3️⃣ OBJECT / DEVICE CHECK (EVERY 2 SECONDS PER SESSION)
         # -------------------------------------------------
-        if now - self.last_object_check > 2:
-            self.last_object_check = now
-
-            devices = detect_objects(frame_rgb)
-            if devices:
-                cv2.imwrite(
-                    str(EVIDENCE_DIR / f"device_{ts}.jpg"),
-                    cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
-                )
-
-                return {
-                    "status": "alert",
-                    "message": "Electronic device detected",
-                    "devices": devices
-                }
+        devices, device_alerts = self.check_devices(frame_bgr, session_id, now)
+        alerts += device_alerts
 
         # -------------------------------------------------
-        # 4️⃣ RETURN REALTIME EMOTION RESULT
+        # 4️⃣ ONE RESULT: EMOTION + FACES + DEVICES + ALERTS
         # -------------------------------------------------
-        return emotion_result
+        return self.with_alerts({**emotion_result, "faces": len(boxes)}, devices, alerts)
+
+    def check_devices(self, frame_bgr: np.ndarray, session_id: str = "default", now=None):
+        """
+        Device check if it is due for this session -> (devices or None, alerts).
+        Also used on frame-cache hits, so a device appearing in an otherwise
+        unchanged scene is still caught on schedule.
+        """
+        now = time.time() if now is None else now
+        if not self.scheduler.due(session_id, "object", now):
+            return None, []
+
+        # YOLO expects BGR, same array as every other stage
+        devices = self._run_heavy(detect_objects, frame_bgr)
+        if not devices["objects"]:
+            return devices, []
+        return devices, [{
+            "type": "device",
+            "message": "Electronic device detected",
+            "evidence": self.evidence.capture(session_id, "device", frame_bgr, now)
+        }]
+
+    @staticmethod
+    def with_alerts(result, devices, alerts):
+        result = {**result, "devices": devices, "alerts": alerts}
+        if alerts:
+            result["status"] = "alert"
+            result["message"] = alerts[0]["message"]
+        return result
@@ -10,26 +10,37 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]
 MODEL_PATH = ROOT / "best_fer_model.pth"
 
-def evaluate(batch_size=64):
+def get_loader(split='test', batch_size=64):
     data_dir = ROOT/"data_preprocessed"
     transform = transforms.Compose([
         transforms.Resize((48,48)),
         transforms.ToTensor(),
         transforms.Normalize([0.5]*3, [0.5]*3)
     ])
-    test_ds = datasets.ImageFolder(root=str(data_dir/'test'), transform=transform)
-    test_loader = DataLoader(test_ds, batch_size=batch_size, shuffle=False)
-    ckpt = torch.load(MODEL_PATH, map_location='cpu')
-    classes = ckpt['classes']
-    model = SimpleFERNet(n_classes=len(classes))
-    model.load_state_dict(ckpt['model_state'])
-    model.eval()
+    ds = datasets.ImageFolder(root=str(data_dir/split), transform=transform)
+    return DataLoader(ds, batch_size=batch_size, shuffle=False)
+
+def predict_all(model, loader):
     preds=[]; trues=[]
     with torch.no_grad():
-        for x,y in test_loader:
+        for x,y in loader:
             out = model(x)
             preds.extend(out.argmax(dim=1).numpy().tolist())
             trues.extend(y.numpy().tolist())
+    return preds, trues
+
+def accuracy(model, loader):
+    preds, trues = predict_all(model, loader)
+    return float((np.array(preds)==np.array(trues)).mean())
+
+def evaluate(batch_size=64):
+    test_loader = get_loader('test', batch_size)
+    ckpt = torch.load(MODEL_PATH, map_location='cpu')
+    classes = ckpt['classes']
+    model = SimpleFERNet(n_classes=len(classes))
+    model.load_state_dict(ckpt['model_state'])
+    model.eval()
+    preds, trues = predict_all(model, test_loader)
     acc = (np.array(preds)==np.array(trues)).mean()
     cm = skm.confusion_matrix(trues, preds)
     report = skm.classification_report(trues, preds, target_names=classes, digits=4)
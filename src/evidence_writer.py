@@ -0,0 +1,158 @@
+# src/evidence_writer.py
+# Background evidence snapshots for proctoring alerts.
+#
+# - inference threads only enqueue the frame; resize + JPEG encode + disk
+#   write happen on one background thread
+# - one snapshot per alert episode: an episode for (session, kind) lasts as
+#   long as alerts keep arriving less than EVIDENCE_EPISODE_GAP_S apart
+# - files are named <session>_<kind>_<YYYYmmdd_HHMMSS>_<seq>.jpg, where seq
+#   is a per-process counter, so bursts within one second never collide
+
+import os
+import re
+import time
+import queue
+import threading
+from pathlib import Path
+
+import cv2
+
+# =====================================
+# CONFIG
+# =====================================
+EVIDENCE_JPEG_QUALITY = int(os.getenv("EVIDENCE_JPEG_QUALITY", "80"))
+EVIDENCE_MAX_SIDE = int(os.getenv("EVIDENCE_MAX_SIDE", "960"))         # 0 = keep full size
+EVIDENCE_EPISODE_GAP_S = float(os.getenv("EVIDENCE_EPISODE_GAP_S", "5.0"))
+EVIDENCE_MAX_QUEUE = int(os.getenv("EVIDENCE_MAX_QUEUE", "64"))
+
+
+def _safe(name):
+    return re.sub(r"[^A-Za-z0-9_-]", "_", str(name))[:64] or "default"
+
+
+class EvidenceWriter:
+    def __init__(
+        self,
+        out_dir,
+        quality=EVIDENCE_JPEG_QUALITY,
+        max_side=EVIDENCE_MAX_SIDE,
+        episode_gap_s=EVIDENCE_EPISODE_GAP_S,
+        max_queue=EVIDENCE_MAX_QUEUE
+    ):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.quality = int(quality)
+        self.max_side = int(max_side)
+        self.episode_gap_s = float(episode_gap_s)
+
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._lock = threading.Lock()
+        self._episodes = {}      # (session_id, kind) -> last alert time
+        self._seq = 0
+        self._closed = False
+
+        # metrics
+        self._snapshots = 0
+        self._bytes = 0
+        self._deduplicated = 0
+        self._dropped = 0
+        self._errors = 0
+
+        self._thread = threading.Thread(target=self._loop, name="evidence-writer", daemon=True)
+        self._thread.start()
+
+    # ---------------- PUBLIC ----------------
+    def capture(self, session_id, kind, frame_bgr, now=None):
+        """
+        Report an alert frame. Returns the snapshot file name when this frame
+        opens a new episode (and was queued), else None. The frame must not
+        be modified afterwards.
+        """
+        now = time.time() if now is None else now
+        key = (session_id, kind)
+
+        with self._lock:
+            last = self._episodes.get(key)
+            self._episodes[key] = now
+            if last is not None and now - last < self.episode_gap_s:
+                self._deduplicated += 1
+                return None
+            if len(self._episodes) > 10000:
+                self._prune(now)
+
+            self._seq += 1
+            stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+            name = f"{_safe(session_id)}_{kind}_{stamp}_{self._seq:06d}.jpg"
+
+        if self._closed:
+            return None
+        try:
+            self._queue.put_nowait((name, frame_bgr))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return None
+        return name
+
+    def flush(self, timeout=5.0):
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "snapshots": self._snapshots,
+                "bytes_written": self._bytes,
+                "avg_bytes": int(self._bytes / self._snapshots) if self._snapshots else 0,
+                "deduplicated": self._deduplicated,
+                "dropped": self._dropped,
+                "errors": self._errors,
+                "queued": self._queue.qsize(),
+                "jpeg_quality": self.quality,
+                "max_side": self.max_side,
+            }
+
+    # ---------------- WORKER ----------------
+    def _prune(self, now):
+        stale = [k for k, t in self._episodes.items() if now - t >= self.episode_gap_s]
+        for k in stale:
+            del self._episodes[k]
+
+    def _encode(self, frame):
+        h, w = frame.shape[:2]
+        if self.max_side and max(h, w) > self.max_side:
+            s = self.max_side / float(max(h, w))
+            frame = cv2.resize(frame, (int(w * s), int(h * s)), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("JPEG encode failed")
+        return buf.tobytes()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+
+            name, frame = item
+            try:
+                data = self._encode(frame)
+                (self.out_dir / name).write_bytes(data)
+                with self._lock:
+                    self._snapshots += 1
+                    self._bytes += len(data)
+            except (OSError, ValueError, cv2.error) as e:
+                with self._lock:
+                    self._errors += 1
+                print("❌ Evidence writer error:", e)
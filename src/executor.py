@@ -0,0 +1,100 @@
+# src/executor.py
+# Inference executor: keeps CPU-bound model calls off the asyncio event loop.
+#
+# - thread pool for torch work (bounded torch intra-op threads)
+# - optional process pool for DeepFace / YOLO heavy checks
+# - bounded number of in-flight jobs; callers get ExecutorBusy when saturated
+
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import torch
+
+# =====================================
+# CONFIG
+# =====================================
+INFER_WORKERS = int(os.getenv("INFER_WORKERS", "4"))
+INFER_MAX_PENDING = int(os.getenv("INFER_MAX_PENDING", "64"))
+INFER_TORCH_THREADS = int(os.getenv("INFER_TORCH_THREADS", str(min(4, os.cpu_count() or 1))))
+INFER_PROCESS_WORKERS = int(os.getenv("INFER_PROCESS_WORKERS", "0"))
+
+
+class ExecutorBusy(Exception):
+    """Raised when the inference queue is saturated (map to HTTP 429)."""
+
+
+class InferenceExecutor:
+    def __init__(
+        self,
+        workers=INFER_WORKERS,
+        max_pending=INFER_MAX_PENDING,
+        torch_threads=INFER_TORCH_THREADS,
+        process_workers=INFER_PROCESS_WORKERS
+    ):
+        torch.set_num_threads(max(1, torch_threads))
+
+        self.workers = workers
+        self.max_pending = max_pending
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="infer")
+        # spawn, not fork: by now the batcher / writer / job threads run and torch is loaded
+        self._procs = ProcessPoolExecutor(
+            max_workers=process_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) if process_workers > 0 else None
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._submitted = 0
+        self._rejected = 0
+
+    # ---------------- ADMISSION ----------------
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_pending:
+                self._rejected += 1
+                raise ExecutorBusy(f"{self._in_flight} inference jobs in flight")
+            self._in_flight += 1
+            self._submitted += 1
+
+    def _release(self, _fut=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    # ---------------- PUBLIC ----------------
+    async def run(self, fn, *args):
+        """Run fn(*args) on the inference thread pool and await the result."""
+        self._acquire()
+        try:
+            fut = self._threads.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # release on completion, not on await, so cancelled requests still hold their slot
+        fut.add_done_callback(self._release)
+        return await asyncio.wrap_future(fut)
+
+    def run_heavy(self, fn, *args, **kwargs):
+        """Blocking call for DeepFace / YOLO work; uses the process pool when enabled."""
+        if self._procs is None:
+            return fn(*args, **kwargs)
+        return self._procs.submit(fn, *args, **kwargs).result()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "process_workers": self._procs._max_workers if self._procs else 0,
+                "torch_threads": torch.get_num_threads(),
+                "in_flight": self._in_flight,
+                "max_pending": self.max_pending,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._threads.shutdown(wait=True)
+        if self._procs is not None:
+            self._procs.shutdown(wait=True)
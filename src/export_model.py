@@ -0,0 +1,92 @@
+# src/export_model.py
+# Export best_fer_model.pth to TorchScript + ONNX, check parity against eager
+# PyTorch and print a latency comparison.
+#
+#   python -m src.export_model
+#
+# Select the runtime in the API with FER_BACKEND=eager|torchscript|onnx
+
+import json
+import time
+import torch
+from pathlib import Path
+
+from src.fer_inference import (
+    load_fer_checkpoint, load_backend, parity_check, TS_PATH, ONNX_PATH, ort
+)
+
+ROOT = Path(__file__).resolve().parents[1]
+MODEL_PATH = ROOT / "best_fer_model.pth"
+REPORT_PATH = ROOT / "logs" / "export_report.json"
+
+
+def export(model):
+    dummy = torch.zeros(1, 3, 48, 48)
+
+    # ---- TorchScript ----
+    with torch.no_grad():
+        scripted = torch.jit.trace(model, dummy)
+    scripted = torch.jit.freeze(scripted.eval())
+    scripted.save(str(TS_PATH))
+    print("✅ TorchScript saved:", TS_PATH)
+
+    # ---- ONNX (dynamic batch) ----
+    torch.onnx.export(
+        model,
+        dummy,
+        str(ONNX_PATH),
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=13
+    )
+    print("✅ ONNX saved:", ONNX_PATH)
+
+
+def latency_ms(runner, batch_size, iters=50):
+    x = torch.rand(batch_size, 3, 48, 48) * 2 - 1
+    with torch.no_grad():
+        for _ in range(5):
+            runner(x)
+        t0 = time.perf_counter()
+        for _ in range(iters):
+            runner(x)
+    return (time.perf_counter() - t0) * 1000.0 / iters
+
+
+def compare(model):
+    report = {}
+    for kind in ["eager", "torchscript", "onnx"]:
+        runner, used = load_backend(kind, model)
+        if used != kind:
+            print(f"⚠ skipping {kind}")
+            continue
+
+        ok, diff = parity_check(runner, model)
+        report[kind] = {
+            "parity_ok": ok,
+            "max_abs_diff": diff,
+            "ms_batch_1": round(latency_ms(runner, 1), 3),
+            "ms_batch_32": round(latency_ms(runner, 32), 3),
+        }
+
+    print("\nBackend       parity   max diff    1 frame (ms)   32 frames (ms)")
+    for kind, r in report.items():
+        print(
+            f"{kind:<13} {'OK' if r['parity_ok'] else 'FAIL':<8} {r['max_abs_diff']:<11.2e} "
+            f"{r['ms_batch_1']:<14} {r['ms_batch_32']}"
+        )
+    return report
+
+
+if __name__ == "__main__":
+    model, classes = load_fer_checkpoint(MODEL_PATH)
+    export(model)
+
+    if ort is None:
+        print("⚠ onnxruntime not installed: ONNX parity/latency skipped")
+
+    report = compare(model)
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(json.dumps(report, indent=2))
+    print("\n📄 Report written to", REPORT_PATH)
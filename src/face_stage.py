@@ -0,0 +1,77 @@
+# src/face_stage.py
+# One face-detection pass per frame, shared by every downstream stage:
+#   - the largest box is cropped for the FER classifier (matches training crops)
+#   - box count drives the multi-face alert
+#   - zero boxes is the no-face signal
+
+import threading
+
+import cv2
+
+CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+
+# CascadeClassifier is not safe to share across threads -> one per thread
+_local = threading.local()
+
+
+def _cascade():
+    c = getattr(_local, "cascade", None)
+    if c is None:
+        c = cv2.CascadeClassifier(CASCADE_PATH)
+        _local.cascade = c
+    return c
+
+
+def detect_faces(frame, scale_factor=1.1, min_neighbors=5, bgr=False):
+    """Return face boxes [(x, y, w, h), ...] for an RGB (or BGR, bgr=True) frame."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY if bgr else cv2.COLOR_RGB2GRAY)
+    faces = _cascade().detectMultiScale(gray, scaleFactor=scale_factor, minNeighbors=min_neighbors)
+    return [tuple(int(v) for v in f) for f in faces]
+
+
+def detect_faces_scaled(gray, scale=0.5, scale_factor=1.3, min_neighbors=5,
+                        min_face_frac=0.12, max_face_frac=0.9, cascade=None):
+    """
+    Run the cascade on a downscaled copy of a grayscale frame and map boxes
+    back to full-resolution coordinates. min/max face size are given as a
+    fraction of frame height so the cascade skips impossible scales.
+    """
+    cascade = cascade if cascade is not None else _cascade()
+    scale = min(1.0, max(0.1, float(scale)))
+
+    small = gray if scale == 1.0 else cv2.resize(
+        gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+    )
+    h = small.shape[0]
+    min_side = max(20, int(h * min_face_frac))
+    max_side = max(min_side + 1, int(h * max_face_frac))
+
+    faces = cascade.detectMultiScale(
+        small,
+        scaleFactor=scale_factor,
+        minNeighbors=min_neighbors,
+        minSize=(min_side, min_side),
+        maxSize=(max_side, max_side)
+    )
+    inv = 1.0 / scale
+    return [tuple(int(round(v * inv)) for v in f) for f in faces]
+
+
+def largest_face(boxes):
+    return max(boxes, key=lambda b: b[2] * b[3]) if boxes else None
+
+
+def crop_face(frame, box):
+    x, y, w, h = box
+    return frame[y:y + h, x:x + w]
+
+
+def face_crops(frames, bgr=False):
+    """For a list of frames -> (crops, boxes): crop of the largest face or None per frame."""
+    crops, boxes = [], []
+    for f in frames:
+        found = detect_faces(f, bgr=bgr)
+        box = largest_face(found)
+        crops.append(crop_face(f, box) if box is not None else None)
+        boxes.append(found)
+    return crops, boxes
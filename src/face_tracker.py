@@ -0,0 +1,112 @@
+# src/face_tracker.py
+# Lightweight face tracking between detector runs.
+#
+# The full detector runs every `redetect_every` frames, when a track is
+# lost, and on every frame while no face is tracked. In between, each face
+# box is propagated with Lucas-Kanade optical flow on a handful of corner
+# points inside the box.
+
+import cv2
+import numpy as np
+
+LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+)
+
+
+class FaceTracker:
+    def __init__(self, detect_fn, redetect_every=10, min_points=6, max_corners=30):
+        """
+        detect_fn: callable(gray) -> [(x, y, w, h), ...]
+        redetect_every: run the full detector at least every N frames
+        min_points: a track with fewer surviving flow points counts as lost
+        """
+        self.detect_fn = detect_fn
+        self.redetect_every = max(1, int(redetect_every))
+        self.min_points = min_points
+        self.max_corners = max_corners
+
+        self._prev_gray = None
+        self._tracks = []   # list of (box, points)
+        self._since_detect = 0
+
+        # counters
+        self.frames = 0
+        self.detector_calls = 0
+
+    # ---------------- PUBLIC ----------------
+    def update(self, gray):
+        """Return face boxes for this grayscale frame."""
+        self.frames += 1
+
+        boxes = None
+        # nothing to track -> detect on every frame so an arriving face is seen at once
+        if self._tracks and self._prev_gray is not None and self._since_detect < self.redetect_every:
+            boxes = self._propagate(gray)   # None when a track is lost
+
+        if boxes is None:
+            boxes = self._detect(gray)
+
+        self._prev_gray = gray
+        self._since_detect += 1
+        return boxes
+
+    def reset(self):
+        self._prev_gray = None
+        self._tracks = []
+        self._since_detect = 0
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "detector_calls": self.detector_calls,
+            "detector_calls_saved": self.frames - self.detector_calls,
+            "redetect_every": self.redetect_every,
+        }
+
+    # ---------------- INTERNAL ----------------
+    def _detect(self, gray):
+        self.detector_calls += 1
+        self._since_detect = 0
+
+        boxes = [tuple(int(v) for v in b) for b in self.detect_fn(gray)]
+        self._tracks = [(b, self._seed_points(gray, b)) for b in boxes]
+        return boxes
+
+    def _seed_points(self, gray, box):
+        x, y, w, h = box
+        mask = np.zeros_like(gray)
+        mask[y:y + h, x:x + w] = 255
+        pts = cv2.goodFeaturesToTrack(
+            gray, maxCorners=self.max_corners, qualityLevel=0.01, minDistance=5, mask=mask
+        )
+        return pts if pts is not None else np.empty((0, 1, 2), dtype=np.float32)
+
+    def _propagate(self, gray):
+        h_img, w_img = gray.shape[:2]
+        new_tracks = []
+
+        for (x, y, w, h), pts in self._tracks:
+            if len(pts) < self.min_points:
+                return None
+
+            nxt, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, pts, None, **LK_PARAMS)
+            if nxt is None:
+                return None
+
+            ok = status.reshape(-1) == 1
+            if ok.sum() < self.min_points:
+                return None
+
+            old_ok = pts[ok].reshape(-1, 2)
+            new_ok = nxt[ok].reshape(-1, 2)
+            dx, dy = np.median(new_ok - old_ok, axis=0)
+
+            nx = int(round(min(max(x + dx, 0), w_img - w)))
+            ny = int(round(min(max(y + dy, 0), h_img - h)))
+            new_tracks.append(((nx, ny, w, h), new_ok.reshape(-1, 1, 2)))
+
+        self._tracks = new_tracks
+        return [b for b, _ in new_tracks]
@@ -0,0 +1,160 @@
+# src/fer_inference.py
+# Lightweight FER helpers shared by EmotionModel and video worker processes.
+# (No DeepFace / YOLO imports here so worker processes start fast.)
+
+import os
+from pathlib import Path
+
+import numpy as np
+import torch
+from torchvision import transforms
+
+from src.model import SimpleFERNet
+
+try:
+    import onnxruntime as ort
+except ImportError:  # optional: only needed for FER_BACKEND=onnx
+    ort = None
+
+# =====================================
+# PATHS / BACKEND CONFIG
+# =====================================
+ROOT = Path(__file__).resolve().parents[1]
+TS_PATH = ROOT / "best_fer_model.ts"
+ONNX_PATH = ROOT / "best_fer_model.onnx"
+INT8_PATH = ROOT / "best_fer_model_int8.ts"
+
+# eager | torchscript | onnx | int8
+FER_BACKEND = os.getenv("FER_BACKEND", "eager").lower()
+PARITY_ATOL = float(os.getenv("FER_PARITY_ATOL", "1e-3"))
+# quantized logits drift more; checked on top-1 agreement instead
+INT8_MIN_AGREEMENT = float(os.getenv("FER_INT8_MIN_AGREEMENT", "0.8"))
+# fixed inputs: the startup gate must give the same verdict for the same model
+PARITY_SAMPLES = int(os.getenv("FER_PARITY_SAMPLES", "256"))
+PARITY_SEED = int(os.getenv("FER_PARITY_SEED", "0"))
+
+# =====================================
+# IMAGE TRANSFORM (REFERENCE)
+# =====================================
+# Serving uses src.frame_io (OpenCV/NumPy, no PIL); this is the PIL
+# equivalent kept for offline tools that start from PIL images.
+transform = transforms.Compose([
+    transforms.Resize((48, 48)),
+    transforms.ToTensor(),
+    transforms.Normalize([0.5, 0.5, 0.5], [0.5, 0.5, 0.5])
+])
+
+
+# =====================================
+# CHECKPOINT
+# =====================================
+def load_fer_checkpoint(path, device="cpu"):
+    """Return (model, classes) from a best_fer_model.pth checkpoint."""
+    ckpt = torch.load(path, map_location=device)
+    classes = ckpt["classes"]
+    model = SimpleFERNet(n_classes=len(classes))
+    model.load_state_dict(ckpt["model_state"], strict=True)
+    model.eval()
+    return model, classes
+
+
+# =====================================
+# FORWARD + CALIBRATION
+# =====================================
+def forward_probs(model, tensors):
+    """One forward pass over a list of (3, 48, 48) tensors -> list of prob vectors."""
+    x = torch.stack(tensors, dim=0)
+
+    with torch.no_grad():
+        logits = model(x)
+        probs = torch.softmax(logits, dim=1).numpy()
+
+    return list(probs)
+
+
+def emotion_from_probs(probs, classes):
+    idx = int(np.argmax(probs))
+    raw_conf = float(probs[idx])
+
+    # 🔥 CONFIDENCE CALIBRATION (NO MORE 100%)
+    confidence = round(min(0.95, max(0.35, raw_conf)), 3)
+
+    return {
+        "status": "ok",
+        "dominant_emotion": classes[idx],
+        "confidence": confidence
+    }
+
+
+# =====================================
+# INFERENCE BACKENDS
+# =====================================
+class OnnxRunner:
+    """ONNX Runtime (CPU EP) session with the same call signature as the torch model."""
+
+    def __init__(self, path, threads=None):
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        out = self.session.run(None, {self.input_name: x.numpy()})[0]
+        return torch.from_numpy(out)
+
+
+def load_backend(kind, eager_model):
+    """Return (runner, kind_used); falls back to the eager model when an artifact is missing."""
+    if kind == "torchscript":
+        if TS_PATH.exists():
+            runner = torch.jit.load(str(TS_PATH), map_location="cpu")
+            runner.eval()
+            return runner, kind
+        print(f"⚠ {TS_PATH.name} not found (run python -m src.export_model); using eager")
+
+    elif kind == "int8":
+        if INT8_PATH.exists():
+            select_quant_engine()
+            runner = torch.jit.load(str(INT8_PATH), map_location="cpu")
+            runner.eval()
+            return runner, kind
+        print(f"⚠ {INT8_PATH.name} not found (run python -m src.quantize); using eager")
+
+    elif kind == "onnx":
+        if ort is None:
+            print("⚠ onnxruntime not installed; using eager")
+        elif ONNX_PATH.exists():
+            return OnnxRunner(ONNX_PATH, torch.get_num_threads()), kind
+        else:
+            print(f"⚠ {ONNX_PATH.name} not found (run python -m src.export_model); using eager")
+
+    return eager_model, "eager"
+
+
+def select_quant_engine():
+    engines = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError(f"no INT8 engine available ({engines})")
+
+
+def parity_check(runner, eager_model, n=PARITY_SAMPLES, atol=PARITY_ATOL, kind=None, seed=PARITY_SEED):
+    """
+    Compare runner vs eager on a seeded random batch -> (ok, metric).
+    metric is the max |logit difference|, or top-1 agreement for int8.
+    """
+    gen = torch.Generator().manual_seed(seed)
+    x = torch.rand(n, 3, 48, 48, generator=gen) * 2 - 1
+    with torch.no_grad():
+        ref = eager_model(x)
+        out = runner(x)
+
+    if kind == "int8":
+        agree = float((ref.argmax(dim=1) == out.argmax(dim=1)).float().mean())
+        return agree >= INT8_MIN_AGREEMENT, agree
+
+    diff = float((ref - out).abs().max())
+    return diff <= atol, diff
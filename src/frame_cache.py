@@ -0,0 +1,102 @@
+# src/frame_cache.py
+# Per-session result cache keyed by a perceptual hash of the frame.
+#
+# Candidates sit still for long stretches, so consecutive frames are often
+# near-identical. A 64-bit dHash (9x8 grayscale gradient signs) is compared
+# by Hamming distance against the session's recent frames; a close enough,
+# fresh enough match reuses the previous result instead of running inference.
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# =====================================
+# CONFIG
+# =====================================
+CACHE_MAX_DISTANCE = int(os.getenv("FRAME_CACHE_MAX_DISTANCE", "4"))
+CACHE_TTL_S = float(os.getenv("FRAME_CACHE_TTL_S", "2.0"))
+CACHE_PER_SESSION = int(os.getenv("FRAME_CACHE_PER_SESSION", "8"))
+CACHE_MAX_SESSIONS = int(os.getenv("FRAME_CACHE_MAX_SESSIONS", "2000"))
+
+
+def dhash(frame, hash_size=8):
+    """64-bit difference hash of a BGR (see src.frame_io.decode_image) or grayscale frame."""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class FrameResultCache:
+    def __init__(
+        self,
+        max_distance=CACHE_MAX_DISTANCE,
+        ttl_s=CACHE_TTL_S,
+        per_session=CACHE_PER_SESSION,
+        max_sessions=CACHE_MAX_SESSIONS
+    ):
+        self.max_distance = max_distance
+        self.ttl_s = ttl_s
+        self.per_session = per_session
+        self.max_sessions = max_sessions
+
+        self._lock = threading.Lock()
+        # session_id -> OrderedDict(hash -> (result, stored_at)), both LRU ordered
+        self._sessions = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, session_id, h):
+        now = time.monotonic()
+        with self._lock:
+            entries = self._sessions.get(session_id)
+            if entries is not None:
+                self._sessions.move_to_end(session_id)
+
+                for key in list(entries):
+                    result, stored_at = entries[key]
+                    if now - stored_at > self.ttl_s:
+                        del entries[key]
+                        continue
+                    if hamming(key, h) <= self.max_distance:
+                        entries.move_to_end(key)
+                        self.hits += 1
+                        return result
+
+            self.misses += 1
+            return None
+
+    def store(self, session_id, h, result):
+        with self._lock:
+            entries = self._sessions.get(session_id)
+            if entries is None:
+                entries = self._sessions[session_id] = OrderedDict()
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+
+            entries[h] = (result, time.monotonic())
+            entries.move_to_end(h)
+            while len(entries) > self.per_session:
+                entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "sessions": len(self._sessions),
+                "max_distance": self.max_distance,
+                "ttl_s": self.ttl_s,
+            }
@@ -0,0 +1,90 @@
+# src/frame_io.py
+# Frame ingestion: upload bytes -> one BGR array -> FER input tensors.
+#
+# - JPEG/PNG bytes are decoded once with cv2.imdecode (no PIL round-trip)
+# - the same BGR array feeds face detection, YOLO and evidence snapshots
+# - face crops are resized / normalized with OpenCV + NumPy into reused
+#   per-thread buffers instead of going through torchvision's PIL transform
+
+import struct
+import threading
+
+import cv2
+import numpy as np
+import torch
+
+FER_SIZE = 48
+
+# WebSocket frame header: seq (uint32), width, height (uint16), big endian.
+# width == height == 0 -> payload is an encoded image (JPEG/PNG),
+# otherwise it is raw BGR bytes of width x height x 3.
+WS_HEADER = struct.Struct(">IHH")
+
+_local = threading.local()
+
+
+def decode_image(data):
+    """Encoded image bytes -> BGR uint8 array (None if the bytes don't decode)."""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return None
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+
+
+def parse_ws_frame(msg):
+    """Binary WebSocket message -> (seq, payload, width, height); ValueError if malformed."""
+    if len(msg) < WS_HEADER.size:
+        raise ValueError("frame shorter than header")
+    seq, w, h = WS_HEADER.unpack_from(msg)
+    payload = memoryview(msg)[WS_HEADER.size:]
+    if (w or h) and len(payload) != w * h * 3:
+        raise ValueError(f"raw frame is {len(payload)} bytes, expected {w}x{h}x3")
+    return seq, payload, w, h
+
+
+def decode_payload(payload, w=0, h=0):
+    """Payload from parse_ws_frame -> BGR array (raw frames are wrapped, not copied)."""
+    if w or h:
+        return np.frombuffer(payload, dtype=np.uint8).reshape(h, w, 3)
+    return decode_image(payload)
+
+
+def _scratch():
+    s = getattr(_local, "scratch", None)
+    if s is None:
+        s = np.empty((FER_SIZE, FER_SIZE, 3), dtype=np.uint8)
+        _local.scratch = s
+    return s
+
+
+def _write_normalized(face, out, bgr=True):
+    """Resize one crop to 48x48 and write (x / 127.5 - 1) as CHW RGB into `out`."""
+    small = cv2.resize(face, (FER_SIZE, FER_SIZE), dst=_scratch(), interpolation=cv2.INTER_AREA)
+    order = (2, 1, 0) if bgr else (0, 1, 2)
+    for c, src in enumerate(order):
+        np.multiply(small[:, :, src], 1.0 / 127.5, out=out[c], casting="unsafe")
+    out -= 1.0
+    return out
+
+
+def face_tensor(face, bgr=True):
+    """
+    (3, 48, 48) float tensor for one face crop, same layout and scaling as
+    the training transform (RGB, Normalize(0.5, 0.5)).
+
+    The tensor is a view of a per-thread buffer: it stays valid until the
+    next face_tensor call on the same thread.
+    """
+    buf = getattr(_local, "face", None)
+    if buf is None:
+        buf = np.empty((3, FER_SIZE, FER_SIZE), dtype=np.float32)
+        _local.face = buf
+    return torch.from_numpy(_write_normalized(face, buf, bgr))
+
+
+def faces_to_tensors(faces, bgr=True):
+    """List of face crops -> list of (3, 48, 48) tensors backed by one contiguous block."""
+    block = np.empty((len(faces), 3, FER_SIZE, FER_SIZE), dtype=np.float32)
+    for face, out in zip(faces, block):
+        _write_normalized(face, out, bgr)
+    return list(torch.from_numpy(block))
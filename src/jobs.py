@@ -0,0 +1,308 @@
+# src/jobs.py
+# Background video-analysis jobs backed by SQLite.
+#
+# submit() stores a queued row and returns a job id immediately. Worker
+# threads claim queued jobs, analyse them and checkpoint progress
+# (next_frame, counts) every few batches, so an interrupted job resumes from
+# its last checkpoint instead of frame 0.
+#
+# - per-frame log rows are buffered and inserted in the same transaction as
+#   the checkpoint, so a resume never inserts rows twice
+# - every claimed job records its owner (one per JobManager / process) and a
+#   heartbeat; other processes only take over a running job once its
+#   heartbeat is older than VIDEO_JOB_STALE_S. A clean shutdown hands its
+#   jobs back to the queue at once.
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from collections import Counter
+
+from src.video_analysis import iter_video_results
+
+# =====================================
+# CONFIG
+# =====================================
+JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "2"))
+JOB_CHECKPOINT_BATCHES = int(os.getenv("VIDEO_JOB_CHECKPOINT_BATCHES", "4"))
+JOB_POLL_S = float(os.getenv("VIDEO_JOB_POLL_S", "2"))
+JOB_HEARTBEAT_S = float(os.getenv("VIDEO_JOB_HEARTBEAT_S", "10"))
+JOB_STALE_S = float(os.getenv("VIDEO_JOB_STALE_S", "60"))
+
+JOBS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS video_jobs (
+    id TEXT PRIMARY KEY,
+    video_path TEXT,
+    status TEXT,
+    frames_total INTEGER DEFAULT 0,
+    next_frame INTEGER DEFAULT 0,
+    frames_analyzed INTEGER DEFAULT 0,
+    emotions TEXT,
+    error TEXT,
+    elapsed_s REAL DEFAULT 0,
+    created_at REAL,
+    started_at REAL,
+    updated_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    heartbeat_at REAL
+)
+"""
+
+
+class LostJob(Exception):
+    """The job was taken over by another worker (our heartbeat went stale)."""
+
+
+class JobManager:
+    def __init__(
+        self,
+        db_path,
+        model,
+        frame_sql=None,
+        frame_row=None,
+        workers=JOB_WORKERS,
+        heartbeat_s=JOB_HEARTBEAT_S,
+        stale_s=JOB_STALE_S
+    ):
+        """
+        model: EmotionModel used for analysis
+        frame_sql / frame_row: INSERT statement and frame_event -> row tuple for
+            per-frame logs; rows are committed together with each checkpoint
+            (frame_sql must target a table in db_path)
+        """
+        self.db_path = str(db_path)
+        self.model = model
+        self.frame_sql = frame_sql
+        self.frame_row = frame_row
+        self.heartbeat_s = heartbeat_s
+        self.stale_s = stale_s
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+        self._init_table()
+
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"video-job-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        self._threads.append(threading.Thread(target=self._heartbeat_loop, name="video-job-heartbeat", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    # ---------------- DB ----------------
+    def _conn(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_table(self):
+        conn = self._conn()
+        conn.execute(JOBS_TABLE_SQL)
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(video_jobs)").fetchall()]
+        if "owner" not in cols:
+            conn.execute("ALTER TABLE video_jobs ADD COLUMN owner TEXT")
+        if "heartbeat_at" not in cols:
+            conn.execute("ALTER TABLE video_jobs ADD COLUMN heartbeat_at REAL")
+        conn.commit()
+        conn.close()
+
+    def _update(self, job_id, **cols):
+        cols["updated_at"] = time.time()
+        keys = ", ".join(f"{k} = ?" for k in cols)
+        conn = self._conn()
+        conn.execute(f"UPDATE video_jobs SET {keys} WHERE id = ?", (*cols.values(), job_id))
+        conn.commit()
+        conn.close()
+
+    def _checkpoint(self, job_id, rows, **cols):
+        """Insert buffered frame rows and update the job row in ONE transaction (owner only)."""
+        now = time.time()
+        cols["updated_at"] = now
+        cols["heartbeat_at"] = now
+        keys = ", ".join(f"{k} = ?" for k in cols)
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            n = conn.execute(
+                f"UPDATE video_jobs SET {keys} WHERE id = ? AND owner = ?",
+                (*cols.values(), job_id, self.owner)
+            ).rowcount
+            if not n:
+                conn.rollback()
+                raise LostJob(job_id)
+            if rows:
+                conn.executemany(self.frame_sql, rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _release(self, job_id):
+        """Hand an unfinished job back to the queue (clean shutdown)."""
+        conn = self._conn()
+        conn.execute(
+            "UPDATE video_jobs SET status = 'queued', owner = NULL, updated_at = ? "
+            "WHERE id = ? AND owner = ? AND status = 'running'",
+            (time.time(), job_id, self.owner)
+        )
+        conn.commit()
+        conn.close()
+
+    def _claim(self):
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            # queued jobs, or running jobs whose owner stopped heartbeating (crashed worker)
+            row = conn.execute(
+                "SELECT * FROM video_jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND COALESCE(heartbeat_at, 0) < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now - self.stale_s,)
+            ).fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            conn.execute(
+                "UPDATE video_jobs SET status = 'running', owner = ?, heartbeat_at = ?, "
+                "started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ?",
+                (self.owner, now, now, now, row["id"])
+            )
+            conn.commit()
+            if row["status"] == "running":
+                print(f"♻ Resuming interrupted video job {row['id']} from frame {row['next_frame']}")
+            return dict(row)
+        finally:
+            conn.close()
+
+    # ---------------- PUBLIC ----------------
+    def submit(self, video_path):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO video_jobs (id, video_path, status, emotions, created_at, updated_at) "
+            "VALUES (?, ?, 'queued', '{}', ?, ?)",
+            (job_id, str(video_path), now, now)
+        )
+        conn.commit()
+        conn.close()
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id):
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM video_jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+
+        job = dict(row)
+        elapsed = job["elapsed_s"] or 0.0
+        total = job["frames_total"] or 0
+        if job["status"] == "done":
+            progress = 100.0
+        else:
+            progress = round(100.0 * min(job["next_frame"], total) / total, 1) if total else 0.0
+
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "progress": progress,
+            "frames_analyzed": job["frames_analyzed"],
+            "frames_total": total,
+            "throughput_fps": round(job["frames_analyzed"] / elapsed, 2) if elapsed > 0 else 0.0,
+            "elapsed_s": round(elapsed, 2),
+            "summary": {"emotions": json.loads(job["emotions"] or "{}")} if job["status"] == "done" else None,
+            "error": job["error"],
+        }
+
+    def shutdown(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    # ---------------- WORKER ----------------
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_s):
+            try:
+                conn = self._conn()
+                conn.execute(
+                    "UPDATE video_jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'",
+                    (time.time(), self.owner)
+                )
+                conn.commit()
+                conn.close()
+            except sqlite3.Error as e:
+                print("❌ Video job heartbeat error:", e)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                self._wake.wait(JOB_POLL_S)
+                self._wake.clear()
+                continue
+            try:
+                self._run(job)
+            except LostJob:
+                print("⚠ Video job taken over by another worker:", job["id"])
+            except Exception as e:
+                self._update(job["id"], status="failed", error=str(e), finished_at=time.time())
+                print("❌ Video job failed:", job["id"], e)
+
+    def _run(self, job):
+        job_id = job["id"]
+        counts = Counter(json.loads(job["emotions"] or "{}"))
+        analyzed = job["frames_analyzed"] or 0
+        elapsed = job["elapsed_s"] or 0.0
+        run_started = time.time()
+        batches = 0
+        rows = []   # frame log rows since the last checkpoint
+
+        for ev in iter_video_results(job["video_path"], self.model, start=job["next_frame"] or 0):
+            if self._stop.is_set():
+                # unsaved rows are dropped; the job resumes from its last checkpoint
+                self._release(job_id)
+                return
+
+            if ev["type"] == "frame":
+                counts[ev["emotion"]] += 1
+                analyzed += 1
+                if self.frame_row:
+                    rows.append(self.frame_row(ev))
+
+            elif ev["type"] == "progress":
+                batches += 1
+                if batches == 1 or batches % JOB_CHECKPOINT_BATCHES == 0:
+                    self._checkpoint(
+                        job_id,
+                        rows,
+                        frames_total=ev["frames_total"],
+                        next_frame=ev["next_frame"],
+                        frames_analyzed=analyzed,
+                        emotions=json.dumps(counts),
+                        elapsed_s=elapsed + time.time() - run_started
+                    )
+                    rows = []
+
+            elif ev["type"] == "summary":
+                total = ev["frames_total"]
+                self._checkpoint(
+                    job_id,
+                    rows,
+                    status="done",
+                    frames_total=total,
+                    next_frame=total,
+                    frames_analyzed=analyzed,
+                    emotions=json.dumps(counts),
+                    elapsed_s=elapsed + time.time() - run_started,
+                    finished_at=time.time()
+                )
@@ -0,0 +1,145 @@
+# src/model_registry.py
+# Process-wide model registry.
+#
+# Every detector is loaded lazily, exactly once per process, no matter how
+# many modules ask for it. Load time and memory footprint are recorded so
+# worker start-up cost is visible, and warmup() can pay the first-inference
+# cost at start-up instead of on the first request.
+
+import os
+import time
+import threading
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:  # optional: RSS deltas are reported only when available
+    psutil = None
+
+# =====================================
+# CONFIG
+# =====================================
+YOLO_WEIGHTS = os.getenv("YOLO_WEIGHTS", "yolov8n.pt")
+
+_lock = threading.Lock()
+_loaders = {}
+_warmups = {}
+_models = {}
+_info = {}
+_call_locks = {}
+
+
+# =====================================
+# REGISTRATION
+# =====================================
+def register(name, loader, warmup=None):
+    """loader: () -> model; warmup: (model) -> None (one dummy inference)."""
+    _loaders[name] = loader
+    if warmup is not None:
+        _warmups[name] = warmup
+
+
+def _rss_bytes():
+    if psutil is None:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+def _param_bytes(model):
+    """Parameter bytes for torch modules (YOLO wraps one in .model)."""
+    module = getattr(model, "model", model)
+    params = getattr(module, "parameters", None)
+    if params is None:
+        return None
+    try:
+        return int(sum(p.numel() * p.element_size() for p in params()))
+    except Exception:
+        return None
+
+
+# =====================================
+# ACCESS
+# =====================================
+def get_model(name):
+    m = _models.get(name)
+    if m is not None:
+        return m
+
+    with _lock:
+        m = _models.get(name)
+        if m is not None:
+            return m
+        if name not in _loaders:
+            raise KeyError(f"unknown model '{name}'")
+
+        rss_before = _rss_bytes()
+        t0 = time.perf_counter()
+        m = _loaders[name]()
+        load_s = time.perf_counter() - t0
+        rss_after = _rss_bytes()
+
+        _models[name] = m
+        _info[name] = {
+            "load_s": round(load_s, 3),
+            "param_bytes": _param_bytes(m),
+            "rss_delta_bytes": (rss_after - rss_before) if rss_before is not None else None,
+            "warmup_s": None,
+        }
+        print(f"✅ Loaded model '{name}' in {load_s:.2f}s")
+        return m
+
+
+def model_lock(name):
+    """
+    Lock serializing inference on a shared model instance. Ultralytics
+    predictors keep per-call state and are not thread-safe, so every caller
+    of the shared YOLO model (inference threads, warmup, UI workers) holds it.
+    """
+    lock = _call_locks.get(name)
+    if lock is None:
+        with _lock:
+            lock = _call_locks.setdefault(name, threading.Lock())
+    return lock
+
+
+def warmup(*names):
+    """Load and run one dummy inference for each named model."""
+    for name in names:
+        m = get_model(name)
+        fn = _warmups.get(name)
+        if fn is None:
+            continue
+        t0 = time.perf_counter()
+        with model_lock(name):
+            fn(m)
+        _info[name]["warmup_s"] = round(time.perf_counter() - t0, 3)
+
+
+def model_info():
+    return {
+        "loaded": {k: dict(v) for k, v in _info.items()},
+        "registered": sorted(_loaders),
+        "rss_bytes": _rss_bytes(),
+    }
+
+
+# =====================================
+# BUILT-IN MODELS
+# =====================================
+def _load_yolo():
+    from ultralytics import YOLO
+    return YOLO(YOLO_WEIGHTS)
+
+
+def _warmup_yolo(model):
+    model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+
+
+def _load_haar_face():
+    import cv2
+    return cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+
+register("yolo", _load_yolo, _warmup_yolo)
+register("haar_face", _load_haar_face)
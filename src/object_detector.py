@@ -1,11 +1,11 @@
 # object_detection.py
 # Enhanced object detection module for AI proctoring
 
-from ultralytics import YOLO
 import numpy as np
+from src.model_registry import get_model, model_lock
 
-# ---------------- LOAD MODEL ----------------
-model = YOLO("yolov8n.pt")
+# ---------------- MODEL ----------------
+# Loaded lazily, once per process, via the shared registry
 
 # Objects treated as malpractice
 BANNED_OBJECTS = {
@@ -31,7 +31,10 @@ def detect_objects(frame_bgr, conf_threshold=0.5):
             }
     """
 
-    results = model(frame_bgr, conf=conf_threshold, verbose=False)[0]
+    model = get_model("yolo")
+    # one shared predictor, called from several inference threads
+    with model_lock("yolo"):
+        results = model(frame_bgr, conf=conf_threshold, verbose=False)[0]
 
     objects = []
     confidences = []
@@ -0,0 +1,100 @@
+# src/quantize.py
+# INT8 post-training quantization for SimpleFERNet.
+#
+#   python -m src.quantize
+#
+# - conv feature extractor: static quantization (conv+relu fused),
+#   calibrated on data_preprocessed/val
+# - classifier head: dynamic quantization of the Linear layers
+# - emits best_fer_model_int8.ts and an accuracy delta report (test split)
+#
+# Load it in the API with FER_BACKEND=int8
+
+import json
+import copy
+import torch
+import torch.nn as nn
+from torch.ao.quantization import (
+    QuantStub, DeQuantStub, get_default_qconfig, prepare, convert, fuse_modules, quantize_dynamic
+)
+from pathlib import Path
+
+from src.fer_inference import load_fer_checkpoint, select_quant_engine, INT8_PATH
+from src.evaluate import get_loader, accuracy
+
+ROOT = Path(__file__).resolve().parents[1]
+MODEL_PATH = ROOT / "best_fer_model.pth"
+REPORT_PATH = ROOT / "logs" / "quant_report.json"
+CALIB_BATCHES = 32
+
+
+class QuantFERNet(nn.Module):
+    """SimpleFERNet with quant/dequant around the conv stack only."""
+
+    def __init__(self, fp32_model):
+        super().__init__()
+        self.quant = QuantStub()
+        self.features = fp32_model.features
+        self.dequant = DeQuantStub()
+        self.classifier = fp32_model.classifier
+
+    def forward(self, x):
+        x = self.quant(x)
+        x = self.features(x)
+        x = self.dequant(x)
+        x = x.reshape(x.size(0), -1)
+        return self.classifier(x)
+
+
+def quantize(fp32_model, calib_loader):
+    engine = select_quant_engine()
+
+    qmodel = QuantFERNet(copy.deepcopy(fp32_model)).eval()
+    fuse_modules(qmodel.features, [["0", "1"], ["3", "4"], ["6", "7"]], inplace=True)
+
+    # static INT8 for the conv stack, classifier stays float here
+    qmodel.qconfig = get_default_qconfig(engine)
+    qmodel.classifier.qconfig = None
+    prepare(qmodel, inplace=True)
+
+    with torch.no_grad():
+        for i, (x, _) in enumerate(calib_loader):
+            if i >= CALIB_BATCHES:
+                break
+            qmodel(x)
+    convert(qmodel, inplace=True)
+
+    # dynamic INT8 for the classifier Linear layers
+    return quantize_dynamic(qmodel, {nn.Linear}, dtype=torch.qint8)
+
+
+def save_int8(qmodel, classes):
+    with torch.no_grad():
+        scripted = torch.jit.trace(qmodel, torch.zeros(1, 3, 48, 48))
+    torch.jit.save(scripted, str(INT8_PATH), _extra_files={"classes.json": json.dumps(classes)})
+    print("✅ INT8 model saved:", INT8_PATH)
+    return scripted
+
+
+if __name__ == "__main__":
+    fp32, classes = load_fer_checkpoint(MODEL_PATH)
+
+    qmodel = quantize(fp32, get_loader("val"))
+    scripted = save_int8(qmodel, classes)
+
+    test_loader = get_loader("test")
+    acc_fp32 = accuracy(fp32, test_loader)
+    acc_int8 = accuracy(scripted, test_loader)
+
+    report = {
+        "acc_fp32": round(acc_fp32, 4),
+        "acc_int8": round(acc_int8, 4),
+        "delta": round(acc_int8 - acc_fp32, 4),
+        "size_fp32_bytes": MODEL_PATH.stat().st_size,
+        "size_int8_bytes": INT8_PATH.stat().st_size,
+    }
+    print(f"\nTest acc FP32: {acc_fp32:.4f} | INT8: {acc_int8:.4f} | delta: {acc_int8 - acc_fp32:+.4f}")
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(json.dumps(report, indent=2))
+    print("📄 Report written to", REPORT_PATH)
@@ -0,0 +1,357 @@
+# src/video_analysis.py
+# Streaming emotion analysis for uploaded recordings.
+#
+# - upload is spooled to disk in chunks (never fully in RAM)
+# - only sampled frames are decoded (cap.grab() skips the rest)
+# - adaptive mode: decoded candidates are gated by scene change, so a static
+#   scene costs one inference per SAMPLER_MAX_INTERVAL_S instead of per step
+# - sampled frames are classified in batches
+# - results are yielded as events so callers can stream NDJSON progress
+
+import os
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+import cv2
+import torch
+import torch.multiprocessing as tmp
+
+from src.model import SimpleFERNet
+from src.fer_inference import forward_probs, emotion_from_probs
+from src.frame_io import faces_to_tensors
+from src.face_stage import face_crops
+from src.adaptive_sampler import AdaptiveSampler
+
+# =====================================
+# CONFIG
+# =====================================
+SAMPLE_EVERY = int(os.getenv("VIDEO_SAMPLE_EVERY", "15"))
+VIDEO_ADAPTIVE = os.getenv("VIDEO_ADAPTIVE", "1") == "1"
+ADAPTIVE_EVERY = int(os.getenv("VIDEO_ADAPTIVE_EVERY", "5"))   # candidate step in adaptive mode
+VIDEO_BATCH = int(os.getenv("VIDEO_BATCH", "16"))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1 << 20)))
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+CHUNKS_PER_WORKER = int(os.getenv("VIDEO_CHUNKS_PER_WORKER", "4"))
+
+
+# =====================================
+# UPLOAD SPOOLING
+# =====================================
+async def spool_upload(upload, dest_dir):
+    """
+    Write an UploadFile to dest_dir chunk by chunk; returns the saved path.
+    The name is prefixed with a uuid, so uploads sharing a client file name
+    never overwrite each other (or the file behind a queued job).
+    """
+    name = Path(upload.filename or "upload.mp4").name
+    dest = Path(dest_dir) / f"{uuid.uuid4().hex}_{name}"
+    with open(dest, "wb") as f:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            f.write(chunk)
+    return dest
+
+
+# =====================================
+# FRAME SAMPLING
+# =====================================
+def iter_sampled_frames(video_path, every=SAMPLE_EVERY, start=0, stop=None):
+    """
+    Yield (frame_id, t_seconds, frame_bgr) for every `every`-th frame in
+    [start, stop). Skipped frames are grabbed, not decoded.
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    frame_id = start
+    try:
+        while stop is None or frame_id < stop:
+            if frame_id % every == 0:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame_id, frame_id / fps, frame
+            elif not cap.grab():
+                break
+            frame_id += 1
+    finally:
+        cap.release()
+
+
+def iter_adaptive_frames(video_path, sampler, every=ADAPTIVE_EVERY, start=0, stop=None):
+    """iter_sampled_frames filtered down to the candidates the sampler schedules."""
+    for item in iter_sampled_frames(video_path, every=every, start=start, stop=stop):
+        if sampler.should_analyze(item[2], item[1]):
+            yield item
+
+
+def _frame_source(video_path, every, adaptive, start=0, stop=None):
+    """(frames iterator, sampler or None) for the chosen sampling mode."""
+    if not adaptive:
+        return iter_sampled_frames(video_path, every=every, start=start, stop=stop), None
+    sampler = AdaptiveSampler()
+    return iter_adaptive_frames(video_path, sampler, every=every, start=start, stop=stop), sampler
+
+
+def _step(every, adaptive):
+    return every or (ADAPTIVE_EVERY if adaptive else SAMPLE_EVERY)
+
+
+def video_info(video_path):
+    cap = cv2.VideoCapture(str(video_path))
+    info = {
+        # containers may report 0 or a negative count when it is unknown
+        "frames": max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)),
+        "fps": float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+    }
+    cap.release()
+    return info
+
+
+# =====================================
+# BATCHED ANALYSIS
+# =====================================
+def _frame_events(batch, results):
+    out = []
+    for (frame_id, t, _), res in zip(batch, results):
+        if res["status"] != "ok":
+            continue
+        out.append({
+            "type": "frame",
+            "frame": frame_id,
+            "t": round(t, 3),
+            "emotion": res["dominant_emotion"],
+            "confidence": res["confidence"]
+        })
+    return out
+
+
+def _classify_batch(model, batch):
+    return _frame_events(batch, model.classify_frames([f for _, _, f in batch]))
+
+
+def iter_video_results(
+    video_path,
+    model,
+    every=None,
+    batch_size=VIDEO_BATCH,
+    start=0,
+    adaptive=VIDEO_ADAPTIVE
+):
+    """
+    Yield analysis events:
+      {"type": "frame", frame, t, emotion, confidence}
+      {"type": "progress", frames_analyzed, frames_total, percent, next_frame}
+      {"type": "summary", frames_analyzed, frames_total, emotions, elapsed_s, analyzed_per_s[, sampler]}
+
+    `start` resumes from a frame index (counts only cover this run).
+    `every` defaults to ADAPTIVE_EVERY / SAMPLE_EVERY depending on `adaptive`.
+    """
+    started = time.time()
+    every = _step(every, adaptive)
+    frames, sampler = _frame_source(video_path, every, adaptive, start=start)
+    total = video_info(video_path)["frames"]
+    counts = Counter()
+    analyzed = 0
+    batch = []
+
+    def flush():
+        nonlocal analyzed
+        results = _classify_batch(model, batch)
+        batch.clear()
+        for r in results:
+            counts[r["emotion"]] += 1
+        analyzed += len(results)
+        return results
+
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            last_frame = batch[-1][0]
+            yield from flush()
+            yield {
+                "type": "progress",
+                "frames_analyzed": analyzed,
+                "frames_total": total,
+                "percent": round(100.0 * (last_frame + 1) / total, 1) if total else None,
+                "next_frame": last_frame + 1
+            }
+
+    if batch:
+        yield from flush()
+
+    elapsed = time.time() - started
+    summary = {
+        "type": "summary",
+        "frames_analyzed": analyzed,
+        "frames_total": total,
+        "emotions": dict(counts),
+        "elapsed_s": round(elapsed, 2),
+        "analyzed_per_s": round(analyzed / elapsed, 2) if elapsed > 0 else 0.0
+    }
+    if sampler is not None:
+        summary["sampler"] = sampler.stats()
+    yield summary
+
+
+# =====================================
+# PARALLEL (PROCESS POOL) ANALYSIS
+# =====================================
+_worker_model = None
+_worker_classes = None
+
+
+def _init_worker(state_dict, classes, torch_threads):
+    """Build the worker's SimpleFERNet on top of the parent's shared-memory weights."""
+    global _worker_model, _worker_classes
+    torch.set_num_threads(torch_threads)
+
+    model = SimpleFERNet(n_classes=len(classes))
+    try:
+        # assign=True reuses the shared tensors instead of copying them
+        model.load_state_dict(state_dict, strict=True, assign=True)
+    except TypeError:
+        model.load_state_dict(state_dict, strict=True)
+    model.eval()
+
+    _worker_model = model
+    _worker_classes = classes
+
+
+def _analyze_range(video_path, start, stop, every, batch_size, adaptive):
+    """Worker: own VideoCapture, frames [start, stop) -> (frame events, sampler counts)."""
+    out = []
+    batch = []
+
+    def flush():
+        crops, _ = face_crops([f for _, _, f in batch], bgr=True)
+        found = [c for c in crops if c is not None]
+        probs = iter(forward_probs(_worker_model, faces_to_tensors(found)) if found else [])
+        results = [
+            emotion_from_probs(next(probs), _worker_classes) if c is not None else {"status": "no_face"}
+            for c in crops
+        ]
+        out.extend(_frame_events(batch, results))
+        batch.clear()
+
+    frames, sampler = _frame_source(video_path, every, adaptive, start=start, stop=stop)
+    for item in frames:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    return out, (sampler.analyzed, sampler.skipped) if sampler else None
+
+
+class ParallelVideoAnalyzer:
+    """Process pool whose workers share one copy of the FER weights."""
+
+    def __init__(self, model, classes, workers=VIDEO_WORKERS):
+        self.workers = max(1, int(workers))
+
+        model.share_memory()
+        state = dict(model.state_dict())
+
+        # torch.multiprocessing pickles tensors as shared-memory handles
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=tmp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(state, classes, 1)
+        )
+
+    def _ranges(self, total, every):
+        """
+        [start, stop) frame ranges; the last one has stop=None and reads to
+        EOF, since CAP_PROP_FRAME_COUNT is only the container's estimate.
+        Without a usable count the video is decoded sequentially in one range.
+        """
+        if total <= 0:
+            return [(0, None)]
+        n_chunks = max(1, self.workers * CHUNKS_PER_WORKER)
+        # align chunk size to the sampling step so no sample is lost or doubled
+        size = max(every, -(-total // n_chunks))
+        size = -(-size // every) * every
+        ranges = [(s, min(s + size, total)) for s in range(0, total, size)]
+        ranges[-1] = (ranges[-1][0], None)
+        return ranges
+
+    def iter_results(self, video_path, every=None, batch_size=VIDEO_BATCH, adaptive=VIDEO_ADAPTIVE):
+        """Same events as iter_video_results, emitted in timestamp order."""
+        started = time.time()
+        every = _step(every, adaptive)
+        total = video_info(video_path)["frames"]
+        ranges = self._ranges(total, every)
+
+        # each chunk runs its own sampler (first candidate of a chunk is always analysed)
+        futures = {
+            self._pool.submit(_analyze_range, str(video_path), a, b, every, batch_size, adaptive): i
+            for i, (a, b) in enumerate(ranges)
+        }
+        done_chunks = {}
+        next_chunk = 0
+        counts = Counter()
+        analyzed = 0
+        sampled = [0, 0]
+        pending = set(futures)
+
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                done_chunks[futures[fut]] = fut.result()
+
+            # release chunks strictly in order
+            while next_chunk in done_chunks:
+                events, sampler_counts = done_chunks.pop(next_chunk)
+                if sampler_counts:
+                    sampled[0] += sampler_counts[0]
+                    sampled[1] += sampler_counts[1]
+                for ev in events:
+                    counts[ev["emotion"]] += 1
+                analyzed += len(events)
+                yield from events
+
+                start, stop = ranges[next_chunk]
+                if stop is None:
+                    # last range ran to EOF
+                    stop = max(start, total, events[-1]["frame"] + 1 if events else 0)
+                next_chunk += 1
+                yield {
+                    "type": "progress",
+                    "frames_analyzed": analyzed,
+                    "frames_total": total,
+                    "percent": round(min(100.0, 100.0 * stop / total), 1) if total else None,
+                    "next_frame": stop
+                }
+
+        elapsed = time.time() - started
+        summary = {
+            "type": "summary",
+            "frames_analyzed": analyzed,
+            "frames_total": total,
+            "emotions": dict(counts),
+            "workers": self.workers,
+            "elapsed_s": round(elapsed, 2),
+            "analyzed_per_s": round(analyzed / elapsed, 2) if elapsed > 0 else 0.0
+        }
+        if adaptive:
+            n = sampled[0] + sampled[1]
+            summary["sampler"] = {
+                "frames_analyzed": sampled[0],
+                "frames_skipped": sampled[1],
+                "skip_ratio": round(sampled[1] / n, 3) if n else 0.0,
+            }
+        yield summary
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
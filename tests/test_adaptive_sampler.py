@@ -0,0 +1,44 @@
+# tests/test_adaptive_sampler.py
+import numpy as np
+
+from src.adaptive_sampler import AdaptiveSampler, SessionSamplers
+
+
+def _scene(seed):
+    return np.random.default_rng(seed).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+
+
+def test_still_scene_is_skipped_until_max_interval():
+    s = AdaptiveSampler(threshold=6.0, min_interval=0.25, max_interval=2.0)
+    a = _scene(0)
+
+    assert s.should_analyze(a, 0.0)              # first frame
+    assert not s.should_analyze(a, 0.5)
+    assert not s.should_analyze(a.copy(), 1.9)
+    assert s.should_analyze(a, 2.0)              # forced after max_interval
+    assert s.stats() == {"frames_analyzed": 2, "frames_skipped": 2, "skip_ratio": 0.5}
+
+
+def test_scene_change_is_sampled_but_not_within_min_interval():
+    s = AdaptiveSampler(threshold=6.0, min_interval=0.25, max_interval=2.0)
+    assert s.should_analyze(_scene(0), 0.0)
+    assert not s.should_analyze(_scene(1), 0.1)  # changed, but too soon
+    assert s.should_analyze(_scene(1), 0.5)
+    assert not s.should_analyze(_scene(1), 0.8)
+    assert s.should_analyze(_scene(2), 1.0)
+
+
+def test_session_samplers_recheck_non_ok_results():
+    samplers = SessionSamplers(threshold=6.0, min_interval=0.25, max_interval=2.0)
+    a = _scene(0)
+
+    assert samplers.check("s1", a, 0.0) == (True, None)
+    samplers.remember("s1", {"status": "ok", "dominant_emotion": "neutral"})
+    assert samplers.check("s1", a, 0.5) == (False, {"status": "ok", "dominant_emotion": "neutral"})
+
+    # alerts / no-face are never repeated
+    samplers.remember("s1", {"status": "no_face"})
+    assert samplers.check("s1", a, 1.0)[0]
+
+    # sessions do not share state
+    assert samplers.check("s2", a, 1.0) == (True, None)
@@ -0,0 +1,69 @@
+# tests/test_batcher.py
+import threading
+import time
+
+import pytest
+
+from src.batcher import MicroBatcher
+
+
+def test_concurrent_submits_share_one_call_and_keep_order():
+    calls = []
+
+    def run_batch(items):
+        calls.append(list(items))
+        return [x * 10 for x in items]
+
+    b = MicroBatcher(run_batch, max_batch=8, window_ms=200)
+    try:
+        start = threading.Barrier(8)
+        results = {}
+
+        def caller(i):
+            start.wait()
+            results[i] = b.submit(i).result(timeout=5)
+
+        threads = [threading.Thread(target=caller, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results == {i: i * 10 for i in range(8)}
+        assert sum(len(c) for c in calls) == 8
+        assert len(calls) < 8          # at least some frames were batched together
+        assert b.stats()["items"] == 8
+    finally:
+        b.close()
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    b = MicroBatcher(lambda items: items, max_batch=2, window_ms=5000)
+    try:
+        t0 = time.perf_counter()
+        futures = [b.submit(i) for i in range(2)]
+        assert [f.result(timeout=2) for f in futures] == [0, 1]
+        assert time.perf_counter() - t0 < 1.0
+    finally:
+        b.close()
+
+
+def test_batch_error_reaches_every_caller():
+    def boom(items):
+        raise ValueError("bad batch")
+
+    b = MicroBatcher(boom, max_batch=4, window_ms=50)
+    try:
+        futures = [b.submit(i) for i in range(3)]
+        for f in futures:
+            with pytest.raises(ValueError, match="bad batch"):
+                f.result(timeout=2)
+    finally:
+        b.close()
+
+
+def test_submit_after_close_is_rejected():
+    b = MicroBatcher(lambda items: items, max_batch=4, window_ms=1)
+    b.close()
+    with pytest.raises(RuntimeError):
+        b.submit(1)
@@ -0,0 +1,44 @@
+# tests/test_check_scheduler.py
+import pytest
+
+from src.check_scheduler import CheckScheduler
+
+T0 = 1000.0
+
+
+def test_due_follows_the_sessions_phase_and_interval():
+    sched = CheckScheduler(intervals={"object": 2.0})
+    first = T0 + sched._phase("s1") * 2.0
+
+    assert sched.due("s1", "object", T0) == (first == T0)
+    assert sched.due("s1", "object", first)
+    assert not sched.due("s1", "object", first + 1.0)
+    assert not sched.due("s1", "object", first + 1.99)
+    assert sched.due("s1", "object", first + 2.0)
+
+    # after a long gap: one check, and the next slot stays on the session's grid
+    assert sched.due("s1", "object", first + 9.5)
+    assert not sched.due("s1", "object", first + 9.9)
+    assert sched.due("s1", "object", first + 10.0)
+
+
+def test_sessions_are_scheduled_independently():
+    sched = CheckScheduler(intervals={"object": 2.0})
+    sessions = ["a", "b", "c", "d"]
+    runs = {s: 0 for s in sessions}
+    t = T0
+    while t < T0 + 20.0:
+        for s in sessions:
+            runs[s] += sched.due(s, "object", t)
+        t += 0.05
+
+    # every session gets its own ~1 check per interval, however many sessions are polling
+    assert all(9 <= n <= 11 for n in runs.values()), runs
+    stats = sched.stats()
+    assert stats["sessions_tracked"] == 4
+    assert {s: stats["sessions"][s]["object_checks"] for s in sessions} == runs
+
+
+def test_unknown_check_is_rejected():
+    with pytest.raises(ValueError):
+        CheckScheduler(intervals={"object": 2.0}).due("s1", "face", T0)
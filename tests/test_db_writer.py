@@ -0,0 +1,47 @@
+# tests/test_db_writer.py
+import sqlite3
+
+from src.db_writer import LogWriter
+
+
+def _count(db):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_flush_commits_everything_queued_before_it(tmp_path):
+    db = tmp_path / "logs.db"
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE logs (n INTEGER)")
+    conn.close()
+
+    # large batch / interval: nothing would commit on its own during the test
+    w = LogWriter(db, "INSERT INTO logs (n) VALUES (?)", batch_rows=1000, flush_ms=60000)
+    try:
+        w.write_many((i,) for i in range(25))
+        assert w.flush(timeout=5)
+        assert _count(db) == 25
+
+        w.write((25,))
+        assert w.flush(timeout=5)
+        assert _count(db) == 26
+
+        stats = w.stats()
+        assert stats["rows_written"] == 26 and stats["commits"] == 2 and stats["errors"] == 0
+    finally:
+        w.close()
+
+
+def test_close_flushes_pending_rows(tmp_path):
+    db = tmp_path / "logs.db"
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE logs (n INTEGER)")
+    conn.close()
+
+    w = LogWriter(db, "INSERT INTO logs (n) VALUES (?)", batch_rows=1000, flush_ms=60000)
+    w.write_many((i,) for i in range(5))
+    w.close()
+    assert _count(db) == 5
@@ -0,0 +1,38 @@
+# tests/test_evidence_writer.py
+import numpy as np
+
+from src.evidence_writer import EvidenceWriter
+
+
+def _frame():
+    return np.random.default_rng(0).integers(0, 256, (240, 320, 3), dtype=np.uint8)
+
+
+def test_close_drains_the_queue(tmp_path):
+    w = EvidenceWriter(tmp_path, max_queue=64)
+    frame = _frame()
+    names = [w.capture(f"s{i}", "device", frame, now=1000.0) for i in range(20)]
+    w.close()
+
+    assert all(names)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(names)
+    assert w.stats()["snapshots"] == 20 and w.stats()["queued"] == 0
+    assert w.capture("late", "device", frame) is None        # closed
+
+
+def test_one_snapshot_per_episode(tmp_path):
+    w = EvidenceWriter(tmp_path, episode_gap_s=5.0, max_side=100)
+    frame = _frame()
+    try:
+        first = w.capture("s1", "device", frame, now=1000.0)
+        assert w.capture("s1", "device", frame, now=1003.0) is None     # same episode
+        assert w.capture("s1", "device", frame, now=1007.0) is None     # still < 5 s apart
+        assert w.capture("s1", "no_face", frame, now=1007.0)            # other kind
+        second = w.capture("s1", "device", frame, now=1013.0)           # gap >= 5 s: new episode
+        assert first and second and first != second
+        assert w.flush()
+    finally:
+        w.close()
+
+    assert w.stats()["snapshots"] == 3 and w.stats()["deduplicated"] == 2
+    assert w.stats()["avg_bytes"] > 0
@@ -0,0 +1,68 @@
+# tests/test_face_tracker.py
+import numpy as np
+
+from src.face_tracker import FaceTracker
+
+BOX = (60, 40, 50, 50)
+
+
+def _frame(dx=0, dy=0, textured=True):
+    # a textured "face" patch on a flat background, shifted by (dx, dy)
+    gray = np.full((160, 200), 120, dtype=np.uint8)
+    if textured:
+        patch = np.random.default_rng(0).integers(0, 256, (50, 50), dtype=np.uint8)
+        x, y = BOX[0] + dx, BOX[1] + dy
+        gray[y:y + 50, x:x + 50] = patch
+    return gray
+
+
+class Detector:
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.calls = 0
+
+    def __call__(self, gray):
+        self.calls += 1
+        return list(self.boxes)
+
+
+def test_tracks_between_detections():
+    det = Detector([BOX])
+    tracker = FaceTracker(det, redetect_every=10)
+
+    assert tracker.update(_frame()) == [BOX]
+    for step in range(1, 4):
+        (x, y, w, h), = tracker.update(_frame(2 * step, step))
+        assert abs(x - (BOX[0] + 2 * step)) <= 1 and abs(y - (BOX[1] + step)) <= 1
+    assert det.calls == 1
+
+
+def test_redetects_every_n_frames():
+    det = Detector([BOX])
+    tracker = FaceTracker(det, redetect_every=3)
+    for _ in range(7):
+        tracker.update(_frame())
+    assert det.calls == 3                 # frames 1, 4 and 7
+
+
+def test_redetects_after_the_track_is_lost():
+    # a box without trackable corners is lost on the next frame
+    det = Detector([BOX])
+    tracker = FaceTracker(det, redetect_every=10)
+    tracker.update(_frame(textured=False))
+    tracker.update(_frame(textured=False))
+    assert det.calls == 2
+
+    # once the face is textured again, tracking resumes
+    tracker.update(_frame())
+    tracker.update(_frame(1, 0))
+    assert det.calls == 3
+
+
+def test_detects_every_frame_while_nothing_is_tracked():
+    det = Detector([])
+    tracker = FaceTracker(det, redetect_every=10)
+    for _ in range(5):
+        assert tracker.update(_frame()) == []
+    assert det.calls == 5
+    assert tracker.stats()["detector_calls_saved"] == 0
@@ -0,0 +1,50 @@
+# tests/test_frame_cache.py
+import cv2
+import numpy as np
+
+from src.frame_cache import FrameResultCache, dhash, hamming
+
+
+def _frame(seed=0):
+    # 8x9 random cells blown up to 80x90 BGR: the dHash sees the cells directly
+    cells = np.random.default_rng(seed).integers(0, 256, (8, 9), dtype=np.uint8)
+    gray = cv2.resize(cells, (90, 80), interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def test_near_identical_frame_hits():
+    frame = _frame()
+    noisy = np.clip(frame.astype(np.int16) + np.random.default_rng(1).integers(-2, 3, frame.shape), 0, 255)
+    noisy = noisy.astype(np.uint8)
+
+    cache = FrameResultCache(max_distance=4, ttl_s=60)
+    cache.store("s1", dhash(frame), {"status": "ok", "dominant_emotion": "happy"})
+
+    assert hamming(dhash(frame), dhash(noisy)) <= 4
+    assert cache.lookup("s1", dhash(noisy)) == {"status": "ok", "dominant_emotion": "happy"}
+    assert cache.lookup("s2", dhash(noisy)) is None          # per session
+    assert cache.stats()["hits"] == 1
+
+
+def test_changed_frame_past_the_threshold_misses():
+    frame = _frame()
+    other = frame[:, ::-1].copy()                             # mirrored: most gradients flip
+
+    cache = FrameResultCache(max_distance=4, ttl_s=60)
+    cache.store("s1", dhash(frame), {"status": "ok"})
+
+    assert hamming(dhash(frame), dhash(other)) > 4
+    assert cache.lookup("s1", dhash(other)) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entry_misses():
+    frame = _frame()
+    cache = FrameResultCache(max_distance=4, ttl_s=-1)
+    cache.store("s1", dhash(frame), {"status": "ok"})
+    assert cache.lookup("s1", dhash(frame)) is None
+
+
+def test_bgr_hash_uses_luma():
+    frame = _frame(3)
+    assert dhash(frame) == dhash(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
@@ -0,0 +1,121 @@
+# tests/test_jobs.py
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import src.jobs as jobs_mod
+from src.jobs import JobManager, LostJob
+
+TOTAL = 40
+BATCH = 5
+HANG_AT = 10   # the first run stalls holding frames 10..14 (checkpointed up to frame 10)
+
+
+def _wait_for(cond, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def fake_video(monkeypatch):
+    """iter_video_results stand-in: BATCH frame events + one progress event per batch; the first run stalls."""
+    state = {"stalled": threading.Event(), "release": threading.Event(), "starts": []}
+
+    def fake_iter(video_path, model, start=0):
+        first = not state["starts"]
+        state["starts"].append(start)
+        for b0 in range(start, TOTAL, BATCH):
+            for f in range(b0, b0 + BATCH):
+                yield {"type": "frame", "frame": f, "t": f / 30.0, "emotion": "happy", "confidence": 0.9}
+            if first and b0 == HANG_AT:
+                state["stalled"].set()
+                state["release"].wait(10)
+            yield {"type": "progress", "frames_total": TOTAL, "next_frame": b0 + BATCH}
+        yield {"type": "summary", "frames_total": TOTAL}
+
+    monkeypatch.setattr(jobs_mod, "iter_video_results", fake_iter)
+    monkeypatch.setattr(jobs_mod, "JOB_CHECKPOINT_BATCHES", 2)
+    monkeypatch.setattr(jobs_mod, "JOB_POLL_S", 0.05)
+    yield state
+    state["release"].set()
+
+
+def _frames(db):
+    conn = sqlite3.connect(db)
+    try:
+        return [r[0] for r in conn.execute("SELECT n FROM frames ORDER BY n")]
+    finally:
+        conn.close()
+
+
+def test_stale_job_resumes_from_checkpoint_without_duplicate_rows(tmp_path, fake_video):
+    db = tmp_path / "jobs.db"
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE frames (n INTEGER)")
+    conn.close()
+    opts = dict(frame_sql="INSERT INTO frames (n) VALUES (?)", frame_row=lambda ev: (ev["frame"],), workers=1)
+
+    # A does not heartbeat during the test, like a stuck / crashed worker
+    a = JobManager(db, None, heartbeat_s=60, stale_s=60, **opts)
+    lost = threading.Event()
+    checkpoint = a._checkpoint
+
+    def spy(*args, **kwargs):
+        try:
+            return checkpoint(*args, **kwargs)
+        except LostJob:
+            lost.set()
+            raise
+
+    a._checkpoint = spy
+    b = None
+    try:
+        job_id = a.submit("clip.mp4")
+        assert fake_video["stalled"].wait(5)
+        assert _frames(db) == list(range(HANG_AT))     # only checkpointed rows are visible
+
+        b = JobManager(db, None, heartbeat_s=60, stale_s=0.3, **opts)
+        assert _wait_for(lambda: b.get(job_id)["status"] == "done")
+        assert fake_video["starts"] == [0, HANG_AT]
+
+        # A wakes up; its next checkpoint must not write anything
+        fake_video["release"].set()
+        assert lost.wait(5)
+
+        assert _frames(db) == list(range(TOTAL))
+        job = b.get(job_id)
+        assert job["frames_analyzed"] == TOTAL
+        assert job["summary"] == {"emotions": {"happy": TOTAL}}
+    finally:
+        a.shutdown(1)
+        if b is not None:
+            b.shutdown(1)
+
+
+def test_shutdown_hands_the_job_back(tmp_path, fake_video):
+    db = tmp_path / "jobs.db"
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE frames (n INTEGER)")
+    conn.close()
+
+    a = JobManager(db, None, frame_sql="INSERT INTO frames (n) VALUES (?)",
+                   frame_row=lambda ev: (ev["frame"],), workers=1, heartbeat_s=60, stale_s=60)
+    job_id = a.submit("clip.mp4")
+    assert fake_video["stalled"].wait(5)
+
+    a._stop.set()
+    fake_video["release"].set()
+    a.shutdown(5)
+
+    conn = sqlite3.connect(db)
+    status, owner, next_frame = conn.execute(
+        "SELECT status, owner, next_frame FROM video_jobs WHERE id = ?", (job_id,)).fetchone()
+    conn.close()
+    assert (status, owner, next_frame) == ("queued", None, HANG_AT)
+    assert _frames(db) == list(range(HANG_AT))
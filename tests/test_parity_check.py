@@ -0,0 +1,36 @@
+# tests/test_parity_check.py
+import copy
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import quantize_dynamic
+
+from src.fer_inference import parity_check, select_quant_engine
+from src.model import SimpleFERNet
+
+
+def _model():
+    torch.manual_seed(0)
+    return SimpleFERNet(n_classes=7).eval()
+
+
+def test_identical_runner_passes():
+    model = _model()
+    assert parity_check(copy.deepcopy(model), model) == (True, 0.0)
+    assert parity_check(copy.deepcopy(model), model, kind="int8") == (True, 1.0)
+
+
+def test_int8_gate_is_deterministic():
+    model = _model()
+    select_quant_engine()
+    qmodel = quantize_dynamic(copy.deepcopy(model), {nn.Linear}, dtype=torch.qint8)
+
+    runs = [parity_check(qmodel, model, kind="int8") for _ in range(3)]
+    assert runs[0][0] and len(set(runs)) == 1
+
+
+def test_wrong_runner_fails():
+    model = _model()
+    other = SimpleFERNet(n_classes=7).eval()     # different weights
+    ok, diff = parity_check(other, model)
+    assert not ok and diff > 1e-3
@@ -0,0 +1,67 @@
+# tests/test_video_ranges.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import src.video_analysis as va
+from src.video_analysis import ParallelVideoAnalyzer, CHUNKS_PER_WORKER
+
+
+def _analyzer(workers, pool=None):
+    # skip the process pool: _ranges only needs the worker count
+    a = object.__new__(ParallelVideoAnalyzer)
+    a.workers = workers
+    a._pool = pool
+    return a
+
+
+def _sampled(ranges, end, every):
+    return [f for s, e in ranges for f in range(s, end if e is None else e) if f % every == 0]
+
+
+@pytest.mark.parametrize("workers", [1, 3, 8])
+@pytest.mark.parametrize("total,every", [(1, 1), (10, 15), (997, 15), (1000, 5), (4501, 7), (30, 1)])
+def test_ranges_sample_every_frame_exactly_once(workers, total, every):
+    ranges = _analyzer(workers)._ranges(total, every)
+
+    # contiguous from 0; the last range reads to EOF
+    assert ranges[0][0] == 0 and ranges[-1][1] is None
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert all(s < e for s, e in ranges[:-1])
+    assert ranges[-1][0] < total
+
+    # chunk starts stay on the sampling grid -> same samples as one sequential pass
+    assert all(s % every == 0 for s, _ in ranges)
+    assert _sampled(ranges, total, every) == list(range(0, total, every))
+
+    assert len(ranges) <= workers * CHUNKS_PER_WORKER
+
+
+@pytest.mark.parametrize("total", [0, -1])
+def test_ranges_without_a_frame_count_decode_sequentially(total):
+    assert _analyzer(4)._ranges(total, 5) == [(0, None)]
+
+
+@pytest.mark.parametrize("reported", [120, 0, -1])
+def test_iter_results_reads_past_the_reported_frame_count(monkeypatch, reported):
+    true_total, every = 300, 5
+
+    def fake_range(video_path, start, stop, every, batch_size, adaptive):
+        end = true_total if stop is None else min(stop, true_total)
+        return [
+            {"type": "frame", "frame": f, "t": f / 25.0, "emotion": "happy", "confidence": 0.9}
+            for f in range(start, end, every)
+        ], None
+
+    monkeypatch.setattr(va, "_analyze_range", fake_range)
+    monkeypatch.setattr(va, "video_info", lambda path: {"frames": max(0, reported), "fps": 25.0})
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        events = list(_analyzer(3, pool).iter_results("clip.mp4", every=every, adaptive=False))
+
+    frames = [ev["frame"] for ev in events if ev["type"] == "frame"]
+    assert frames == list(range(0, true_total, every))
+    summary = events[-1]
+    assert summary["type"] == "summary" and summary["frames_analyzed"] == len(frames)
+    progress = [ev for ev in events if ev["type"] == "progress"]
+    assert progress[-1]["next_frame"] == frames[-1] + 1